@@ -0,0 +1,314 @@
+"""
+Claude Router - Routing Calibration
+Learns from /retry escalations so similar prompts stop being misrouted, and
+from rules-vs-LLM agreement so proven rules stop paying for the fallback.
+
+Each routing decision is remembered in its session shard (fingerprint,
+rules, method, route). Rules are the identities of the rule patterns that
+matched ("category:regex", see classify_by_rules), not the matched text, so
+counts carry over to every prompt the same pattern matches and no prompt
+text is stored. When the user runs /retry, the escalation is charged to
+that decision: its fingerprint and each of its rules get a retry against
+their decision count. Classification then consults the counters:
+
+- a fingerprint retried MIN_FINGERPRINT_RETRIES times goes straight to the
+  tier it was retried with
+- a rule whose retry rate reaches PRE_ESCALATE_RATE (with at least
+  MIN_RULE_RETRIES retries) pre-escalates one tier
+- lower retry rates reduce confidence, so a borderline rules result goes to
+  the LLM fallback instead of being trusted
+
+Every LLM fallback of an uncalibrated result also records, per rule of the
+rules result, whether Haiku agreed with the rules route; these are the same
+rules llm_fallback_needed consults. Once a rule has AGREEMENT_MIN_SAMPLES
+samples at AGREEMENT_MIN_RATE agreement, low-confidence results carrying
+only proven rules skip the LLM; AGREEMENT_SAMPLE_RATE of them still call
+it, so drift shows up in the counters and the rule loses its exemption.
+Matched patterns give at least 0.7 confidence, so the results that reach
+this check are mostly those no pattern matched; their default rule is
+split by prompt length class (short/medium/long) rather than pooled.
+
+Counters decay with a HALF_LIFE_DAYS half-life (retry minimums compare the
+decayed count rounded to a whole retry) and each table is capped, so the
+file stays small and old evidence fades. Per-day prompt and retry
+totals back the "retries per 100 prompts" figure in /router-stats.
+
+Counters are changed with update_calibration, which applies the changes to
+the current file under its lock (router_state), so concurrent sessions do
+not overwrite each other's counts.
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from router_state import atomic_write_json, read_json, update_json
+
+CALIBRATION_FILE = Path.home() / ".claude" / "router-calibration.json"
+CALIBRATION_VERSION = 2  # 2: counters keyed by rule identity, not matched text
+
+HALF_LIFE_DAYS = 14
+MAX_RULES = 256
+MAX_FINGERPRINTS = 512
+DAILY_RETENTION_DAYS = 90
+
+PRE_ESCALATE_RATE = 0.3
+MIN_RULE_RETRIES = 3
+MIN_FINGERPRINT_RETRIES = 2
+# Retry rates below PRE_ESCALATE_RATE lower confidence by the rate, up to this
+MAX_CONFIDENCE_PENALTY = 0.2
+MIN_PENALTY_RATE = 0.05
+
+# A rule skips the LLM fallback once Haiku has agreed with the rules this
+# often (smoothed, see agreement_rate) over at least this many samples
+AGREEMENT_MIN_SAMPLES = 20
+AGREEMENT_MIN_RATE = 0.95
+# Share of skippable fallbacks that still call the LLM to detect drift
+AGREEMENT_SAMPLE_RATE = 0.05
+MAX_AGREEMENT_RULES = 256
+
+ESCALATION = {"fast": "standard", "standard": "deep", "deep": "deep"}
+ROUTE_RANK = {"fast": 0, "standard": 1, "deep": 2}
+
+
+def new_calibration() -> dict:
+    return {"version": CALIBRATION_VERSION, "rules": {}, "fingerprints": {}, "agreement": {}, "daily": {}}
+
+
+def load_calibration(path: Path = CALIBRATION_FILE) -> dict:
+    calibration = read_json(path)
+    if isinstance(calibration, dict) and calibration.get("version") == CALIBRATION_VERSION:
+        return calibration
+    return new_calibration()
+
+
+def save_calibration(calibration: dict, path: Path = CALIBRATION_FILE):
+    atomic_write_json(path, calibration)
+
+
+def update_calibration(changes: list, path: Path = CALIBRATION_FILE) -> dict:
+    """Apply changes (functions taking a calibration) to the file under its lock.
+
+    Returns the updated calibration, or None if the lock stayed busy and
+    nothing was written.
+    """
+    updated = []
+
+    def apply(calibration):
+        if calibration.get("version") != CALIBRATION_VERSION:
+            calibration = new_calibration()
+        for change in changes:
+            change(calibration)
+        updated.append(calibration)
+        return calibration
+
+    return updated[0] if update_json(path, apply, new_calibration) else None
+
+
+def _decay(counter: list, now: float) -> list:
+    """Counter [decisions, retries, updated_at, ...] decayed to now (in place)."""
+    elapsed_days = max(0.0, now - counter[2]) / 86400
+    if elapsed_days:
+        factor = 0.5 ** (elapsed_days / HALF_LIFE_DAYS)
+        counter[0] *= factor
+        counter[1] *= factor
+        counter[2] = now
+    return counter
+
+
+def _counter(table: dict, key: str, now: float) -> list:
+    counter = table.get(key)
+    if counter is None:
+        counter = table[key] = [0.0, 0.0, now]
+    return _decay(counter, now)
+
+
+def _prune(table: dict, limit: int, now: float):
+    """Keep the table within limit, dropping the weakest evidence first.
+
+    Trims to 3/4 of the limit so pruning runs rarely rather than on every
+    write once the table is full.
+    """
+    if len(table) <= limit:
+        return
+    ranked = sorted(table, key=lambda k: sum(_decay(table[k], now)[:2]), reverse=True)
+    for key in ranked[limit * 3 // 4:]:
+        del table[key]
+
+
+def _round(counter: list):
+    counter[0] = round(counter[0], 3)
+    counter[1] = round(counter[1], 3)
+    counter[2] = int(counter[2])
+
+
+def _daily(calibration: dict, now: float) -> list:
+    today = date.fromtimestamp(now).isoformat()
+    daily = calibration.setdefault("daily", {})
+    if today not in daily:
+        daily[today] = [0, 0]
+        cutoff = (date.fromtimestamp(now) - timedelta(days=DAILY_RETENTION_DAYS)).isoformat()
+        for day in [d for d in daily if d < cutoff]:
+            del daily[day]
+    return daily[today]
+
+
+def count_decision(calibration: dict, fingerprint: str, rules: list, now: float = None) -> dict:
+    """Count one routing decision against its fingerprint and rules."""
+    now = now or time.time()
+    for key in set(rules):
+        counter = _counter(calibration["rules"], key, now)
+        counter[0] += 1
+        _round(counter)
+    if fingerprint:
+        counter = _counter(calibration["fingerprints"], fingerprint, now)
+        counter[0] += 1
+        _round(counter)
+    _daily(calibration, now)[0] += 1
+    _prune(calibration["rules"], MAX_RULES, now)
+    _prune(calibration["fingerprints"], MAX_FINGERPRINTS, now)
+    return calibration
+
+
+def count_retry(calibration: dict, decision: dict, target_route: str, now: float = None) -> dict:
+    """Charge a /retry to the decision it escalated from.
+
+    decision is the session's last decision ({"fingerprint", "rules",
+    "method", "route"}); target_route is the tier the user retried with.
+    """
+    now = now or time.time()
+    for key in set(decision.get("rules", [])):
+        counter = _counter(calibration["rules"], key, now)
+        counter[1] += 1
+        _round(counter)
+    fingerprint = decision.get("fingerprint")
+    if fingerprint:
+        counter = _counter(calibration["fingerprints"], fingerprint, now)
+        counter[1] += 1
+        _round(counter)
+        # Remember the highest tier this prompt was retried with
+        previous = counter[3] if len(counter) > 3 else decision.get("route", "fast")
+        target = target_route if ROUTE_RANK.get(target_route, 0) >= ROUTE_RANK.get(previous, 0) else previous
+        counter[3:] = [target]
+    method = decision.get("method")
+    if method:
+        methods = calibration.setdefault("methods", {})
+        methods[method] = methods.get(method, 0) + 1
+    _daily(calibration, now)[1] += 1
+    return calibration
+
+
+def retry_rate(counter: list) -> float:
+    """Smoothed retry rate (two pseudo-decisions without a retry)."""
+    return counter[1] / (counter[0] + 2)
+
+
+def calibrate(calibration: dict, result, fingerprint: str = None, now: float = None):
+    """Adjust a classification result (router_features.Classification) from retry history (in place).
+
+    Never de-escalates; records what it did in result.metadata["calibration"].
+    """
+    metadata = result.metadata
+    if "calibration" in metadata:
+        return result
+    now = now or time.time()
+    route = result.route
+
+    counter = calibration["fingerprints"].get(fingerprint) if fingerprint else None
+    if counter and len(counter) > 3 and round(_decay(counter, now)[1]) >= MIN_FINGERPRINT_RETRIES:
+        target = counter[3]
+        if ROUTE_RANK.get(target, 0) > ROUTE_RANK.get(route, 0):
+            result.route = target
+            result.confidence = max(result.confidence, 0.8)
+            metadata["calibration"] = f"retried:{route}->{target}"
+            return result
+
+    worst = None
+    for rule in result.rules:
+        counter = calibration["rules"].get(rule)
+        if counter:
+            _decay(counter, now)
+            if worst is None or retry_rate(counter) > retry_rate(worst):
+                worst = counter
+    if worst is None:
+        return result
+
+    rate = retry_rate(worst)
+    if rate >= PRE_ESCALATE_RATE and round(worst[1]) >= MIN_RULE_RETRIES and route != "deep":
+        result.route = ESCALATION[route]
+        metadata["calibration"] = f"escalated:{route}->{result.route}"
+    elif rate >= MIN_PENALTY_RATE:
+        result.confidence = round(max(0.0, result.confidence - min(MAX_CONFIDENCE_PENALTY, rate)), 3)
+        metadata["calibration"] = f"penalty:{rate:.2f}"
+    return result
+
+
+def count_agreement(calibration: dict, rules: list, rules_route: str, llm_route: str,
+                    now: float = None) -> dict:
+    """Record whether the LLM fallback agreed with the rules route, per rule.
+
+    Agreement counters are [agreed, samples, updated_at].
+    """
+    now = now or time.time()
+    table = calibration.setdefault("agreement", {})
+    for key in set(rules):
+        counter = _counter(table, key, now)
+        # _counter's slots are [decisions, retries]; here [agreed, samples]
+        counter[0] += rules_route == llm_route
+        counter[1] += 1
+        _round(counter)
+    _prune(table, MAX_AGREEMENT_RULES, now)
+    return calibration
+
+
+def agreement_rate(counter: list) -> float:
+    """Smoothed agreement rate (one pseudo-sample that disagreed)."""
+    return counter[0] / (counter[1] + 1)
+
+
+def llm_fallback_needed(calibration: dict, result, now: float = None,
+                        sample_rate: float = AGREEMENT_SAMPLE_RATE) -> tuple[bool, str]:
+    """Whether a low-confidence rules result still needs the LLM fallback.
+
+    Returns (needed, reason). The LLM is skipped only when every rule has
+    proven agreement and retry calibration has no objection; a sample_rate
+    share of those is still sent to the LLM to keep measuring agreement.
+    """
+    if "calibration" in result.metadata:
+        return True, "calibrated"
+    table = calibration.get("agreement", {})
+    rules = set(result.rules)
+    if not rules:
+        return True, "no rules"
+    now = now or time.time()
+    for key in rules:
+        counter = table.get(key)
+        if not counter:
+            return True, "unproven"
+        _decay(counter, now)
+        if round(counter[1]) < AGREEMENT_MIN_SAMPLES or agreement_rate(counter) < AGREEMENT_MIN_RATE:
+            return True, "unproven"
+    import random
+    if random.random() < sample_rate:
+        return True, "drift sample"
+    return False, "proven agreement"
+
+
+def retry_summary(calibration: dict, days: int = 7, today: date = None) -> dict:
+    """Retries per 100 prompts over the last `days` days and the period before."""
+    today = today or date.today()
+    daily = calibration.get("daily", {})
+
+    def window(start: int, end: int):
+        prompts = retries = 0
+        for offset in range(start, end):
+            counts = daily.get((today - timedelta(days=offset)).isoformat())
+            if counts:
+                prompts += counts[0]
+                retries += counts[1]
+        return {"prompts": prompts, "retries": retries,
+                "per_100": round(100 * retries / prompts, 2) if prompts else None}
+
+    return {"days": days, "current": window(0, days), "previous": window(days, 2 * days),
+            "all_time": window(0, DAILY_RETENTION_DAYS + 1)}
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Latency Histograms
+Compact fixed-bucket (HDR-style) histograms for hook latency.
+
+Buckets are log-linear: every power of two between LOWEST_MS and HIGHEST_MS
+is split into SUB_BUCKETS equal-ratio steps (~9% relative precision). Only
+non-empty buckets are stored, so a histogram stays a few hundred bytes no
+matter how many samples it absorbs, and two histograms merge by adding
+their bucket counts.
+
+Usage:
+    python3 router_histogram.py [path/to/router-stats.json]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import json
+import math
+import sys
+from pathlib import Path
+
+# Bucket layout - changing these invalidates stored histograms
+LOWEST_MS = 0.1
+HIGHEST_MS = 60_000.0
+SUB_BUCKETS = 8
+MAX_BUCKET = int(math.log2(HIGHEST_MS / LOWEST_MS) * SUB_BUCKETS)
+
+PERCENTILES = (50, 90, 99)
+
+
+def new_histogram() -> dict:
+    """Create an empty histogram."""
+    return {"n": 0, "sum": 0.0, "max": 0.0, "b": {}}
+
+
+def bucket_index(value_ms: float) -> int:
+    """Map a latency in milliseconds to its bucket index."""
+    if value_ms <= LOWEST_MS:
+        return 0
+    index = int(math.log2(value_ms / LOWEST_MS) * SUB_BUCKETS)
+    return min(index, MAX_BUCKET)
+
+
+def bucket_upper_ms(index: int) -> float:
+    """Upper bound of a bucket in milliseconds (reported value for percentiles)."""
+    return LOWEST_MS * 2 ** ((index + 1) / SUB_BUCKETS)
+
+
+def record(hist: dict, value_ms: float) -> dict:
+    """Record one sample into a histogram (in place)."""
+    key = str(bucket_index(value_ms))
+    buckets = hist.setdefault("b", {})
+    buckets[key] = buckets.get(key, 0) + 1
+    hist["n"] = hist.get("n", 0) + 1
+    hist["sum"] = round(hist.get("sum", 0.0) + value_ms, 3)
+    hist["max"] = round(max(hist.get("max", 0.0), value_ms), 3)
+    return hist
+
+
+def merge(*hists: dict) -> dict:
+    """Merge histograms into a new one (bucket-wise sum)."""
+    merged = new_histogram()
+    for hist in hists:
+        if not hist:
+            continue
+        for key, count in hist.get("b", {}).items():
+            merged["b"][key] = merged["b"].get(key, 0) + count
+        merged["n"] += hist.get("n", 0)
+        merged["sum"] = round(merged["sum"] + hist.get("sum", 0.0), 3)
+        merged["max"] = max(merged["max"], hist.get("max", 0.0))
+    return merged
+
+
+def percentile(hist: dict, pct: float) -> float:
+    """Estimate a percentile (0-100) in milliseconds, or 0.0 if empty."""
+    total = hist.get("n", 0) if hist else 0
+    if not total:
+        return 0.0
+    target = max(1, math.ceil(total * pct / 100))
+    seen = 0
+    for index in sorted(int(k) for k in hist["b"]):
+        seen += hist["b"][str(index)]
+        if seen >= target:
+            # Never report more than the largest sample actually observed
+            return min(bucket_upper_ms(index), hist.get("max") or bucket_upper_ms(index))
+    return hist.get("max", 0.0)
+
+
+def summarize(hist: dict) -> dict:
+    """Summarize a histogram as count, mean, max and p50/p90/p99."""
+    count = hist.get("n", 0) if hist else 0
+    summary = {
+        "count": count,
+        "mean": round(hist["sum"] / count, 2) if count else 0.0,
+        "max": round(hist.get("max", 0.0), 2) if count else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}"] = round(percentile(hist, pct), 2)
+    return summary
+
+
+def record_latency(container: dict, route: str, method: str, value_ms: float):
+    """Record a hook latency sample under container["latency"] by route and method."""
+    latency = container.setdefault("latency", {"routes": {}, "methods": {}})
+    record(latency.setdefault("routes", {}).setdefault(route, new_histogram()), value_ms)
+    record(latency.setdefault("methods", {}).setdefault(method, new_histogram()), value_ms)
+
+
+def format_latency_report(stats: dict) -> str:
+    """Format all-time and per-day latency percentiles from a stats dict."""
+    latency = stats.get("latency") or {}
+    if not latency:
+        return "No latency data recorded yet."
+
+    def rows(groups: dict) -> list:
+        lines = []
+        for name in sorted(groups):
+            s = summarize(groups[name])
+            lines.append(f"  {name:<12} n={s['count']:<7} p50={s['p50']:>8.1f}ms  "
+                         f"p90={s['p90']:>8.1f}ms  p99={s['p99']:>8.1f}ms")
+        return lines
+
+    lines = ["Hook Latency (All Time)", "-----------------------", "By route:"]
+    lines += rows(latency.get("routes", {}))
+    lines.append("By method:")
+    lines += rows(latency.get("methods", {}))
+
+    daily = [s for s in stats.get("sessions", []) if s.get("latency")]
+    if daily:
+        lines += ["", "Daily Trend (all routes)", "------------------------"]
+        for session in sorted(daily, key=lambda s: s["date"]):
+            s = summarize(merge(*session["latency"].get("methods", {}).values()))
+            lines.append(f"  {session['date']}  n={s['count']:<6} p50={s['p50']:>8.1f}ms  "
+                         f"p90={s['p90']:>8.1f}ms  p99={s['p99']:>8.1f}ms")
+    return "\n".join(lines)
+
+
+def main():
+    stats_file = Path(sys.argv[1]) if len(sys.argv) > 1 else Path.home() / ".claude" / "router-stats.json"
+    try:
+        with open(stats_file, "r") as f:
+            stats = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        print("No stats available yet.")
+        return
+    print(format_latency_report(stats))
+
+
+if __name__ == "__main__":
+    main()
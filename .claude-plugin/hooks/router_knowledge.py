@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Knowledge Index
+Incrementally maintained inverted index over knowledge/learnings/*.md.
+
+Each `## Type: Title` entry gets a stable ID, its parsed fields and its
+terms; terms map to posting lists of entry IDs. When a learnings file
+changes, it is split into entries and only entries whose content hash
+changed are re-parsed and re-posted.
+
+Three files live in knowledge/cache/:
+- learnings-index.json   full index (entries + postings) for /knowledge search
+- learned-keywords.json  routing keywords (the weight table's vocabulary),
+                         with the learnings files' signature
+- learned-weights.json   per-keyword weights read by the hook: IDF over the
+                         learnings and the labeled prompt history
+                         (classifications.md), scaled by how often prompts
+                         containing the term were actually routed that way
+
+Usage:
+    python3 router_knowledge.py search <term> [<term> ...] [--type quirk] [--limit 10]
+    python3 router_knowledge.py status
+    python3 router_knowledge.py weights [--limit 20]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import hashlib
+import math
+import os
+import re
+import sys
+from pathlib import Path
+
+from router_state import atomic_write_json, read_json
+
+INDEX_VERSION = 2
+INDEX_FILE = "learnings-index.json"
+KEYWORDS_FILE = "learned-keywords.json"
+WEIGHTS_FILE = "learned-weights.json"
+HISTORY_FILE = "classifications.md"
+
+# The labeled history changes on every new classification; the weights only
+# move noticeably after a batch of changes, so they are rebuilt once this many
+# entries were added or replaced (a full cache evicts as it adds, so its size
+# says nothing) rather than on every write
+HISTORY_REBUILD_ENTRIES = 25
+
+# Terms weighing less than this are left out of the table
+MIN_WEIGHT = 0.05
+
+ENTRY_HEADER = re.compile(r'^## (\w+):\s*(.*)$')
+FIELD_LINE = re.compile(r'^\s*-\s*\*\*([^*:]+):\*\*\s*(.*)$')
+TERM = re.compile(r'[a-z0-9][a-z0-9_-]{2,}')
+ROUTING_TERM = re.compile(r'\b[a-z]{3,}\b')
+HISTORY_QUERY = re.compile(r'^- \*\*Query pattern:\*\* "(.*)"\s*$')
+HISTORY_ROUTE = re.compile(r'^- \*\*Route:\*\* (\w+)')
+HISTORY_LABEL = re.compile(r'^## \[([0-9a-f]+)\]\n- \*\*Query pattern:\*\* .*\n- \*\*Route:\*\* (\w+)', re.MULTILINE)
+
+# Words that mark an entry as evidence for routing (same rules as the hook
+# has always used: complex quirks boost deep, simple patterns suggest fast)
+COMPLEXITY_WORDS = ('complex', 'tricky', 'careful', 'unusual', 'non-standard')
+SIMPLICITY_WORDS = ('simple', 'straightforward', 'always', 'standard')
+
+STOP_WORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'from', 'are', 'was', 'were',
+    'has', 'have', 'had', 'not', 'but', 'its', 'into', 'than', 'then', 'when',
+    'use', 'uses', 'used', 'high', 'medium', 'low',
+}
+
+
+def find_knowledge_dir() -> Path:
+    """Locate the knowledge directory (plugin root first, then cwd), as the hook does."""
+    for candidate in (Path(__file__).resolve().parent.parent / "knowledge", Path.cwd() / "knowledge"):
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def tokenize(text: str) -> list:
+    """Index terms in text (lowercase, 3+ chars, no stop words)."""
+    return [t for t in TERM.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def routing_terms(text: str) -> set:
+    """Plain-word routing keywords in text (no stop words)."""
+    return {t for t in ROUTING_TERM.findall(text.lower()) if t not in STOP_WORDS}
+
+
+def split_entries(content: str, filename: str) -> list:
+    """Split a learnings file into raw entries: (entry_id, header_line_no, text)."""
+    entries = []
+    current = None
+    seen = {}
+    for line_no, line in enumerate(content.splitlines(), 1):
+        if ENTRY_HEADER.match(line):
+            if current:
+                entries.append(current)
+            # Stable ID from file + header; duplicates get an ordinal suffix
+            header = line.strip().lower()
+            ordinal = seen.get(header, 0)
+            seen[header] = ordinal + 1
+            entry_id = hashlib.md5(f"{filename}\0{header}\0{ordinal}".encode()).hexdigest()[:10]
+            current = [entry_id, line_no, [line]]
+        elif current:
+            current[2].append(line)
+    if current:
+        entries.append(current)
+    return [(entry_id, line_no, "\n".join(lines).strip()) for entry_id, line_no, lines in entries]
+
+
+def parse_entry(text: str, filename: str, line_no: int) -> dict:
+    """Parse one entry's type, title, fields, terms and routing evidence."""
+    lines = text.splitlines()
+    header = ENTRY_HEADER.match(lines[0])
+    entry_type, title = header.group(1).lower(), header.group(2).strip()
+    fields = {}
+    for line in lines[1:]:
+        field = FIELD_LINE.match(line)
+        if field:
+            fields[field.group(1).strip().lower()] = field.group(2).strip()
+
+    lowered = text.lower()
+    entry = {
+        "type": entry_type,
+        "title": title,
+        "file": filename,
+        "line": line_no,
+        "hash": hashlib.md5(text.encode()).hexdigest()[:12],
+        "fields": fields,
+        "date": fields.get("discovered") or fields.get("made") or "",
+        "terms": sorted(set(tokenize(title + " " + " ".join(fields.values())))),
+    }
+    # Routing evidence: location words of complex quirks, insight words of simple patterns
+    if entry_type == "quirk" and any(w in lowered for w in COMPLEXITY_WORDS) and fields.get("location"):
+        entry["deep_terms"] = sorted(routing_terms(fields["location"]))
+    if entry_type == "pattern" and any(w in lowered for w in SIMPLICITY_WORDS) and fields.get("insight"):
+        entry["fast_terms"] = sorted(routing_terms(fields["insight"]))
+    return entry
+
+
+def files_signature(learnings_dir: Path) -> dict:
+    """{filename: [mtime_ns, size]} for every learnings file."""
+    signature = {}
+    try:
+        with os.scandir(learnings_dir) as it:
+            for item in it:
+                if item.name.endswith(".md") and item.is_file():
+                    st = item.stat()
+                    signature[item.name] = [st.st_mtime_ns, st.st_size]
+    except OSError:
+        pass
+    return signature
+
+
+def _remove_postings(index: dict, entry_id: str):
+    for term in index["entries"][entry_id]["terms"]:
+        posting = index["postings"].get(term)
+        if posting:
+            try:
+                posting.remove(entry_id)
+            except ValueError:
+                pass
+            if not posting:
+                del index["postings"][term]
+    del index["entries"][entry_id]
+
+
+def update_index(knowledge_dir: Path, signature: dict = None) -> tuple[dict, int]:
+    """Bring the index up to date with the learnings files.
+
+    Returns (index, entries_reparsed). Unchanged files are skipped by
+    signature; in changed files only entries whose content hash changed are
+    re-parsed.
+    """
+    learnings_dir = knowledge_dir / "learnings"
+    index_path = knowledge_dir / "cache" / INDEX_FILE
+    signature = signature if signature is not None else files_signature(learnings_dir)
+
+    index = read_json(index_path)
+    if not index or index.get("version") != INDEX_VERSION:
+        index = {"version": INDEX_VERSION, "files": {}, "entries": {}, "postings": {}}
+
+    reparsed = 0
+    changed = False
+    for filename in list(index["files"]):
+        if filename not in signature:
+            for entry_id in index["files"].pop(filename)["entries"]:
+                _remove_postings(index, entry_id)
+            changed = True
+
+    for filename, sig in signature.items():
+        known = index["files"].get(filename)
+        if known and known["sig"] == sig:
+            continue
+        changed = True
+        try:
+            content = (learnings_dir / filename).read_text()
+        except OSError:
+            continue
+        old_ids = set(known["entries"]) if known else set()
+        new_ids = []
+        for entry_id, line_no, text in split_entries(content, filename):
+            new_ids.append(entry_id)
+            content_hash = hashlib.md5(text.encode()).hexdigest()[:12]
+            existing = index["entries"].get(entry_id)
+            if existing and existing["hash"] == content_hash:
+                existing["line"] = line_no
+                continue
+            if existing:
+                _remove_postings(index, entry_id)
+            entry = parse_entry(text, filename, line_no)
+            index["entries"][entry_id] = entry
+            for term in entry["terms"]:
+                index["postings"].setdefault(term, []).append(entry_id)
+            reparsed += 1
+        for entry_id in old_ids - set(new_ids):
+            if entry_id in index["entries"]:
+                _remove_postings(index, entry_id)
+        index["files"][filename] = {"sig": sig, "entries": new_ids}
+
+    if changed:
+        atomic_write_json(index_path, index)
+        atomic_write_json(knowledge_dir / "cache" / KEYWORDS_FILE, build_keyword_cache(index, signature))
+    return index, reparsed
+
+
+def build_keyword_cache(index: dict, signature: dict) -> dict:
+    """Small routing summary of the index, keyed to the files it was built from."""
+    deep, fast = set(), set()
+    for entry in index["entries"].values():
+        deep.update(entry.get("deep_terms", ()))
+        fast.update(entry.get("fast_terms", ()))
+    return {"version": INDEX_VERSION, "signature": signature,
+            "deep_keywords": sorted(deep), "fast_keywords": sorted(fast)}
+
+
+def parse_history(path: Path) -> list:
+    """Labeled prompts from the classification cache: [(terms, route)]."""
+    history = []
+    query = None
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                match = HISTORY_QUERY.match(line)
+                if match:
+                    query = match.group(1)
+                    continue
+                match = HISTORY_ROUTE.match(line)
+                if match and query is not None:
+                    history.append((routing_terms(query), match.group(1)))
+                    query = None
+    except OSError:
+        pass
+    return history
+
+
+def history_labels(path: Path) -> list:
+    """The classification cache's labels as "fingerprint:route" strings (what the weights learn from)."""
+    try:
+        return [f"{fingerprint}:{route}" for fingerprint, route in HISTORY_LABEL.findall(path.read_text())]
+    except OSError:
+        return []
+
+
+def _history_stat(path: Path) -> list:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def build_weight_table(index: dict, keywords: dict, history: list) -> dict:
+    """Weight each routing keyword by how much evidence a match carries.
+
+    A term's base weight is its IDF over all documents (learnings entries
+    plus labeled prompts), normalized to (0, 1]: a term found in a single
+    document weighs 1, one found everywhere close to 0. It is then scaled by
+    the smoothed share of labeled prompts containing it that went the way
+    the keyword points (deep for deep keywords, fast/standard for fast ones),
+    so words that keep showing up in cheap prompts stop boosting Opus.
+    """
+    total_docs = len(index["entries"]) + len(history)
+    norm = math.log(1 + max(total_docs, 1))
+    labeled = {}
+    for terms, route in history:
+        for term in terms:
+            counts = labeled.setdefault(term, {"total": 0, "deep": 0})
+            counts["total"] += 1
+            counts["deep"] += route == "deep"
+
+    def weights(terms, toward_deep):
+        table = {}
+        for term in terms:
+            counts = labeled.get(term, {"total": 0, "deep": 0})
+            df = len(index["postings"].get(term, ())) + counts["total"]
+            idf = math.log(1 + total_docs / max(df, 1)) / norm
+            agreeing = counts["deep"] if toward_deep else counts["total"] - counts["deep"]
+            precision = (agreeing + 1) / (counts["total"] + 2)
+            weight = round(min(1.0, idf * 2 * precision), 4)
+            if weight >= MIN_WEIGHT:
+                table[term] = weight
+        return table
+
+    return {"deep": weights(keywords["deep_keywords"], True),
+            "fast": weights(keywords["fast_keywords"], False)}
+
+
+def load_routing_weights(knowledge_dir: Path) -> dict:
+    """Keyword weights for the hook: {"deep": {term: weight}, "fast": {term: weight}}.
+
+    Uses learned-weights.json while the learnings files are unchanged and
+    fewer than HISTORY_REBUILD_ENTRIES labeled history entries were added or
+    replaced since it was built (the table keeps the labels it was built
+    from; the history is only read when its size or mtime moved); otherwise
+    rebuilds it from the (incrementally updated) index.
+    """
+    signature = files_signature(knowledge_dir / "learnings")
+    if not signature:
+        return {"deep": {}, "fast": {}}
+    history_path = knowledge_dir / "cache" / HISTORY_FILE
+    history_stat = _history_stat(history_path)
+
+    path = knowledge_dir / "cache" / WEIGHTS_FILE
+    table = read_json(path)
+    labels = None
+    if table and table.get("version") == INDEX_VERSION and table.get("signature") == signature:
+        if history_stat == table.get("history_stat"):
+            return {"deep": table["deep"], "fast": table["fast"]}
+        labels = history_labels(history_path)
+        if len(set(labels) - set(table.get("history", ()))) < HISTORY_REBUILD_ENTRIES:
+            return {"deep": table["deep"], "fast": table["fast"]}
+
+    index, _ = update_index(knowledge_dir, signature)
+    weights = build_weight_table(index, build_keyword_cache(index, signature), parse_history(history_path))
+    try:
+        atomic_write_json(path, {"version": INDEX_VERSION, "signature": signature, "history_stat": history_stat,
+                                 "history": sorted(labels if labels is not None else history_labels(history_path)),
+                                 **weights})
+    except OSError:
+        pass  # The table only saves work next time
+    return weights
+
+
+def search(index: dict, query: str, entry_type: str = None, limit: int = 10) -> list:
+    """Entries matching query terms, ranked by matched terms (all terms first)."""
+    terms = tokenize(query)
+    if not terms:
+        return []
+    scores = {}
+    for term in set(terms):
+        # Exact term postings, plus prefix matches for partial words
+        postings = index["postings"].get(term)
+        if postings is None:
+            postings = [eid for t, ids in index["postings"].items() if t.startswith(term) for eid in ids]
+        for entry_id in set(postings):
+            scores[entry_id] = scores.get(entry_id, 0) + 1
+    # Most matched terms first, newest first among equals
+    ranked = sorted(scores.items(), key=lambda item: (item[1], index["entries"][item[0]]["date"]),
+                    reverse=True)
+    results = []
+    for entry_id, score in ranked:
+        entry = index["entries"][entry_id]
+        if entry_type and entry["type"] != entry_type:
+            continue
+        results.append({"id": entry_id, "score": score, **entry})
+        if len(results) >= limit:
+            break
+    return results
+
+
+def status(index: dict, recent: int = 5) -> dict:
+    """Entry counts per type and the most recent entries."""
+    counts = {}
+    for entry in index["entries"].values():
+        counts[entry["type"]] = counts.get(entry["type"], 0) + 1
+    latest = sorted(index["entries"].items(), key=lambda item: item[1]["date"], reverse=True)[:recent]
+    return {"counts": counts, "total": len(index["entries"]), "terms": len(index["postings"]),
+            "recent": [{"id": eid, **entry} for eid, entry in latest]}
+
+
+def format_entry(entry: dict) -> str:
+    confidence = entry["fields"].get("confidence", "")
+    meta = " | ".join(p for p in (entry["date"], f"Confidence: {confidence}" if confidence else "") if p)
+    return (f"[{entry['type'].capitalize()}] \"{entry['title']}\"  ({entry['file']}:{entry['line']})\n"
+            f"  {meta}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search and summarize the Claude Router knowledge base")
+    parser.add_argument("--knowledge-dir", help="knowledge directory (default: plugin root or ./knowledge)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    search_cmd = sub.add_parser("search", help="find entries by keyword")
+    search_cmd.add_argument("terms", nargs="+")
+    search_cmd.add_argument("--type", choices=["pattern", "quirk", "decision"])
+    search_cmd.add_argument("--limit", type=int, default=10)
+    sub.add_parser("status", help="entry counts and recent learnings")
+    weights_cmd = sub.add_parser("weights", help="learned routing keyword weights")
+    weights_cmd.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    knowledge_dir = Path(args.knowledge_dir).expanduser() if args.knowledge_dir else find_knowledge_dir()
+    if not knowledge_dir:
+        print("No knowledge directory found.")
+        sys.exit(1)
+    if args.command == "weights":
+        weights = load_routing_weights(knowledge_dir)
+        for route in ("deep", "fast"):
+            ranked = sorted(weights[route].items(), key=lambda item: item[1], reverse=True)
+            print(f"{route.capitalize()} keywords ({len(ranked)}):")
+            for term, weight in ranked[:args.limit]:
+                print(f"  {weight:.3f}  {term}")
+        return
+
+    index, _ = update_index(knowledge_dir)
+
+    if args.command == "search":
+        results = search(index, " ".join(args.terms), args.type, args.limit)
+        if not results:
+            print(f"No learnings match: {' '.join(args.terms)}")
+            return
+        for entry in results:
+            print(format_entry(entry))
+        return
+
+    summary = status(index)
+    print(f"Learnings: {summary['total']} entries, {summary['terms']} indexed terms")
+    for entry_type, count in sorted(summary["counts"].items()):
+        print(f"  - {entry_type.capitalize()}s: {count}")
+    if summary["recent"]:
+        print("\nRecent:")
+        for entry in summary["recent"]:
+            print(format_entry(entry))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Prometheus Textfile Export
+Renders router health as a Prometheus text-format file for node_exporter's
+textfile collector: decisions by route and method, cache hits per tier,
+LLM fallback outcomes, errors, hook latency histograms and the LLM
+circuit state.
+
+Export is opt-in: set CLAUDE_ROUTER_PROM_FILE to a path inside the
+collector directory (e.g. /var/lib/node_exporter/textfile/claude_router.prom).
+The hook then re-renders the file from the stats it has just written,
+while still holding the stats lock, so successive files never go
+backwards (Prometheus would read a lower counter as a reset). To keep
+that off the per-prompt path, a render happens only if the file is older
+than CLAUDE_ROUTER_PROM_INTERVAL seconds (default 15, about one scrape),
+which costs one stat() on the prompts in between. The file is replaced
+atomically, so the collector never reads half of it.
+
+Latency histograms are re-bucketed from the stored log-linear buckets
+(router_histogram) to PROM_BUCKETS_MS; a sample counts under a bound only
+if its whole stored bucket is below it, so counts are exact at the
+stored bucket precision (~9%) and never overstated.
+
+Usage:
+    python3 router_metrics.py [--output PATH] [--stats PATH]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from router_breaker import BREAKER_FILE, STATES as CIRCUIT_STATES, load_breaker
+from router_histogram import bucket_upper_ms
+from router_state import atomic_write, update_json
+
+STATS_FILE = Path.home() / ".claude" / "router-stats.json"
+
+PROM_INTERVAL = 15.0  # seconds
+PREFIX = "claude_router"
+PROM_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+LLM_OUTCOMES = {"calls": "called", "skipped": "skipped_agreement", "circuit_skipped": "skipped_circuit_open"}
+
+
+def prom_file() -> Path:
+    """Configured .prom path (CLAUDE_ROUTER_PROM_FILE), or None if export is off."""
+    configured = os.environ.get("CLAUDE_ROUTER_PROM_FILE")
+    return Path(configured).expanduser() if configured else None
+
+
+def prom_interval() -> float:
+    try:
+        return max(0.0, float(os.environ.get("CLAUDE_ROUTER_PROM_INTERVAL", PROM_INTERVAL)))
+    except ValueError:
+        return PROM_INTERVAL
+
+
+def export_due(path: Path, interval: float) -> bool:
+    try:
+        return time.time() - path.stat().st_mtime >= interval
+    except OSError:
+        return True
+
+
+def _labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}" if labels else ""
+
+
+def _histogram_lines(name: str, label: str, groups: dict) -> list:
+    lines = []
+    for key in sorted(groups):
+        hist = groups[key] or {}
+        uppers = sorted((bucket_upper_ms(int(i)), count) for i, count in hist.get("b", {}).items())
+        cumulative, position = 0, 0
+        for bound in PROM_BUCKETS_MS:
+            while position < len(uppers) and uppers[position][0] <= bound:
+                cumulative += uppers[position][1]
+                position += 1
+            lines.append(f"{name}_bucket{_labels(**{label: key, 'le': f'{bound / 1000:g}'})} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(**{label: key, 'le': '+Inf'})} {hist.get('n', 0)}")
+        lines.append(f"{name}_sum{_labels(**{label: key})} {hist.get('sum', 0.0) / 1000:.6f}")
+        lines.append(f"{name}_count{_labels(**{label: key})} {hist.get('n', 0)}")
+    return lines
+
+
+def render_metrics(stats: dict, breaker: dict = None) -> str:
+    """Prometheus text exposition of stats (and the LLM breaker state)."""
+    out = []
+
+    def header(name: str, kind: str, help_text: str):
+        out.append(f"# HELP {PREFIX}_{name} {help_text}")
+        out.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+    def metric(name: str, kind: str, help_text: str, samples: list):
+        header(name, kind, help_text)
+        out.extend(f"{PREFIX}_{name}{_labels(**labels)} {value}" for labels, value in samples)
+
+    metric("queries_total", "counter", "Prompts routed (all-time).",
+           [({}, stats.get("total_queries", 0))])
+    metric("decisions_total", "counter", "Routing decisions by route and classification method.",
+           [(dict(zip(("route", "method"), key.split("|", 1))), count)
+            for key, count in sorted(stats.get("decisions", {}).items())])
+    metric("routes_total", "counter", "Prompts by route (all-time).",
+           [({"route": route}, count) for route, count in sorted(stats.get("routes", {}).items())])
+    metric("cache_hits_total", "counter", "Classification cache hits by tier.",
+           [({"tier": tier}, stats.get("cache_hits", {}).get(tier, 0)) for tier in ("memory", "file", "pack")])
+
+    fallback = stats.get("llm_fallback", {})
+    metric("llm_fallback_total", "counter", "Low-confidence prompts by LLM fallback outcome (called or skipped).",
+           [({"outcome": outcome}, fallback.get(key, 0)) for key, outcome in LLM_OUTCOMES.items()])
+    metric("llm_fallback_failures_total", "counter", "LLM fallback calls that failed.",
+           [({}, fallback.get("failures", 0))])
+    metric("llm_fallback_early_stops_total", "counter", "Streamed LLM answers closed once the route was known.",
+           [({}, fallback.get("early_stops", 0))])
+    metric("llm_tokens_total", "counter", "Classifier tokens by kind.",
+           [({"kind": kind}, count) for kind, count in sorted(fallback.get("tokens", {}).items())])
+    metric("errors_total", "counter", "Hook errors that degraded a decision, by kind.",
+           [({"kind": kind}, count) for kind, count in sorted(stats.get("errors", {}).items())])
+
+    latency = stats.get("latency", {})
+    header("hook_latency_seconds", "histogram", "End-to-end hook latency by route.")
+    out.extend(_histogram_lines(f"{PREFIX}_hook_latency_seconds", "route", latency.get("routes", {})))
+    header("hook_latency_by_method_seconds", "histogram", "End-to-end hook latency by classification method.")
+    out.extend(_histogram_lines(f"{PREFIX}_hook_latency_by_method_seconds", "method", latency.get("methods", {})))
+
+    if breaker is not None:
+        state = breaker.get("state", "closed")
+        metric("llm_circuit_state", "gauge", "LLM fallback circuit breaker state (1 = current).",
+               [({"state": s}, int(s == state)) for s in CIRCUIT_STATES])
+        metric("llm_circuit_failures", "gauge", "Consecutive LLM fallback failures.",
+               [({}, breaker.get("failures", 0))])
+        metric("llm_circuit_trips_total", "counter", "Times the LLM circuit breaker has opened.",
+               [({}, breaker.get("trips_total", 0))])
+
+    metric("estimated_savings_dollars_total", "counter", "Estimated savings vs always using Opus.",
+           [({}, round(stats.get("estimated_savings", 0.0), 6))])
+    try:
+        updated = datetime.fromisoformat(stats["last_updated"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        updated = time.time()
+    metric("last_update_timestamp_seconds", "gauge", "When the stats behind this file were last updated.",
+           [({}, int(updated))])
+    return "\n".join(out) + "\n"
+
+
+def export_metrics(stats: dict, path: Path, breaker_file: Path = BREAKER_FILE):
+    atomic_write(path, render_metrics(stats, load_breaker(breaker_file)))
+
+
+def maybe_export(stats: dict):
+    """Re-render the configured .prom file from stats if it is due; never raises."""
+    try:
+        path = prom_file()
+        if path and export_due(path, prom_interval()):
+            export_metrics(stats, path)
+    except Exception:
+        pass  # Metrics export must never break the hook
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write Claude Router metrics in Prometheus text format")
+    parser.add_argument("--output", help="file to write (default: CLAUDE_ROUTER_PROM_FILE, else stdout)")
+    parser.add_argument("--stats", default=str(STATS_FILE), help="router stats file")
+    args = parser.parse_args()
+
+    stats_file = Path(args.stats).expanduser()
+    if not stats_file.exists():
+        print("No router stats found yet - run some queries through the router first.", file=sys.stderr)
+        sys.exit(1)
+    output = Path(args.output).expanduser() if args.output else prom_file()
+
+    def render(stats):
+        # Under the stats lock, like the hook, so the file never goes backwards
+        if output:
+            export_metrics(stats, output)
+        else:
+            sys.stdout.write(render_metrics(stats, load_breaker()))
+        return None  # stats unchanged
+
+    if not update_json(stats_file, render, timeout=5.0):
+        print("Stats file is busy - try again.", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Team Cache Pack
+A read-only, precompiled classification cache that a team can commit or
+distribute, consulted after the local cache (knowledge/cache/, personal
+and gitignored) and before the rules:
+
+    memory cache -> classifications.md -> cache pack -> rules / LLM
+
+Local entries therefore always override the pack, and pack hits are not
+copied into the local cache, so the local cache keeps only where this
+engineer differs from the team.
+
+The pack lives at knowledge/classifications.pack (outside the ignored
+cache/ directory, so it is committed by default), or wherever
+CLAUDE_ROUTER_CACHE_PACK points. Build it from one or more engineers'
+classifications.md files, earlier packs, or both:
+
+    python3 router_pack.py build alice.md bob.md old.pack --label 2026.10 --min-hits 2
+
+Sources vote per fingerprint with their hit counts (an earlier pack's
+entries count as --min-hits); the winning route keeps its highest
+confidence, and fingerprints with fewer than --min-hits hits in total are
+left out. The pack stores no prompt text, only fingerprints.
+
+Format (little-endian): a header (magic "CRPK", format version,
+fingerprint scheme, route count, entry count, label length, build time),
+the label, the route names (length-prefixed), then one 8-byte record per
+entry sorted by fingerprint: the 6 fingerprint bytes, a route index and
+the confidence in hundredths. A lookup is a binary search over the
+memory-mapped records, so it reads a few pages however large the pack
+is, and nothing is parsed per entry. Packs with another format version or
+fingerprint scheme (see router_features) are ignored.
+
+Usage:
+    python3 router_pack.py build [SOURCE ...] [--output PATH] [--label LABEL] [--min-hits 2]
+    python3 router_pack.py info [PATH]
+    python3 router_pack.py lookup <prompt> [--pack PATH]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from router_features import PromptFeatures
+from router_knowledge import find_knowledge_dir
+from router_state import atomic_write
+
+PACK_FILE = "classifications.pack"
+MAGIC = b"CRPK"
+FORMAT_VERSION = 1
+FINGERPRINT_SCHEME = 1  # md5 of the first ten key terms, 12 hex chars (router_features)
+HEADER = struct.Struct("<4sBBBxIIQ")  # magic, version, scheme, routes, entries, label bytes, built (unix)
+RECORD = struct.Struct("<6sBB")  # fingerprint, route index, confidence (hundredths)
+MIN_HITS = 2
+
+CACHE_ENTRY = re.compile(r"^## \[([0-9a-f]{12})\](.*?)(?=^## \[|\Z)", re.MULTILINE | re.DOTALL)
+
+
+def pack_path(knowledge_dir: Path = None) -> Path:
+    """The configured pack (CLAUDE_ROUTER_CACHE_PACK), else knowledge_dir's, else None."""
+    configured = os.environ.get("CLAUDE_ROUTER_CACHE_PACK")
+    if configured:
+        return Path(configured).expanduser()
+    return knowledge_dir / PACK_FILE if knowledge_dir else None
+
+
+class CachePack:
+    """A memory-mapped cache pack; lookup(fingerprint) -> (route, confidence) or None."""
+
+    __slots__ = ("path", "label", "built", "routes", "count", "_data", "_offset")
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path} is not a cache pack")
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, scheme, route_count, count, label_size, built = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or scheme != FINGERPRINT_SCHEME:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} cache pack")
+        offset = HEADER.size
+        label = data[offset:offset + label_size].decode("utf-8", "replace")
+        offset += label_size
+        routes = []
+        for _ in range(route_count):
+            size_byte = data[offset]
+            routes.append(data[offset + 1:offset + 1 + size_byte].decode())
+            offset += 1 + size_byte
+        if offset + count * RECORD.size != size:
+            raise ValueError(f"{path} is truncated")
+
+        self.path = path
+        self.label = label
+        self.built = built
+        self.routes = tuple(routes)
+        self.count = count
+        self._data = data
+        self._offset = offset
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, fingerprint: str):
+        try:
+            key = bytes.fromhex(fingerprint)
+        except ValueError:
+            return None
+        data, offset, size = self._data, self._offset, RECORD.size
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at = offset + mid * size
+            probe = data[at:at + 6]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return self.routes[data[at + 6]], data[at + 7] / 100
+        return None
+
+    def entries(self):
+        """(fingerprint, route, confidence) for every entry, in fingerprint order."""
+        for i in range(self.count):
+            raw, route, confidence = RECORD.unpack_from(self._data, self._offset + i * RECORD.size)
+            yield raw.hex(), self.routes[route], confidence / 100
+
+
+def open_pack(path: Path) -> CachePack:
+    """The pack at path, or None if it is missing or not a readable pack."""
+    try:
+        return CachePack(path) if path else None
+    except (OSError, ValueError, IndexError, struct.error):
+        return None
+
+
+def encode_pack(entries: dict, label: str = "", built: int = None) -> bytes:
+    """Pack bytes for entries {fingerprint: (route, confidence)}."""
+    routes = sorted({route for route, _ in entries.values()})
+    if len(routes) > 255:
+        raise ValueError("too many routes for a cache pack")
+    route_index = {route: i for i, route in enumerate(routes)}
+    label_bytes = label.encode()
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, FINGERPRINT_SCHEME, len(routes), len(entries), len(label_bytes),
+                         int(built if built is not None else time.time())), label_bytes]
+    parts.extend(bytes([len(route.encode())]) + route.encode() for route in routes)
+    for fingerprint in sorted(entries):
+        route, confidence = entries[fingerprint]
+        parts.append(RECORD.pack(bytes.fromhex(fingerprint), route_index[route],
+                                 max(0, min(100, round(confidence * 100)))))
+    return b"".join(parts)
+
+
+def read_cache_entries(content: str) -> dict:
+    """{fingerprint: (route, confidence, hit count)} from classifications.md content."""
+    entries = {}
+    for fingerprint, body in CACHE_ENTRY.findall(content):
+        route = re.search(r"\*\*Route:\*\* (\w+)", body)
+        confidence = re.search(r"\*\*Confidence:\*\* ([\d.]+)", body)
+        hits = re.search(r"\*\*Hit count:\*\* (\d+)", body)
+        if route and confidence:
+            entries[fingerprint] = (route.group(1), float(confidence.group(1)), int(hits.group(1)) if hits else 1)
+    return entries
+
+
+def merge_sources(paths: list, min_hits: int = MIN_HITS) -> dict:
+    """{fingerprint: (route, confidence)} voted from classifications.md files and packs."""
+    votes = {}  # fingerprint -> {route: [hits, best confidence]}
+
+    def vote(fingerprint: str, route: str, confidence: float, hits: int):
+        tally = votes.setdefault(fingerprint, {}).setdefault(route, [0, 0.0])
+        tally[0] += hits
+        tally[1] = max(tally[1], confidence)
+
+    for path in paths:
+        pack = open_pack(path)
+        if pack is not None:
+            for fingerprint, route, confidence in pack.entries():
+                vote(fingerprint, route, confidence, min_hits)
+            continue
+        for fingerprint, (route, confidence, hits) in read_cache_entries(path.read_text()).items():
+            vote(fingerprint, route, confidence, hits)
+
+    merged = {}
+    for fingerprint, routes in votes.items():
+        if sum(hits for hits, _ in routes.values()) < min_hits:
+            continue
+        route, (_, confidence) = max(routes.items(), key=lambda item: (item[1][0], item[1][1]))
+        merged[fingerprint] = (route, confidence)
+    return merged
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build and inspect Claude Router team cache packs")
+    parser.add_argument("--knowledge-dir", help="knowledge directory (default: plugin root or ./knowledge)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="build a pack from classifications.md files and packs")
+    build_cmd.add_argument("sources", nargs="*", help="default: knowledge/cache/classifications.md")
+    build_cmd.add_argument("--output", help=f"pack to write (default: knowledge/{PACK_FILE})")
+    build_cmd.add_argument("--label", default=datetime.now().strftime("%Y-%m-%d"), help="pack version label")
+    build_cmd.add_argument("--min-hits", type=int, default=MIN_HITS, help="leave out rarer fingerprints")
+    info_cmd = sub.add_parser("info", help="label, build time and route counts of a pack")
+    info_cmd.add_argument("path", nargs="?")
+    lookup_cmd = sub.add_parser("lookup", help="look a prompt up in a pack")
+    lookup_cmd.add_argument("prompt")
+    lookup_cmd.add_argument("--pack")
+    args = parser.parse_args()
+
+    knowledge_dir = Path(args.knowledge_dir).expanduser() if args.knowledge_dir else (
+        find_knowledge_dir() or Path.cwd() / "knowledge")
+
+    if args.command == "build":
+        sources = [Path(s).expanduser() for s in args.sources] or [knowledge_dir / "cache" / "classifications.md"]
+        missing = [str(s) for s in sources if not s.exists()]
+        if missing:
+            print(f"Not found: {', '.join(missing)}", file=sys.stderr)
+            sys.exit(1)
+        output = Path(args.output).expanduser() if args.output else knowledge_dir / PACK_FILE
+        entries = merge_sources(sources, args.min_hits)
+        atomic_write(output, encode_pack(entries, args.label))
+        print(f"Wrote {output}: {len(entries)} entries from {len(sources)} sources (label {args.label})")
+        return
+
+    explicit = args.path if args.command == "info" else args.pack
+    path = Path(explicit).expanduser() if explicit else pack_path(knowledge_dir)
+    pack = open_pack(path)
+    if pack is None:
+        print(f"No readable cache pack at {path}.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == "info":
+        routes = {}
+        for _, route, _ in pack.entries():
+            routes[route] = routes.get(route, 0) + 1
+        print(f"{path}: label {pack.label or '-'}, built {datetime.fromtimestamp(pack.built).isoformat()}, "
+              f"{len(pack)} entries ({', '.join(f'{r} {n}' for r, n in sorted(routes.items())) or 'none'})")
+    else:
+        fingerprint = PromptFeatures(args.prompt).fingerprint
+        hit = pack.lookup(fingerprint)
+        print(f"[{fingerprint}] " + (f"{hit[0]} ({hit[1]:.2f})" if hit else "not in pack"))
+
+
+if __name__ == "__main__":
+    main()
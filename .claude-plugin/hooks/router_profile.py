@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Hook Profiling
+Opt-in cProfile capture of real hook runs, and a command that merges the
+captured profiles into one hot-spot report.
+
+Every prompt is a separate short-lived hook process, so a single profile
+says little and a synthetic one may miss what real prompts hit. With
+CLAUDE_ROUTER_PROFILE set to a sampling rate ("1" = every run, "0.05" = one
+run in twenty), the hook's main() runs under cProfile and its stats are
+written to one file per run in ~/.claude/router-profiles/ (or
+CLAUDE_ROUTER_PROFILE_DIR). Only the newest CLAUDE_ROUTER_PROFILE_MAX
+profiles (default 2000) are kept; older ones are deleted as new ones land.
+Unsampled runs pay for one environment lookup; cProfile is not imported.
+
+main() is profiled from its first line, so module imports are not
+included (use `python3 -X importtime` for those).
+
+Usage:
+    python3 router_profile.py [--top 25] [--sort cumulative|self] [--since YYYY-MM-DD]
+                              [--until YYYY-MM-DD] [--last N] [--dir PATH] [--json]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import json
+import marshal
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from router_state import atomic_write
+
+PROFILE_DIR = Path.home() / ".claude" / "router-profiles"
+PROFILE_SUFFIX = ".prof"
+MAX_PROFILES = 2000
+TOP_FUNCTIONS = 25
+
+# The profiler's own bookkeeping, not hook work
+_PROFILER_ENTRIES = ("<method 'disable' of '_lsprof.Profiler' objects>",)
+
+
+def sample_rate() -> float:
+    """Share of hook runs to profile (CLAUDE_ROUTER_PROFILE), 0 if profiling is off."""
+    value = os.environ.get("CLAUDE_ROUTER_PROFILE", "").strip().lower()
+    if value in ("", "0", "false", "off", "no"):
+        return 0.0
+    if value in ("true", "on", "yes"):
+        return 1.0
+    try:
+        return min(1.0, max(0.0, float(value)))
+    except ValueError:
+        return 0.0
+
+
+def profile_dir() -> Path:
+    configured = os.environ.get("CLAUDE_ROUTER_PROFILE_DIR")
+    return Path(configured).expanduser() if configured else PROFILE_DIR
+
+
+def max_profiles() -> int:
+    try:
+        return max(1, int(os.environ.get("CLAUDE_ROUTER_PROFILE_MAX", MAX_PROFILES)))
+    except ValueError:
+        return MAX_PROFILES
+
+
+def run(main):
+    """Call main(), under cProfile if this run is sampled."""
+    rate = sample_rate()
+    if not rate:
+        return main()
+    import random
+    if random.random() >= rate:
+        return main()
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return main()
+    finally:
+        # main() ends with sys.exit(); the profile is saved on the way out
+        profiler.disable()
+        try:
+            save_profile(profiler, profile_dir(), max_profiles())
+        except OSError:
+            pass  # Profiling must never break the hook
+
+
+def save_profile(profiler, directory: Path, keep: int) -> Path:
+    """Write profiler's stats as <time_ns>-<pid>.prof and prune to the newest keep profiles."""
+    profiler.create_stats()
+    # time_ns first, so name order is capture order
+    path = directory / f"{time.time_ns()}-{os.getpid()}{PROFILE_SUFFIX}"
+    atomic_write(path, marshal.dumps(profiler.stats))  # the format pstats reads
+    names = sorted(n for n in os.listdir(directory) if n.endswith(PROFILE_SUFFIX))
+    for name in names[:max(0, len(names) - keep)]:
+        try:
+            os.unlink(directory / name)
+        except OSError:
+            pass
+    return path
+
+
+def captured_at(path: Path) -> datetime:
+    try:
+        return datetime.fromtimestamp(int(path.name.split("-", 1)[0]) / 1e9)
+    except ValueError:
+        return datetime.fromtimestamp(path.stat().st_mtime)
+
+
+def select_profiles(directory: Path, since: str = None, until: str = None, last: int = None) -> list:
+    """Profile files in capture order, filtered by date (inclusive, YYYY-MM-DD) and count."""
+    try:
+        paths = sorted(p for p in directory.iterdir() if p.name.endswith(PROFILE_SUFFIX))
+    except FileNotFoundError:
+        return []
+    if since or until:
+        paths = [p for p in paths
+                 if (not since or captured_at(p).date().isoformat() >= since)
+                 and (not until or captured_at(p).date().isoformat() <= until)]
+    return paths[-last:] if last else paths
+
+
+def _label(func: tuple) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # built-in
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def aggregate(paths: list, top: int = TOP_FUNCTIONS, sort: str = "cumulative") -> dict:
+    """Merge the profiles in paths; per-run mean times of the top functions.
+
+    Returns None if none of them could be read. Unreadable profiles (e.g.
+    from another Python version) are counted and skipped.
+    """
+    import pstats
+
+    stats, unreadable = None, 0
+    for path in paths:
+        try:
+            if stats is None:
+                stats = pstats.Stats(str(path))
+            else:
+                stats.add(str(path))
+        except (OSError, EOFError, ValueError, TypeError):
+            unreadable += 1
+    if stats is None:
+        return None
+
+    runs = len(paths) - unreadable
+    entries = [(func, calls, tottime, cumtime)
+               for func, (_primitive, calls, tottime, cumtime, _callers) in stats.stats.items()
+               if func[2] not in _PROFILER_ENTRIES]
+    total = sum(tottime for _, _, tottime, _ in entries)
+    entries.sort(key=lambda e: e[3] if sort == "cumulative" else e[2], reverse=True)
+    dates = [captured_at(p) for p in paths]
+    return {
+        "runs": runs,
+        "unreadable": unreadable,
+        "first": min(dates).isoformat(timespec="seconds"),
+        "last": max(dates).isoformat(timespec="seconds"),
+        "mean_run_ms": round(total * 1000 / runs, 3),
+        "sort": sort,
+        "functions": [{"function": _label(func), "calls_per_run": round(calls / runs, 2),
+                       "cumulative_ms": round(cumtime * 1000 / runs, 4), "self_ms": round(tottime * 1000 / runs, 4),
+                       "cumulative_share": round(cumtime / total, 4) if total else 0.0}
+                      for func, calls, tottime, cumtime in entries[:top]],
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [f"Hook profiles: {report['runs']} runs ({report['first']} to {report['last']}), "
+             f"mean main() {report['mean_run_ms']:.2f}ms",
+             f"Top {len(report['functions'])} by {report['sort']} time, per-run means:",
+             "",
+             f"{'cum ms':>9}{'self ms':>9}{'cum %':>7}{'calls':>9}  function"]
+    for f in report["functions"]:
+        lines.append(f"{f['cumulative_ms']:>9.3f}{f['self_ms']:>9.3f}{f['cumulative_share']:>7.0%}"
+                     f"{f['calls_per_run']:>9.1f}  {f['function']}")
+    if report["unreadable"]:
+        lines.append(f"\n{report['unreadable']} unreadable profiles skipped")
+    return "\n".join(lines)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merge captured hook profiles and report the hot spots")
+    parser.add_argument("--dir", default=None, help=f"profile directory (default: {PROFILE_DIR})")
+    parser.add_argument("--top", type=int, default=TOP_FUNCTIONS, help="functions to show")
+    parser.add_argument("--sort", choices=("cumulative", "self"), default="cumulative")
+    parser.add_argument("--since", help="only profiles captured on or after YYYY-MM-DD")
+    parser.add_argument("--until", help="only profiles captured on or before YYYY-MM-DD")
+    parser.add_argument("--last", type=int, help="only the newest N profiles")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    directory = Path(args.dir).expanduser() if args.dir else profile_dir()
+    paths = select_profiles(directory, args.since, args.until, args.last)
+    report = aggregate(paths, args.top, args.sort) if paths else None
+    if report is None:
+        print(f"No hook profiles in {directory} - set CLAUDE_ROUTER_PROFILE=1 (or a sampling rate "
+              "such as 0.1) and submit some prompts first.")
+        sys.exit(1)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
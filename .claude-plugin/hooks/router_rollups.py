@@ -0,0 +1,159 @@
+"""
+Claude Router - Time-Series Rollups
+Tiered, self-compacting routing history for long-range trends.
+
+Every routing decision lands in exactly one bucket: the current hour. When a
+new hour starts, buckets that have aged out of a tier are folded into the
+next coarser tier:
+
+    hourly (2 days) -> daily (90 days) -> weekly (2 years) -> monthly (20 years)
+
+so the store stays bounded (a few hundred buckets) over years of use, a
+write only touches one bucket, and any range query merges at most a few
+hundred pre-aggregated buckets.
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+from datetime import date, datetime, timedelta
+
+from router_histogram import merge, new_histogram, record
+
+TIERS = ("hourly", "daily", "weekly", "monthly")
+
+# Retention per tier before folding into the next one
+HOURLY_RETENTION_DAYS = 2
+DAILY_RETENTION_DAYS = 90
+WEEKLY_RETENTION_WEEKS = 104
+MONTHLY_RETENTION_MONTHS = 240
+
+
+def new_rollups() -> dict:
+    return {tier: {} for tier in TIERS}
+
+
+def new_bucket() -> dict:
+    return {"queries": 0, "routes": {}, "savings": 0.0, "latency": new_histogram()}
+
+
+def merge_bucket(target: dict, source: dict) -> dict:
+    """Add source's counts into target (in place)."""
+    target["queries"] = target.get("queries", 0) + source.get("queries", 0)
+    target["savings"] = round(target.get("savings", 0.0) + source.get("savings", 0.0), 6)
+    routes = target.setdefault("routes", {})
+    for route, count in source.get("routes", {}).items():
+        routes[route] = routes.get(route, 0) + count
+    target["latency"] = merge(target.get("latency"), source.get("latency"))
+    return target
+
+
+def bucket_start(tier: str, key: str) -> date:
+    """First day covered by a bucket key."""
+    if tier == "hourly":
+        return date.fromisoformat(key[:10])
+    if tier == "daily":
+        return date.fromisoformat(key)
+    if tier == "weekly":
+        year, week = key.split("-W")
+        return date.fromisocalendar(int(year), int(week), 1)
+    return date.fromisoformat(f"{key}-01")
+
+
+def bucket_key(tier: str, day: date) -> str:
+    if tier == "daily":
+        return day.isoformat()
+    if tier == "weekly":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day.strftime("%Y-%m")
+
+
+def compact(rollups: dict, now: datetime = None):
+    """Fold buckets that aged out of each tier into the next tier (in place)."""
+    today = (now or datetime.now()).date()
+    limits = {
+        "hourly": today - timedelta(days=HOURLY_RETENTION_DAYS),
+        "daily": today - timedelta(days=DAILY_RETENTION_DAYS),
+        "weekly": today - timedelta(weeks=WEEKLY_RETENTION_WEEKS),
+    }
+    for tier, next_tier in zip(TIERS, TIERS[1:]):
+        buckets = rollups.setdefault(tier, {})
+        target = rollups.setdefault(next_tier, {})
+        for key in [k for k in buckets if bucket_start(tier, k) < limits[tier]]:
+            next_key = bucket_key(next_tier, bucket_start(tier, key))
+            merge_bucket(target.setdefault(next_key, new_bucket()), buckets.pop(key))
+
+    monthly = rollups["monthly"]
+    for key in sorted(monthly)[:-MONTHLY_RETENTION_MONTHS]:
+        del monthly[key]
+
+
+def record_decision(rollups: dict, route: str, savings: float, latency_ms: float = None,
+                    now: datetime = None) -> dict:
+    """Record one routing decision in the current hour bucket.
+
+    Compaction only runs when a new hour bucket is opened, so it costs
+    nothing on the vast majority of writes.
+    """
+    now = now or datetime.now()
+    hourly = rollups.setdefault("hourly", {})
+    key = now.strftime("%Y-%m-%dT%H")
+    bucket = hourly.get(key)
+    if bucket is None:
+        bucket = hourly[key] = new_bucket()
+        compact(rollups, now)
+    bucket["queries"] += 1
+    bucket["routes"][route] = bucket["routes"].get(route, 0) + 1
+    bucket["savings"] = round(bucket["savings"] + savings, 6)
+    if latency_ms is not None:
+        record(bucket["latency"], latency_ms)
+    return rollups
+
+
+def record_latency_at(rollups: dict, latency_ms: float, when: datetime) -> bool:
+    """Record a latency sample measured at when in the bucket now covering it.
+
+    Used for samples merged after their decision (see the hook's
+    record_hook_latency); by then the hour may have been compacted into a
+    coarser tier. Returns False if no bucket covers it.
+    """
+    for tier in TIERS:
+        key = when.strftime("%Y-%m-%dT%H") if tier == "hourly" else bucket_key(tier, when.date())
+        bucket = rollups.get(tier, {}).get(key)
+        if bucket is not None:
+            record(bucket.setdefault("latency", new_histogram()), latency_ms)
+            return True
+    return False
+
+
+def seed_from_sessions(sessions: list) -> dict:
+    """Build rollups from a pre-rollup stats file's daily sessions (one-time migration)."""
+    rollups = new_rollups()
+    for session in sessions:
+        bucket = rollups["daily"].setdefault(session["date"], new_bucket())
+        merge_bucket(bucket, {
+            "queries": session.get("queries", 0),
+            "routes": session.get("routes", {}),
+            "savings": session.get("savings", 0.0),
+        })
+    compact(rollups)
+    return rollups
+
+
+def query_range(rollups: dict, since: str = None, until: str = None) -> tuple[dict, list]:
+    """Aggregate every bucket whose first day falls in [since, until] (ISO dates).
+
+    Returns (total_bucket, series) where series is a chronological list of
+    (tier, key, bucket). Coarse buckets are attributed to their first day.
+    """
+    lo = date.fromisoformat(since) if since else date.min
+    hi = date.fromisoformat(until) if until else date.max
+    total = new_bucket()
+    series = []
+    for tier in TIERS:
+        for key, bucket in rollups.get(tier, {}).items():
+            start = bucket_start(tier, key)
+            if lo <= start <= hi:
+                merge_bucket(total, bucket)
+                series.append((start, tier, key, bucket))
+    series.sort(key=lambda item: (item[0], TIERS.index(item[1]), item[2]))
+    return total, [(tier, key, bucket) for _start, tier, key, bucket in series]
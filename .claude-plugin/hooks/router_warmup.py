@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Classification Cache Warm-up
+Seeds knowledge/cache/classifications.md from the prompts already in local
+Claude Code transcripts (~/.claude/projects/*/*.jsonl), so a fresh install
+starts with the cache a long-running one would have instead of paying for
+LLM fallbacks on prompts it has seen many times before.
+
+Transcripts are streamed line by line. Lines over MAX_LINE_BYTES (pasted
+files, large tool results) are skipped without being held in memory, and
+only user prompts the hook would classify are counted (no slash commands,
+tool results, meta or subagent messages). Prompts are tallied by cache
+fingerprint in at most --max-tracked entries: when the tally is full, the
+less frequent half is dropped, so memory stays bounded however long the
+history is. Each entry keeps the prompt's rules result, the part of the
+prompt the LLM would see (router_llm.truncate_query) and the distinct terms
+of the whole prompt, which is all the learned adjustments read.
+
+The most frequent fingerprints (ties: most recent) then fill the cache's
+free slots (CACHE_MAX_ENTRIES, existing entries are kept; fingerprints the
+team cache pack already answers are skipped), classified the
+way the hook does: rules, retry calibration, the Haiku fallback for
+low-confidence prompts where allowed (an API key, a closed circuit
+breaker, not proven unnecessary by rules agreement, at most --llm-limit
+calls), then learned adjustments. Entries keep the observed hit count and
+last-seen date, so cache eviction treats them like real history.
+
+Usage:
+    python3 router_warmup.py [--project DIR | --all-projects] [--days 90] [--no-llm]
+                             [--llm-limit 50] [--max-tracked 5000] [--dry-run] [--json]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from router_calibration import calibrate
+from router_features import PromptFeatures
+from router_llm import query_token_budget, truncate_query
+from router_pack import open_pack, pack_path
+from router_state import update_text
+
+HOOK_FILE = Path(__file__).resolve().parent / "classify-prompt.py"
+TRANSCRIPTS_DIR = Path.home() / ".claude" / "projects"
+
+MAX_LINE_BYTES = 256 * 1024
+MAX_TRACKED = 5000
+LLM_LIMIT = 50
+HISTORY_DAYS = 90
+
+CACHE_HEADER = """---
+type: cache
+version: "1.0"
+description: Classification cache
+last_updated: null
+entry_count: 0
+---
+
+# Classification Cache
+
+<!-- Entries will be appended below this line -->
+"""
+
+# Transcript user messages that are not typed prompts
+NOT_PROMPTS = ("<command-", "<local-command", "Caveat:", "[Request interrupted")
+CACHE_ENTRY = re.compile(r"^## \[([0-9a-f]+)\]", re.MULTILINE)
+
+
+def load_hook():
+    spec = importlib.util.spec_from_file_location("classify_prompt", HOOK_FILE)
+    hook = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(hook)
+    return hook
+
+
+def project_slug(project: Path) -> str:
+    """Claude Code's transcript directory name for a project path."""
+    return re.sub(r"[^A-Za-z0-9]", "-", str(project))
+
+
+def transcript_files(root: Path, project: Path = None, days: int = HISTORY_DAYS) -> list:
+    """Transcripts modified in the last days, newest first (only project's, if given and found)."""
+    cutoff = time.time() - days * 86400 if days else 0
+    try:
+        dirs = [d for d in root.iterdir() if d.is_dir()]
+    except OSError:
+        return []
+    if project is not None:
+        # Fall back to every directory (lines are filtered by cwd) if the naming differs
+        dirs = [d for d in dirs if d.name == project_slug(project)] or dirs
+    files = []
+    for directory in dirs:
+        for path in directory.glob("*.jsonl"):
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            if mtime >= cutoff:
+                files.append((mtime, path))
+    return [path for _, path in sorted(files, reverse=True)]
+
+
+def read_lines(path: Path, max_bytes: int = MAX_LINE_BYTES):
+    """Yield the lines of path that fit in max_bytes (longer ones are skipped in chunks)."""
+    with open(path, "rb") as f:
+        while True:
+            line = f.readline(max_bytes + 1)
+            if not line:
+                return
+            if len(line) > max_bytes and not line.endswith(b"\n"):
+                while line and not line.endswith(b"\n"):
+                    line = f.readline(max_bytes)
+                continue
+            yield line
+
+
+def in_project(cwd: str, project: str) -> bool:
+    """Whether cwd is project or inside it (by path components: /src/app2 is not in /src/app)."""
+    cwd, project = Path(cwd), Path(project)
+    return cwd == project or project in cwd.parents
+
+
+def user_prompt(record: dict, project: str = None) -> str:
+    """The typed prompt of a transcript record, or None."""
+    if record.get("type") != "user" or record.get("isMeta") or record.get("isSidechain"):
+        return None
+    if project and not in_project(str(record.get("cwd", "")), project):
+        return None
+    content = (record.get("message") or {}).get("content")
+    if isinstance(content, list):
+        blocks = [b for b in content if isinstance(b, dict)]
+        if any(b.get("type") == "tool_result" for b in blocks):
+            return None
+        content = "\n".join(b.get("text", "") for b in blocks if b.get("type") == "text")
+    if not isinstance(content, str):
+        return None
+    text = content.strip()
+    # What the hook itself skips: short prompts and slash commands
+    if len(text) < 10 or text.startswith("/") or text.startswith(NOT_PROMPTS):
+        return None
+    return text
+
+
+def tally_prompt(tally: dict, text: str, seen: str, classify, max_tracked: int = MAX_TRACKED):
+    """Count one prompt under its fingerprint; the first sighting keeps its rules result, LLM view and terms."""
+    features = PromptFeatures(text)
+    entry = tally.get(features.fingerprint)
+    if entry:
+        entry[0] += 1
+        entry[1] = max(entry[1], seen)
+        return
+    if len(tally) >= max_tracked:
+        # Keep the more frequent half (recent first among equals)
+        keep = sorted(tally.items(), key=lambda item: (item[1][0], item[1][1]), reverse=True)[:max_tracked // 2]
+        tally.clear()
+        tally.update(keep)
+    query, _ = truncate_query(text, query_token_budget())
+    tally[features.fingerprint] = [1, seen, text[:60], classify(features), query, features.terms]
+
+
+def scan(paths: list, classify, project: str = None, max_tracked: int = MAX_TRACKED) -> tuple[dict, dict]:
+    """Tally the prompts in paths; returns (tally, counts)."""
+    tally = {}
+    counts = {"transcripts": 0, "bytes": 0, "prompts": 0}
+    for path in paths:
+        try:
+            counts["bytes"] += path.stat().st_size
+            fallback_day = datetime.fromtimestamp(path.stat().st_mtime).strftime("%Y-%m-%d")
+            for line in read_lines(path):
+                if b'"user"' not in line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                text = user_prompt(record, project) if isinstance(record, dict) else None
+                if text:
+                    counts["prompts"] += 1
+                    tally_prompt(tally, text, str(record.get("timestamp") or fallback_day)[:10], classify,
+                                 max_tracked)
+        except OSError:
+            continue
+        counts["transcripts"] += 1
+    counts["tracked"] = len(tally)
+    return tally, counts
+
+
+def classify_entry(hook, fingerprint: str, entry: list, llm: dict):
+    """Final cache result for a tallied prompt, following classify_hybrid's order."""
+    _, _, _, result, query, terms = entry
+    result = result.copy()
+    calibration = hook.get_calibration()
+    calibrate(calibration, result, fingerprint)
+    if result.confidence < hook.CONFIDENCE_THRESHOLD and llm["api_key"] and llm["calls"] < llm["limit"]:
+        breaker = hook.check_llm_fallback(result, llm["api_key"])
+        if breaker is not None:
+            llm["calls"] += 1
+            llm_result = hook.classify_by_llm(query, llm["api_key"], breaker, result.signals)
+            if llm_result:
+                llm_result.rules = result.rules
+                result = calibrate(calibration, llm_result, fingerprint)
+            else:
+                llm["failures"] += 1
+    # The learned weights score the whole prompt's terms, as in the hook; the
+    # terms joined back into text have exactly the same terms
+    return hook.apply_learned_adjustments(PromptFeatures(" ".join(sorted(terms))), result)
+
+
+def merge_entries(content: str, entries: list, max_entries: int) -> tuple[str, int]:
+    """content plus the entries whose fingerprint it lacks, up to max_entries.
+
+    Returns (new content or None if nothing was added, entries added).
+    Entries already in content win: they are real local history.
+    """
+    content = content or CACHE_HEADER
+    existing = set(CACHE_ENTRY.findall(content))
+    added = [text for fingerprint, text in entries if fingerprint not in existing]
+    added = added[:max(0, max_entries - len(existing))]
+    if not added:
+        return None, 0
+    content = content.rstrip() + "\n" + "".join(added)
+    content = re.sub(r"entry_count: \d+", f"entry_count: {len(existing) + len(added)}", content)
+    return re.sub(r"last_updated: .*", f'last_updated: "{datetime.now().isoformat()}"', content), len(added)
+
+
+def warm_up(hook, paths: list, cache_file: Path, project: str = None, use_llm: bool = True,
+            llm_limit: int = LLM_LIMIT, max_tracked: int = MAX_TRACKED, dry_run: bool = False) -> dict:
+    """Scan paths and add their most frequent prompts to cache_file; returns a report."""
+    started = time.perf_counter()
+    tally, report = scan(paths, hook.classify_by_rules, project, max_tracked)
+
+    try:
+        existing = set(CACHE_ENTRY.findall(cache_file.read_text()))
+    except OSError:
+        existing = set()
+    pack = open_pack(pack_path(cache_file.parent.parent))
+    in_pack = {fp for fp in tally if pack.lookup(fp)} - existing if pack else set()
+    free = max(0, hook.CACHE_MAX_ENTRIES - len(existing))
+    ranked = sorted(tally.items(), key=lambda item: (item[1][0], item[1][1]), reverse=True)
+    chosen = [(fp, entry) for fp, entry in ranked if fp not in existing and fp not in in_pack][:free]
+
+    llm = {"api_key": hook.get_api_key() if use_llm and not dry_run else None,
+           "limit": llm_limit, "calls": 0, "failures": 0}
+    entries, routes = [], {}
+    for fingerprint, entry in chosen:
+        result = entry[3] if dry_run else classify_entry(hook, fingerprint, entry, llm)
+        routes[result.route] = routes.get(result.route, 0) + 1
+        entries.append((fingerprint, hook.format_cache_entry(fingerprint, entry[2], result.route,
+                                                             result.confidence, entry[1], entry[0])))
+
+    added = len(entries) if dry_run else 0
+    if entries and not dry_run:
+        def merge(content):
+            nonlocal added
+            content, added = merge_entries(content, entries, hook.CACHE_MAX_ENTRIES)
+            return content
+
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        if not update_text(cache_file, merge, timeout=5.0):
+            raise TimeoutError(f"{cache_file} is locked by another process")
+    cached = existing | in_pack | {fp for fp, _ in entries}
+    report.update({
+        "cache_file": str(cache_file),
+        "existing": len(existing),
+        "in_pack": len(in_pack),
+        "added": added,
+        "routes": routes,
+        "llm_calls": llm["calls"],
+        "llm_failures": llm["failures"],
+        # Share of the scanned prompts the cache would have answered
+        "replayed_hit_rate": round(sum(e[0] for fp, e in tally.items() if fp in cached) / report["prompts"], 3)
+        if report["prompts"] else 0.0,
+        "dry_run": dry_run,
+        "seconds": round(time.perf_counter() - started, 2),
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the classification cache from Claude Code transcripts")
+    parser.add_argument("--project", default=os.getcwd(), help="project directory (default: current)")
+    parser.add_argument("--all-projects", action="store_true", help="use prompts from every project")
+    parser.add_argument("--knowledge-dir", help="knowledge directory (default: the hook's, else <project>/knowledge)")
+    parser.add_argument("--transcripts", default=str(TRANSCRIPTS_DIR), help="Claude Code projects directory")
+    parser.add_argument("--days", type=int, default=HISTORY_DAYS, help="only transcripts modified this recently")
+    parser.add_argument("--no-llm", action="store_true", help="rules only, even if an API key is set")
+    parser.add_argument("--llm-limit", type=int, default=LLM_LIMIT, help="maximum Haiku fallback calls")
+    parser.add_argument("--max-tracked", type=int, default=MAX_TRACKED, help="distinct prompts held in memory")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be cached, write nothing")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    project = Path(args.project).expanduser().resolve()
+    os.chdir(project)  # the hook finds knowledge/ relative to the working directory
+    hook = load_hook()
+    knowledge_dir = Path(args.knowledge_dir).expanduser() if args.knowledge_dir else (
+        hook.get_knowledge_dir() or project / "knowledge")
+    paths = transcript_files(Path(args.transcripts).expanduser(), None if args.all_projects else project, args.days)
+    if not paths:
+        print(f"No Claude Code transcripts found in {args.transcripts}.")
+        sys.exit(1)
+
+    try:
+        report = warm_up(hook, paths, knowledge_dir / "cache" / "classifications.md",
+                         None if args.all_projects else str(project), not args.no_llm, args.llm_limit,
+                         args.max_tracked, args.dry_run)
+    except TimeoutError as e:
+        print(f"{e} - try again.", file=sys.stderr)
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    routes = ", ".join(f"{route} {n}" for route, n in sorted(report["routes"].items())) or "none"
+    print(f"Scanned {report['prompts']} prompts in {report['transcripts']} transcripts "
+          f"({report['bytes'] / 1e6:.1f} MB, {report['tracked']} distinct tracked) in {report['seconds']}s")
+    print(f"{'Would add' if report['dry_run'] else 'Added'} {report['added']} cache entries "
+          f"({routes}) to {report['cache_file']} ({report['existing']} already cached, "
+          f"{report['in_pack']} in the team pack), "
+          f"{report['llm_calls']} LLM calls")
+    print(f"Replayed hit rate: {report['replayed_hit_rate']:.0%} of scanned prompts would hit the cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Claude Router - State File Contention Benchmark
+Runs the UserPromptSubmit hook as N concurrent processes - one process per
+prompt, like Claude Code does - against shared state, and reports:
+
+- throughput (prompts/s) and per-process latency p50/p95/p99/max
+- time spent waiting for state file locks: each hook run's total wait
+  (p50/p99/max over runs, and the sum), the longest single wait, and
+  lock waits that hit the bounded timeout (router_state)
+- lost updates: prompts sent vs what the state files counted
+  (router-stats.json total_queries, session shard conversation_depth,
+  router-calibration.json daily prompts, classifications.md entries)
+- state files that no longer parse
+
+Each concurrency level runs in a fresh sandbox: the hooks are copied to a
+temp dir next to an empty knowledge/cache/classifications.md, HOME points
+inside it, and no API key is visible, so only the rules and cache tiers run
+and nothing under the real ~/.claude or the repo's knowledge/ is touched.
+
+The prompt mix is the labeled corpus of llm_prompt_benchmark.py: a share
+of prompts repeat earlier ones (cache hits rewrite their entry), the rest
+are made unique (new cache entries), and some carry a long pasted context.
+Prompts are spread over --sessions sessions.
+
+Usage:
+    python3 benchmarks/contention_benchmark.py [--processes 1,4,16] [--prompts 400] [--sessions 8]
+                                               [--repeat-share 0.5] [--seed 1] [--keep] [--json]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+HOOKS_DIR = Path(__file__).resolve().parent.parent / "hooks"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from llm_prompt_benchmark import CORPUS, long_variant, percentile  # noqa: E402
+
+CACHE_HEADER = """---
+type: cache
+version: "1.0"
+description: Classification cache
+last_updated: null
+entry_count: 0
+---
+
+# Classification Cache
+
+<!-- Entries will be appended below this line -->
+"""
+
+
+def load_hook(hook_path: Path):
+    spec = importlib.util.spec_from_file_location("classify_prompt", hook_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def worker(hook_path: str):
+    """Run the hook once on stdin and print its timings and lock waits as JSON."""
+    started = time.perf_counter()
+    hook = load_hook(Path(hook_path))
+    lock_stats = sys.modules["router_state"].lock_stats
+    stdout, sys.stdout = sys.stdout, io.StringIO()
+    hook_started = time.perf_counter()
+    try:
+        hook.main()
+    except SystemExit:
+        pass
+    finally:
+        sys.stdout = stdout
+    now = time.perf_counter()
+    waits = lock_stats["waits_ms"]
+    print(json.dumps({"hook_ms": (now - hook_started) * 1000, "total_ms": (now - started) * 1000,
+                      "lock_wait_ms": sum(waits), "lock_max_ms": max(waits, default=0.0),
+                      "locks": len(waits), "lock_timeouts": lock_stats["timeouts"]}))
+
+
+def make_sandbox() -> Path:
+    root = Path(tempfile.mkdtemp(prefix="router-contention-"))
+    (root / "hooks").mkdir()
+    for path in HOOKS_DIR.glob("*.py"):
+        shutil.copy2(path, root / "hooks" / path.name)
+    (root / "knowledge" / "cache").mkdir(parents=True)
+    (root / "knowledge" / "cache" / "classifications.md").write_text(CACHE_HEADER)
+    (root / "home").mkdir()
+    return root
+
+
+def prompt_mix(count: int, sessions: int, repeat_share: float, rng: random.Random) -> list:
+    """[(session_id, prompt)] - repeats of earlier prompts, unique variants, some long pastes."""
+    mix, sent = [], []
+    for i in range(count):
+        if sent and rng.random() < repeat_share:
+            prompt = rng.choice(sent)
+        else:
+            index = rng.randrange(len(CORPUS))
+            prompt = f"{CORPUS[index][0]} in the {rng.choice(('billing', 'search', 'auth', 'export'))} " \
+                     f"service variant{i}"
+            if rng.random() < 0.1:
+                prompt = long_variant(prompt, index)
+            sent.append(prompt)
+        mix.append((f"bench-session-{i % sessions}", prompt))
+    return mix
+
+
+def run_level(processes: int, mix: list, keep: bool) -> dict:
+    root = make_sandbox()
+    env = {k: v for k, v in os.environ.items() if k not in ("ANTHROPIC_API_KEY", "ANTHROPIC_BASE_URL")}
+    env["HOME"] = str(root / "home")
+    hook_path = str(root / "hooks" / "classify-prompt.py")
+
+    def one(item):
+        session_id, prompt = item
+        payload = json.dumps({"prompt": prompt, "session_id": session_id, "cwd": str(root)})
+        started = time.perf_counter()
+        done = subprocess.run([sys.executable, __file__, "--worker", hook_path], input=payload,
+                              capture_output=True, text=True, env=env, cwd=root)
+        latency = (time.perf_counter() - started) * 1000
+        try:
+            metrics = json.loads(done.stdout.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            metrics = None
+        return latency, metrics
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=processes) as pool:
+        runs = list(pool.map(one, mix))
+    wall = time.perf_counter() - started
+
+    report = {"processes": processes, "prompts": len(mix), "seconds": round(wall, 2),
+              "throughput": round(len(mix) / wall, 1)}
+    latencies = [latency for latency, _ in runs]
+    metrics = [m for _, m in runs if m]
+    waits = [m["lock_wait_ms"] for m in metrics]
+    report["latency_ms"] = {q: round(percentile(latencies, v), 1)
+                            for q, v in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+    report["latency_ms"]["max"] = round(max(latencies), 1)
+    # p50/p99/max are over each run's total wait; single_max is the longest one wait
+    report["lock_wait_ms"] = {"p50": round(percentile(waits, 0.5), 2), "p99": round(percentile(waits, 0.99), 2),
+                              "max": round(max(waits, default=0.0), 2),
+                              "single_max": round(max((m["lock_max_ms"] for m in metrics), default=0.0), 2),
+                              "total": round(sum(waits), 1),
+                              "timeouts": sum(m.get("lock_timeouts", 0) for m in metrics)}
+    report["failed_runs"] = len(runs) - len(metrics)
+    report.update(check_state(root, mix))
+    if keep:
+        report["sandbox"] = str(root)
+    else:
+        shutil.rmtree(root, ignore_errors=True)
+    return report
+
+
+def check_state(root: Path, mix: list) -> dict:
+    """Compare what the state files counted with what was sent."""
+    claude = root / "home" / ".claude"
+    corrupt = []
+
+    def load(path: Path):
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            corrupt.append(str(path.relative_to(root)))
+            return None
+
+    stats = load(claude / "router-stats.json") or {}
+    # Decisions journaled after a lock timeout are merged by the next writer, not lost
+    # (the journal also carries hook latency samples, which are not decisions)
+    pending = 0
+    for name in ("router-stats.pending.jsonl", "router-stats.pending.jsonl.draining"):
+        try:
+            pending += sum(1 for line in (claude / name).read_text().splitlines() if '"hook_latency"' not in line)
+        except FileNotFoundError:
+            pass
+    lost = {"stats": len(mix) - stats.get("total_queries", 0) - pending}
+
+    per_session = {}
+    for session_id, _ in mix:
+        per_session[session_id] = per_session.get(session_id, 0) + 1
+    depth = 0
+    for session_id in per_session:
+        shard = load(claude / "router-sessions" / f"{session_id}.json") or {}
+        depth += shard.get("conversation_depth", 0)
+    lost["sessions"] = len(mix) - depth
+
+    calibration = load(claude / "router-calibration.json") or {}
+    lost["calibration"] = len(mix) - calibration.get("daily", {}).get(date.today().isoformat(), [0])[0]
+
+    hook = load_hook(root / "hooks" / "classify-prompt.py")
+    expected = {hook.generate_fingerprint(prompt) for _, prompt in mix}
+    content = (root / "knowledge" / "cache" / "classifications.md").read_text()
+    found = set(re.findall(r"^## \[([0-9a-f]+)\]", content, re.MULTILINE))
+    lost["cache_entries"] = max(0, min(len(expected), hook.CACHE_MAX_ENTRIES) - len(found & expected))
+    return {"lost_updates": lost, "pending_stats": pending, "corrupt_files": corrupt}
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--worker":
+        worker(sys.argv[2])
+        return
+    parser = argparse.ArgumentParser(description="Benchmark concurrent hook processes on shared state files")
+    parser.add_argument("--processes", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--prompts", type=int, default=400, help="prompts per level")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--repeat-share", type=float, default=0.5, help="share of prompts repeating an earlier one")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="keep each level's sandbox for inspection")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    mix = prompt_mix(args.prompts, args.sessions, args.repeat_share, random.Random(args.seed))
+    reports = [run_level(int(n), mix, args.keep) for n in args.processes.split(",")]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    print(f"Hook contention benchmark: {args.prompts} prompts, {args.sessions} sessions, "
+          f"{args.repeat_share:.0%} repeats\n")
+    print("Lock wait per run is each hook run's total wait for state file locks; 1 wait max is the longest "
+          "single wait.\n")
+    print(f"{'procs':>5}{'prompts/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'run wait p50':>14}{'p99':>8}{'max':>8}{'1 wait max':>12}{'timeouts':>10}"
+          "  lost (stats/sessions/calib/cache)  corrupt")
+    for r in reports:
+        lat, wait, lost = r["latency_ms"], r["lock_wait_ms"], r["lost_updates"]
+        lost_str = f"{lost['stats']}/{lost['sessions']}/{lost['calibration']}/{lost['cache_entries']}"
+        print(f"{r['processes']:>5}{r['throughput']:>11}{lat['p50']:>9}{lat['p95']:>9}{lat['p99']:>9}"
+              f"{lat['max']:>9}{wait['p50']:>14}{wait['p99']:>8}{wait['max']:>8}{wait['single_max']:>12}"
+              f"{wait['timeouts']:>10}  {lost_str:<34} "
+              f"{len(r['corrupt_files'])}")
+        if r["failed_runs"]:
+            print(f"      {r['failed_runs']} hook runs reported no metrics")
+        if r.get("sandbox"):
+            print(f"      sandbox: {r['sandbox']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Classifier Equivalence Harness
+Checks that a changed classifier (a faster matcher, a new cache tier, a
+refactor) gives exactly the routing decisions of a frozen reference:
+route, confidence, signals, method and metadata of classify_by_rules and
+classify_hybrid, plus the cache fingerprint.
+
+The reference is the hooks/ tree of a pinned commit (REFERENCE_REV),
+extracted with `git archive`, so it never changes with the working tree.
+Move the pin (or pass --reference REV) only when a routing change is
+intended. Any revision back to the first hooks/ with classify_by_rules,
+classify_hybrid, generate_fingerprint and PATTERNS works as a reference:
+older hooks return dicts and classify_hybrid without a session id, and
+the worker adapts to both. Such a reference still diverges wherever
+routing itself changed since (calibration, session context, cache tiers). Candidates default to the working tree's hooks/; pass
+--candidate DIR (repeatable) to compare other hook trees.
+
+Each engine runs in its own worker process with its own sandbox (temp
+HOME; knowledge dir seeded with classification cache entries, a
+learnings file and informed routing on; no API key unless --llm-stub
+gives each engine its own stand-in API). Three comparisons run:
+
+- rules: classify_by_rules and the fingerprint, prompt by prompt
+- hybrid: classify_hybrid, each prompt on a fresh copy of the seeded
+  state (the worker forks per prompt, so in-process caches start empty)
+- sequence: classify_hybrid over the corpus, twice, in order on one
+  state and in a fresh process per prompt as the hook runs, so cache
+  writes, hits and session context carry over from prompt to prompt
+
+Prompts come from the labeled corpus (llm_prompt_benchmark.py) and its
+variants, any --corpus files (one prompt per line, or JSON lines with a
+"prompt" field), and --examples generated prompts: corpus words, the
+reference's rule pattern words (with other endings) and routing phrases,
+recombined with case, whitespace, punctuation, code fences, non-ASCII
+text and length pushed to the edges. A diverging
+prompt is minimized (delta debugging over words, then characters) while
+it still diverges; a diverging sequence is minimized over its prompts.
+
+Exit status is 1 if any candidate diverged, so it can gate CI.
+
+Usage:
+    python3 benchmarks/equivalence_harness.py [--candidate DIR ...] [--reference REV | --reference-dir DIR]
+                                              [--modes rules,hybrid,sequence] [--examples 2000] [--seed 1]
+                                              [--corpus FILE ...] [--llm-stub] [--show 5] [--json]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import argparse
+import importlib.util
+import inspect
+import io
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from llm_prompt_benchmark import CORPUS, long_variant  # noqa: E402
+
+# The reference implementation: hooks/ as of this commit
+REFERENCE_REV = "eab477aec221465c12b5f0bd85a9fe37f5f22bcf"
+MODES = ("rules", "hybrid", "sequence")
+EXAMPLES = 2000
+SHOW = 5
+
+CACHE_HEADER = """---
+type: cache
+version: "1.0"
+description: Classification cache
+last_updated: null
+entry_count: 0
+---
+
+# Classification Cache
+
+<!-- Entries will be appended below this line -->
+"""
+
+LEARNINGS = """---
+type: quirks
+entry_count: 2
+---
+
+## Quirk: Billing ledger reconciliation is complex
+- **Discovered:** 2026-01-05
+- **Location:** billing ledger reconciliation invoice settlement
+- **Insight:** The billing ledger reconciliation is complex and tricky; invoice settlement needs careful review
+- **Confidence:** high
+
+## Pattern: Search index rebuilds are simple
+- **Discovered:** 2026-01-06
+- **Context:** search index rebuild script
+- **Insight:** Rebuilding the search index is simple and straightforward; always run the rebuild script
+- **Confidence:** high
+"""
+
+# Seeded cache entries: corpus prompts answered with a route the rules would not give
+SEEDED_ROUTES = ("standard", "deep", "fast")
+SEEDED_EVERY = 7
+
+# Extra material for generated prompts: routing phrases and awkward text
+PHRASES = ("what is", "how do i", "architecture", "security audit", "refactor", "across all files",
+           "and then", "for each module", "step 1", "debug", "explain", "quick question", "yes, do it",
+           "also", "actually", "router stats", "classify this prompt", "design a", "migrate", "fix the typo")
+ODD_TEXT = ("Straße", "İstanbul", "ﬁle", "naïve café", "日本語のテキスト", "emoji 🚀 rocket", "tab\tseparated",
+            "CRLF\r\nline", "snake_case_name", "kebab-case-name", "v2.0.7", "a-b-c", "x" * 40, "???", "...")
+
+
+ENDINGS = ("", "s", "e", "ed", "ing", "able")
+
+
+# --- Engines -----------------------------------------------------------------
+
+def extract_reference(rev: str, dest: Path) -> Path:
+    """hooks/ of rev, extracted into dest/hooks."""
+    try:
+        archive = subprocess.run(["git", "-C", str(REPO), "archive", "--format=tar", rev, "hooks"],
+                                 capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        detail = e.stderr.decode().strip() if isinstance(e, subprocess.CalledProcessError) else e
+        raise SystemExit(f"Cannot extract reference {rev} ({detail}); pass --reference-dir instead.")
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(dest, filter="data")
+        else:
+            tar.extractall(dest)
+    return dest / "hooks"
+
+
+def make_sandbox(hooks_dir: Path, root: Path) -> Path:
+    """root/hooks (a copy of hooks_dir) with a pristine seed/ and working knowledge/ and home/."""
+    shutil.copytree(hooks_dir, root / "hooks", ignore=shutil.ignore_patterns("__pycache__"))
+    seed = root / "seed"
+    (seed / "knowledge" / "cache").mkdir(parents=True)
+    (seed / "knowledge" / "learnings").mkdir()
+    (seed / "knowledge" / "learnings" / "quirks.md").write_text(LEARNINGS)
+    (seed / "knowledge" / "state.json").write_text(json.dumps({"informed_routing": True}))
+    (seed / "home").mkdir()
+    return root
+
+
+def seed_cache(root: Path, fingerprints: list):
+    """Cache entries for fingerprints (routes from SEEDED_ROUTES), in root's seed."""
+    entries = "".join(f"""
+## [{fp}]
+- **Query pattern:** "seeded entry {i}"
+- **Route:** {SEEDED_ROUTES[i % len(SEEDED_ROUTES)]}
+- **Confidence:** 0.{80 + i % 15}
+- **Last used:** 2026-01-10
+- **Hit count:** {1 + i % 4}
+""" for i, fp in enumerate(fingerprints))
+    content = CACHE_HEADER.replace("entry_count: 0", f"entry_count: {len(fingerprints)}") + entries
+    (root / "seed" / "knowledge" / "cache" / "classifications.md").write_text(content)
+
+
+class Engine:
+    """A hook tree in a worker process; call(op, prompts) -> results."""
+
+    def __init__(self, name: str, hooks_dir: Path, root: Path, stub=None):
+        self.name = name
+        self.root = make_sandbox(hooks_dir, root)
+        env = {k: v for k, v in os.environ.items()
+               if not k.startswith(("ANTHROPIC_", "CLAUDE_ROUTER_"))}
+        env["HOME"] = str(self.root / "home")
+        env["PYTHONDONTWRITEBYTECODE"] = "1"
+        if stub is not None:
+            env["ANTHROPIC_API_KEY"] = "stub"
+            env["ANTHROPIC_BASE_URL"] = stub.base_url
+        self.process = subprocess.Popen([sys.executable, __file__, "--worker", str(self.root)], env=env,
+                                        cwd=self.root, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        self.calls = 0
+
+    def call(self, op: str, prompts: list) -> list:
+        self.calls += 1
+        self.process.stdin.write(json.dumps({"op": op, "prompts": prompts}) + "\n")
+        self.process.stdin.flush()
+        line = self.process.stdout.readline()
+        if not line:
+            raise SystemExit(f"{self.name} worker exited")
+        return json.loads(line)
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+# --- Worker ------------------------------------------------------------------
+
+def _plain(result):
+    if result is None or isinstance(result, dict):
+        return result
+    return result.as_dict()
+
+
+def _restore(root: Path):
+    for name in ("knowledge", "home"):
+        shutil.rmtree(root / name, ignore_errors=True)
+        shutil.copytree(root / "seed" / name, root / name)
+
+
+def _in_child(root: Path, run, restore: bool = True):
+    """run() in a forked child (on freshly restored state unless restore is False); its JSON result."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            if restore:
+                _restore(root)
+            payload = json.dumps(run())
+        except BaseException as e:  # reported as a result, so it is compared too
+            payload = json.dumps({"error": f"{type(e).__name__}: {e}"})
+        with os.fdopen(write_fd, "w") as out:
+            out.write(payload)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        payload = f.read()
+    os.waitpid(pid, 0)
+    return json.loads(payload)
+
+
+def worker(root: str):
+    """Serve {"op", "prompts"} requests on stdin for the hook in root/hooks."""
+    root = Path(root)
+    os.chdir(root)
+    _restore(root)
+    spec = importlib.util.spec_from_file_location("classify_prompt", root / "hooks" / "classify-prompt.py")
+    hook = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(hook)
+    sys.stderr = open(os.devnull, "w")  # LLM error chatter
+    # classify_hybrid takes a session id since sessions were sharded; older references classify without one
+    session = ("equivalence",) if len(inspect.signature(hook.classify_hybrid).parameters) > 1 else ()
+
+    def hybrid(prompt):
+        return _plain(hook.classify_hybrid(prompt, *session))
+
+    def guarded(call):
+        try:
+            return call()
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        op, prompts = request["op"], request["prompts"]
+        if op == "vocabulary":  # literal words of the rule patterns
+            patterns = [p for group in hook.PATTERNS.values() for p in group] + list(hook.EXCEPTION_PATTERNS)
+            sources = [re.sub(r"\\.", " ", p.pattern) for p in patterns]  # drop escapes such as \b
+            results = sorted({w for source in sources for w in re.findall(r"[a-z][a-z-]{2,}", source)})
+        elif op == "rules":
+            results = [guarded(lambda: [_plain(hook.classify_by_rules(p)), hook.generate_fingerprint(p)])
+                       for p in prompts]
+        elif op == "hybrid":
+            results = [_in_child(root, lambda: hybrid(p)) for p in prompts]
+        else:  # sequence: one process per prompt, as the hook runs, on shared state
+            _restore(root)
+            results = [_in_child(root, lambda: hybrid(p), restore=False) for p in prompts]
+        print(json.dumps(results), flush=True)
+
+
+# --- Prompts -----------------------------------------------------------------
+
+def corpus_prompts(files: list) -> list:
+    prompts = []
+    for i, (prompt, _) in enumerate(CORPUS):
+        prompts += [prompt, long_variant(prompt, i), "  And " + prompt.upper() + "\n\n", "what is " + prompt,
+                    "yes,\tdo " + prompt, "```py\nx=1\n```\n" + prompt + " across all files and then run the tests"]
+    prompts += ["", "   ", "Routing stats please", "classify this prompt", "hi", "ok. go",
+                "fix the billing ledger reconciliation for invoice settlement",
+                "run the tests for the billing ledger reconciliation and invoice settlement",
+                "rebuild the search index with the rebuild script",
+                "rebuild the search index across modules with the rebuild script"]
+    for path in files:
+        for line in Path(path).read_text().splitlines():
+            if line.startswith("{"):
+                try:
+                    line = json.loads(line).get("prompt", "")
+                except ValueError:
+                    pass
+            if line.strip():
+                prompts.append(line)
+    return prompts
+
+
+def generated_prompts(count: int, rng: random.Random, vocabulary: list) -> list:
+    """Prompts recombined from corpus words, rule pattern words, routing phrases and awkward text."""
+    words = sorted({w for prompt, _ in CORPUS for w in prompt.split()})
+    stems = {re.sub(r"(able|ing|ed|es|e|s)$", "", w) for w in vocabulary} | set(vocabulary)
+    rule_words = sorted(stem + ending for stem in stems for ending in ENDINGS)
+    prompts = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.choice((1, 2, 3, 5, 8, 13, 40))):
+            pick = rng.random()
+            parts.append(rng.choice(PHRASES) if pick < 0.2 else rng.choice(ODD_TEXT) if pick < 0.3
+                         else rng.choice(rule_words) if pick < 0.6 else rng.choice(words))
+        text = rng.choice((" ", "  ", "\n", ", ", ". ")).join(parts)
+        for _ in range(rng.randrange(3)):
+            mutation = rng.randrange(7)
+            if mutation == 0:
+                text = text.upper()
+            elif mutation == 1:
+                text = text.title()
+            elif mutation == 2:
+                text = f"```\n{rng.choice(words)} = 1\n```\n{text}" if rng.random() < 0.7 else f"{text}\n```"
+            elif mutation == 3:
+                text = rng.choice(("", " ", "\n", "\t", "/", "- ", "1. ")) + text + rng.choice(("", "?", "!", "\n"))
+            elif mutation == 4:
+                text = (text + " ") * rng.randrange(2, 30)
+            elif mutation == 5:
+                cut = rng.randrange(len(text) + 1)
+                text = text[:cut] + rng.choice(PHRASES).replace(" ", rng.choice(("", "-", "_", "  "))) + text[cut:]
+            else:
+                text = rng.choice(CORPUS)[0] + rng.choice((" ", "\n\n")) + text
+        prompts.append(text)
+    return prompts
+
+
+# --- Comparison and minimization ---------------------------------------------
+
+def ddmin(items: list, failing) -> list:
+    """Delta debugging: a 1-minimal sublist of items for which failing() still holds."""
+    n = 2
+    while len(items) >= 2:
+        size = -(-len(items) // n)
+        subsets = [items[i:i + size] for i in range(0, len(items), size)]
+        for i, subset in enumerate(subsets):
+            if failing(subset):
+                items, n = subset, 2
+                break
+            complement = [x for j, s in enumerate(subsets) if j != i for x in s]
+            if n > 2 and failing(complement):
+                items, n = complement, max(n - 1, 2)
+                break
+        else:
+            if n >= len(items):
+                break
+            n = min(n * 2, len(items))
+    return items
+
+
+def minimize_prompt(prompt: str, diverges) -> str:
+    """The smallest prompt found (words, then characters) that still diverges."""
+    words = prompt.split(" ")
+    prompt = " ".join(ddmin(words, lambda ws: diverges(" ".join(ws))))
+    if len(prompt) <= 400:
+        prompt = "".join(ddmin(list(prompt), lambda cs: diverges("".join(cs))))
+    for simpler in (prompt.strip(), prompt.lower()):
+        if simpler != prompt and diverges(simpler):
+            prompt = simpler
+    return prompt
+
+
+def field_diff(reference, candidate) -> dict:
+    """The fields (route, confidence, signals, method, metadata keys, fingerprint) that differ."""
+    if not (isinstance(reference, dict) and isinstance(candidate, dict)):
+        if isinstance(reference, list) and isinstance(candidate, list):  # [rules result, fingerprint]
+            diff = field_diff(reference[0], candidate[0])
+            if reference[1] != candidate[1]:
+                diff["fingerprint"] = [reference[1], candidate[1]]
+            return diff
+        return {"result": [reference, candidate]}
+    diff = {}
+    for key in sorted(set(reference) | set(candidate)):
+        if key == "metadata":
+            ref_meta, cand_meta = reference.get(key) or {}, candidate.get(key) or {}
+            for meta_key in sorted(set(ref_meta) | set(cand_meta)):
+                if ref_meta.get(meta_key) != cand_meta.get(meta_key):
+                    diff[f"metadata.{meta_key}"] = [ref_meta.get(meta_key), cand_meta.get(meta_key)]
+        elif reference.get(key) != candidate.get(key):
+            diff[key] = [reference.get(key), candidate.get(key)]
+    return diff
+
+
+def compare(reference: Engine, candidate: Engine, mode: str, prompts: list, show: int, batch: int = 200) -> dict:
+    started = time.perf_counter()
+    report = {"mode": mode, "checked": len(prompts), "divergent": 0, "examples": []}
+    if mode == "sequence":
+        ref, cand = reference.call(mode, prompts), candidate.call(mode, prompts)
+        steps = [i for i, (r, c) in enumerate(zip(ref, cand)) if r != c]
+        report["divergent"] = len(steps)
+        if steps:
+            def diverges(sequence):
+                return bool(sequence) and reference.call(mode, sequence) != candidate.call(mode, sequence)
+
+            minimal = ddmin(prompts[:steps[0] + 1], diverges)
+            ref_min, cand_min = reference.call(mode, minimal), candidate.call(mode, minimal)
+            report["examples"].append({"step": steps[0], "sequence": minimal,
+                                       "diffs": [field_diff(r, c) for r, c in zip(ref_min, cand_min) if r != c]})
+    else:
+        def diverges(prompt):
+            return reference.call(mode, [prompt]) != candidate.call(mode, [prompt])
+
+        for start in range(0, len(prompts), batch):
+            chunk = prompts[start:start + batch]
+            for prompt, r, c in zip(chunk, reference.call(mode, chunk), candidate.call(mode, chunk)):
+                if r == c:
+                    continue
+                report["divergent"] += 1
+                if len(report["examples"]) < show:
+                    minimal = minimize_prompt(prompt, diverges)
+                    ref_min, cand_min = reference.call(mode, [minimal])[0], candidate.call(mode, [minimal])[0]
+                    report["examples"].append({"prompt": prompt, "minimized": minimal,
+                                               "diff": field_diff(ref_min, cand_min)})
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+# --- Main --------------------------------------------------------------------
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--worker":
+        worker(sys.argv[2])
+        return
+    parser = argparse.ArgumentParser(description="Compare classifier engines against a frozen reference")
+    parser.add_argument("--candidate", action="append", help="hooks directory to check (default: ./hooks)")
+    parser.add_argument("--reference", default=REFERENCE_REV, help="git revision of the reference hooks/")
+    parser.add_argument("--reference-dir", help="reference hooks directory (instead of a git revision)")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated: rules, hybrid, sequence")
+    parser.add_argument("--examples", type=int, default=EXAMPLES, help="generated prompts (property-based)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--corpus", action="append", default=[], help="extra prompts, one per line or JSON lines")
+    parser.add_argument("--llm-stub", action="store_true", help="give each engine a stand-in Messages API")
+    parser.add_argument("--show", type=int, default=SHOW, help="minimized examples per mode")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    modes = [m for m in args.modes.split(",") if m]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+    corpus = corpus_prompts(args.corpus)
+
+    work = Path(tempfile.mkdtemp(prefix="router-equivalence-"))
+    stubs = []
+
+    def stub():
+        if not args.llm_stub:
+            return None
+        from stub_anthropic import start_in_thread
+        stubs.append(start_in_thread(base_ms=0, per_token_ms=0, token_delay_ms=0))
+        return stubs[-1]
+
+    try:
+        if args.reference_dir:
+            reference_dir, label = Path(args.reference_dir).resolve(), args.reference_dir
+        else:
+            reference_dir, label = extract_reference(args.reference, work / "reference-src"), args.reference[:12]
+        reference = Engine(f"reference {label}", reference_dir, work / "reference", stub())
+        # Seed every sandbox with cache entries for some corpus prompts
+        fingerprints = [r[1] for r in reference.call("rules", corpus[::SEEDED_EVERY]) if isinstance(r, list)]
+        seed_cache(reference.root, fingerprints)
+        generated = generated_prompts(args.examples, random.Random(args.seed), reference.call("vocabulary", []))
+
+        reports = []
+        for i, candidate_dir in enumerate(args.candidate or [str(REPO / "hooks")]):
+            candidate = Engine(candidate_dir, Path(candidate_dir).resolve(), work / f"candidate-{i}", stub())
+            seed_cache(candidate.root, fingerprints)
+            results = []
+            for mode in modes:
+                prompts = corpus * 2 if mode == "sequence" else corpus + generated
+                results.append(compare(reference, candidate, mode, prompts, args.show))
+            candidate.close()
+            reports.append({"candidate": candidate_dir, "reference": label, "results": results})
+        reference.close()
+    finally:
+        for server in stubs:
+            server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+    divergent = any(r["divergent"] for report in reports for r in report["results"])
+    if args.json:
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+    else:
+        print(f"Classifier equivalence vs reference {reports[0]['reference']}: {len(corpus)} corpus prompts, "
+              f"{len(generated)} generated (seed {args.seed}){', stub LLM' if args.llm_stub else ''}\n")
+        for report in reports:
+            print(f"Candidate {report['candidate']}")
+            for r in report["results"]:
+                status = "identical" if not r["divergent"] else f"{r['divergent']} DIVERGENT"
+                print(f"  {r['mode']:<9}{r['checked']:>7} checked  {status:<16}{r['seconds']:>7.1f}s")
+                for example in r["examples"]:
+                    if "sequence" in example:
+                        print(f"    first divergence at step {example['step']}; minimal sequence "
+                              f"({len(example['sequence'])} prompts): {example['sequence']!r}")
+                        for diff in example["diffs"]:
+                            print(f"      {json.dumps(diff, ensure_ascii=False)}")
+                    else:
+                        print(f"    {example['minimized']!r}  (from {len(example['prompt'])} chars)")
+                        print(f"      {json.dumps(example['diff'], ensure_ascii=False)}")
+    sys.exit(1 if divergent else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Claude Router - LLM Classifier Request Benchmark
+Compares the compact classifier request (hooks/router_llm.py) with the
+original full-prompt request on a labeled corpus of short prompts and the
+same prompts buried in long pasted context (logs, code, stack traces).
+
+Reports, per request builder: accuracy against the labels, input tokens,
+prompt cache reads/writes and p50/p95 latency, overall and for long
+prompts only.
+
+By default requests go to a local stand-in server (stub_anthropic.py) whose
+latency grows with input tokens and whose answers come from the router's
+rules, so the run is free and deterministic. With --live (needs
+ANTHROPIC_API_KEY) the same requests go to the real API, which is what
+measures real accuracy.
+
+Usage:
+    python3 benchmarks/llm_prompt_benchmark.py [--live] [--base-url URL] [--budget 300] [--repeat 3]
+                                               [--min-cache-tokens 4096]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "hooks"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from router_llm import MAX_OUTPUT_TOKENS, MODEL, build_request, parse_response  # noqa: E402
+from stub_anthropic import load_hook, start_in_thread  # noqa: E402
+
+API_URL = "https://api.anthropic.com"
+API_VERSION = "2023-06-01"
+
+# (prompt, expected route)
+CORPUS = [
+    ("what is the difference between let and const in javascript", "fast"),
+    ("format this json so it is readable", "fast"),
+    ("show me the git status of this repo", "fast"),
+    ("how do I write a regex that matches an email address", "fast"),
+    ("convert this yaml config to json", "fast"),
+    ("what does the spread operator do", "fast"),
+    ("fix the bug where the login form submits twice", "standard"),
+    ("add a unit test for the parse_date helper", "standard"),
+    ("implement pagination for the users endpoint", "standard"),
+    ("review this function and suggest improvements", "standard"),
+    ("refactor this class to use dependency injection", "standard"),
+    ("write tests for the payment retry logic", "standard"),
+    ("design the architecture for a multi-tenant billing system", "deep"),
+    ("do a security audit of our authentication flow", "deep"),
+    ("analyze the trade-offs between event sourcing and crud for our orders service", "deep"),
+    ("we need a scalable system design for real-time notifications across regions", "deep"),
+    ("evaluate the architecture of our microservices and propose a migration plan", "deep"),
+    ("what are the security vulnerabilities in this token refresh design", "deep"),
+]
+
+LOG_LINE = "2026-01-03T10:15:22.123Z INFO  worker-7 processed batch id=48213 items=250 duration_ms=184\n"
+CODE_LINE = "    result = transform(record, options=opts, retries=3)  # keep order stable\n"
+TRACE_LINE = '  File "/srv/app/services/handlers.py", line 212, in handle_request\n'
+
+
+def long_variant(prompt: str, index: int) -> str:
+    """The prompt with a large paste in front of it (2k-24k chars), as users do."""
+    filler = (LOG_LINE, CODE_LINE, TRACE_LINE)[index % 3]
+    paste = filler * (25 + 40 * (index % 7))
+    return f"Here is what I'm looking at:\n```\n{paste}```\n{prompt}"
+
+
+def legacy_request(prompt: str, signals: list = None) -> dict:
+    """The classifier request as it was before router_llm (kept for comparison)."""
+    text = f"""Classify this coding query into exactly one route. Return ONLY valid JSON, no other text.
+
+Query: "{prompt}"
+
+Routes:
+- "fast": Simple factual questions, syntax lookups, formatting, git status, JSON/YAML manipulation
+- "standard": Bug fixes, feature implementation, code review, refactoring, test writing, OR tool-intensive tasks (codebase search, running tests, multi-file edits)
+- "deep": Architecture decisions, system design, security audits, multi-file refactors, trade-off analysis, complex debugging, OR orchestration tasks (multi-step workflows)
+
+Tool-intensity indicators (favor "standard" or "deep" over "fast"):
+- Searching/scanning entire codebase
+- Modifying multiple files
+- Running tests or builds
+- Dependency analysis
+- Large-scale refactoring
+
+Return JSON only:
+{{"route": "fast|standard|deep", "confidence": 0.0-1.0, "signals": ["signal1", "signal2"], "tool_intensive": true|false}}"""
+    return {"model": MODEL, "max_tokens": MAX_OUTPUT_TOKENS, "messages": [{"role": "user", "content": text}]}
+
+
+def call(base_url: str, api_key: str, request: dict) -> tuple[dict, float]:
+    """POST one Messages request; returns (response, latency_ms)."""
+    data = json.dumps(request).encode()
+    req = urllib.request.Request(f"{base_url}/v1/messages", data=data, method="POST", headers={
+        "content-type": "application/json", "x-api-key": api_key or "stub",
+        "anthropic-version": API_VERSION})
+    started = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=60) as response:
+        body = json.load(response)
+    return body, (time.perf_counter() - started) * 1000
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(base_url: str, api_key: str, budget: int, repeat: int) -> dict:
+    rules = load_hook().classify_by_rules
+    builders = {"legacy": lambda p, s: legacy_request(p, s),
+                "compact": lambda p, s: build_request(p, s, budget)}
+    cases = []
+    for index, (prompt, label) in enumerate(CORPUS):
+        cases.append(("short", prompt, label))
+        cases.append(("long", long_variant(prompt, index), label))
+
+    results = {name: [] for name in builders}
+    for _ in range(repeat):
+        for kind, prompt, label in cases:
+            signals = rules(prompt).signals
+            for name, build in builders.items():
+                body, latency = call(base_url, api_key, build(prompt, signals))
+                try:
+                    route = parse_response(body["content"][0]["text"])["route"]
+                except (ValueError, KeyError, IndexError):
+                    route = None
+                usage = body.get("usage", {})
+                results[name].append({"kind": kind, "correct": route == label, "latency": latency,
+                                      "input_tokens": usage.get("input_tokens", 0),
+                                      "cache_read": usage.get("cache_read_input_tokens") or 0,
+                                      "cache_write": usage.get("cache_creation_input_tokens") or 0})
+    return results
+
+
+def summarize(rows: list) -> dict:
+    latencies = [r["latency"] for r in rows]
+    tokens = [r["input_tokens"] for r in rows]
+    return {"n": len(rows), "accuracy": sum(r["correct"] for r in rows) / len(rows) if rows else 0.0,
+            "tokens_p50": percentile(tokens, 0.5), "tokens_p95": percentile(tokens, 0.95),
+            "cache_read": sum(r["cache_read"] for r in rows), "cache_write": sum(r["cache_write"] for r in rows),
+            "p50_ms": percentile(latencies, 0.5), "p95_ms": percentile(latencies, 0.95)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM classifier request format")
+    parser.add_argument("--live", action="store_true", help="call the real API (needs ANTHROPIC_API_KEY)")
+    parser.add_argument("--base-url", help="Messages API base URL (default: local stub, or the real API with --live)")
+    parser.add_argument("--budget", type=int, default=None, help="query token budget for the compact request")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--min-cache-tokens", type=int, default=None,
+                        help="stub only: shortest cacheable prefix (default: the Haiku 4.5 minimum)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if args.live and not api_key:
+        parser.error("--live needs ANTHROPIC_API_KEY")
+    stub_options = {"min_cache_tokens": args.min_cache_tokens} if args.min_cache_tokens is not None else {}
+    base_url = args.base_url or (API_URL if args.live else start_in_thread(**stub_options).base_url)
+
+    results = run(base_url, api_key, args.budget, args.repeat)
+    report = {name: {scope: summarize([r for r in rows if scope == "all" or r["kind"] == scope])
+                     for scope in ("all", "short", "long")}
+              for name, rows in results.items()}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Classifier request benchmark ({'live API' if args.live else base_url})\n")
+    print(f"{'builder':<9}{'prompts':<8}{'n':>5}{'accuracy':>10}{'tokens p50':>12}{'tokens p95':>12}"
+          f"{'cache rd':>10}{'cache wr':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, scopes in report.items():
+        for scope, s in scopes.items():
+            print(f"{name:<9}{scope:<8}{s['n']:>5}{s['accuracy']:>10.0%}{s['tokens_p50']:>12}"
+                  f"{s['tokens_p95']:>12}{s['cache_read']:>10}{s['cache_write']:>10}"
+                  f"{s['p50_ms']:>9.0f}{s['p95_ms']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
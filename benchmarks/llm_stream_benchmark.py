@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Streaming Classifier Benchmark
+Compares three ways of getting the Haiku fallback's answer for the labeled
+corpus of llm_prompt_benchmark.py:
+
+- blocking   one non-streamed request, answer read when complete
+- full       streamed, but read to message_stop
+- early      streamed and closed as soon as route and confidence are known
+             (router_llm.stream_classification, what the hook does)
+
+Reports p50/p95 latency per mode and checks that the early answers give the
+same route (and confidence) as the complete ones.
+
+By default requests go to the local stand-in server (stub_anthropic.py),
+which emits one token every --token-delay-ms; with --live (needs
+ANTHROPIC_API_KEY) they go to the real API.
+
+Usage:
+    python3 benchmarks/llm_stream_benchmark.py [--live] [--base-url URL] [--repeat 3] [--token-delay-ms 8]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "hooks"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from llm_prompt_benchmark import CORPUS, call, long_variant, percentile  # noqa: E402
+from router_llm import API_URL, API_VERSION, build_request, parse_response, stream_classification  # noqa: E402
+from stub_anthropic import load_hook, start_in_thread  # noqa: E402
+
+
+def stream_full(base_url: str, api_key: str, request: dict) -> dict:
+    """Stream the answer and read it to the end."""
+    req = urllib.request.Request(
+        f"{base_url}/v1/messages", data=json.dumps(dict(request, stream=True)).encode(), method="POST",
+        headers={"content-type": "application/json", "x-api-key": api_key or "stub",
+                 "anthropic-version": API_VERSION})
+    text = ""
+    with urllib.request.urlopen(req, timeout=60) as response:
+        for raw in response:
+            if raw.startswith(b"data:"):
+                event = json.loads(raw[5:])
+                if event.get("type") == "content_block_delta":
+                    text += event["delta"].get("text", "")
+    return parse_response(text)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    value = fn(*args)
+    return value, (time.perf_counter() - started) * 1000
+
+
+def run(base_url: str, api_key: str, repeat: int) -> dict:
+    rules = load_hook().classify_by_rules
+    prompts = []
+    for index, (prompt, _label) in enumerate(CORPUS):
+        prompts += [prompt, long_variant(prompt, index)]
+
+    latencies = {"blocking": [], "full": [], "early": []}
+    mismatches = early_stops = 0
+    for _ in range(repeat):
+        for prompt in prompts:
+            request = build_request(prompt, rules(prompt).signals)
+            body, ms = call(base_url, api_key, request)
+            latencies["blocking"].append(ms)
+            complete = parse_response(body["content"][0]["text"])
+            _, ms = timed(stream_full, base_url, api_key, request)
+            latencies["full"].append(ms)
+            (early, _usage), ms = timed(stream_classification, api_key or "stub", request, base_url, 60)
+            latencies["early"].append(ms)
+            early_stops += early.get("early_stop", False)
+            if (early["route"], early["confidence"]) != (complete["route"], complete["confidence"]):
+                mismatches += 1
+    return {"n": len(prompts) * repeat, "early_stops": early_stops, "mismatches": mismatches,
+            "latency": {mode: {"p50_ms": percentile(values, 0.5), "p95_ms": percentile(values, 0.95)}
+                        for mode, values in latencies.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streamed classification with early termination")
+    parser.add_argument("--live", action="store_true", help="call the real API (needs ANTHROPIC_API_KEY)")
+    parser.add_argument("--base-url", help="Messages API base URL (default: local stub, or the real API with --live)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--token-delay-ms", type=float, default=None, help="stub only: delay per output token")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if args.live and not api_key:
+        parser.error("--live needs ANTHROPIC_API_KEY")
+    stub_options = {"token_delay_ms": args.token_delay_ms} if args.token_delay_ms is not None else {}
+    base_url = args.base_url or (API_URL if args.live else start_in_thread(**stub_options).base_url)
+
+    report = run(base_url, api_key, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Streaming classifier benchmark ({'live API' if args.live else base_url})\n")
+    print(f"{'mode':<10}{'p50 ms':>9}{'p95 ms':>9}")
+    for mode, s in report["latency"].items():
+        print(f"{mode:<10}{s['p50_ms']:>9.0f}{s['p95_ms']:>9.0f}")
+    print(f"\n{report['n']} requests, {report['early_stops']} stopped early, "
+          f"{report['mismatches']} early answers differ from the complete answer")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Stand-in Messages API for benchmarks
+A local HTTP server that answers POST /v1/messages like the Anthropic API
+does for the router's classifier calls, with latency modelled on request
+size: base_ms + per_token_ms for every input token, plus token_delay_ms for
+every output token. No key, no network.
+
+Prompt caching is modelled too: the prefix up to the last block carrying
+cache_control is cached for CACHE_TTL seconds if it is at least
+--min-cache-tokens long (the model minimum, 4096 for Haiku 4.5). Usage
+reports cache_creation_input_tokens / cache_read_input_tokens the way the
+API does, and cached tokens are read at a tenth of the per-token latency.
+
+The answer is produced by the router's own rules applied to the query part
+of the request (between <<< and >>>, or the legacy `Query: "..."` line), so
+a request that lost the information the rules need shows up as a wrong
+route - a rough offline proxy for classifier accuracy.
+
+Requests with "stream": true get a server-sent event stream shaped like the
+API's (message_start, content_block_delta per output token, message_delta,
+message_stop); the first event waits for the input latency and every text
+delta another --token-delay-ms, so a client that stops reading early saves
+the rest of the generation time.
+A client that hangs up mid-stream is fine.
+
+Usage:
+    python3 benchmarks/stub_anthropic.py [--port 8787] [--base-ms 150] [--per-token-ms 0.05]
+                                         [--min-cache-tokens 4096] [--token-delay-ms 8]
+
+Point a client at it with base_url=http://127.0.0.1:8787.
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+HOOKS_DIR = Path(__file__).resolve().parent.parent / "hooks"
+CHARS_PER_TOKEN = 4
+CACHE_TTL = 300
+MIN_CACHE_TOKENS = 4096
+TOKEN_DELAY_MS = 8
+
+QUERY_BLOCK = re.compile(r"<<<\n(.*)\n>>>", re.DOTALL)
+LEGACY_QUERY = re.compile(r'^Query: "(.*)"$', re.DOTALL | re.MULTILINE)
+
+
+def load_hook():
+    """Import hooks/classify-prompt.py (not a valid module name) for its rules."""
+    spec = importlib.util.spec_from_file_location("classify_prompt", HOOKS_DIR / "classify-prompt.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def request_blocks(body: dict) -> list:
+    """Text blocks the model would read, in order: system, then message content."""
+    blocks = []
+    for source in [body.get("system")] + [m.get("content") for m in body.get("messages", [])]:
+        if isinstance(source, str):
+            blocks.append({"type": "text", "text": source})
+        elif isinstance(source, list):
+            blocks += [block for block in source if block.get("type") == "text"]
+    return blocks
+
+
+def request_text(body: dict) -> str:
+    return "\n".join(block["text"] for block in request_blocks(body))
+
+
+def tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "claude-router-stub/1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/messages":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        text = request_text(body)
+        usage = self.server.cache_usage(body, tokens(text))
+        self.server.record(body, usage)
+        billed = usage["input_tokens"] + usage["cache_creation_input_tokens"]
+        time.sleep((self.server.base_ms + self.server.per_token_ms * billed
+                    + self.server.per_token_ms * 0.1 * usage["cache_read_input_tokens"]) / 1000)
+
+        match = QUERY_BLOCK.search(text) or LEGACY_QUERY.search(text)
+        result = self.server.classify(match.group(1) if match else text)
+        # Key order as the instructions ask: route and confidence before signals
+        answer = json.dumps({"route": result.route,
+                             "tool_intensive": bool(result.metadata.get("tool_intensive")),
+                             "confidence": result.confidence,
+                             "signals": result.signals[:3]})
+        message_id = f"msg_stub_{self.server.next_id()}"
+        if body.get("stream"):
+            try:
+                self._send_stream(message_id, body.get("model"), answer, usage)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client stopped reading early
+            return
+        time.sleep(self.server.token_delay_ms * tokens(answer) / 1000)
+        self._send_json({
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [{"type": "text", "text": answer}],
+            "stop_reason": "end_turn",
+            "usage": dict(usage, output_tokens=tokens(answer)),
+        })
+
+    def _send_stream(self, message_id: str, model: str, answer: str, usage: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(kind: str, payload: dict):
+            self.wfile.write(f"event: {kind}\ndata: {json.dumps(dict(payload, type=kind))}\n\n".encode())
+            self.wfile.flush()
+
+        event("message_start", {"message": {
+            "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+            "stop_reason": None, "usage": dict(usage, output_tokens=1)}})
+        event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+        for start in range(0, len(answer), CHARS_PER_TOKEN):
+            time.sleep(self.server.token_delay_ms / 1000)
+            event("content_block_delta", {"index": 0, "delta": {
+                "type": "text_delta", "text": answer[start:start + CHARS_PER_TOKEN]}})
+        event("content_block_stop", {"index": 0})
+        event("message_delta", {"delta": {"stop_reason": "end_turn"},
+                                "usage": {"output_tokens": tokens(answer)}})
+        event("message_stop", {})
+
+    def _send_json(self, payload: dict, status: int = 200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, base_ms: float = 150, per_token_ms: float = 0.05,
+                 min_cache_tokens: int = MIN_CACHE_TOKENS, token_delay_ms: float = TOKEN_DELAY_MS):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.base_ms = base_ms
+        self.per_token_ms = per_token_ms
+        self.min_cache_tokens = min_cache_tokens
+        self.token_delay_ms = token_delay_ms
+        self.classify = load_hook().classify_by_rules
+        self.requests = []          # (body, usage) of every request, for assertions
+        self._cache = {}            # prefix hash -> expiry
+        self._ids = 0
+        self._lock = threading.Lock()
+
+    def cache_usage(self, body: dict, total_tokens: int) -> dict:
+        """Split a request's input tokens into uncached / cache write / cache read."""
+        blocks = request_blocks(body)
+        marked = [i for i, block in enumerate(blocks) if block.get("cache_control")]
+        usage = {"input_tokens": total_tokens, "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+        if not marked:
+            return usage
+        prefix = "\n".join(block["text"] for block in blocks[:marked[-1] + 1])
+        prefix_tokens = tokens(prefix)
+        if prefix_tokens < self.min_cache_tokens:
+            return usage
+        key = hashlib.sha256(f"{body.get('model')}\0{prefix}".encode()).hexdigest()
+        now = time.monotonic()
+        with self._lock:
+            hit = self._cache.get(key, 0) > now
+            self._cache[key] = now + CACHE_TTL
+        usage["input_tokens"] = max(0, total_tokens - prefix_tokens)
+        usage["cache_read_input_tokens" if hit else "cache_creation_input_tokens"] = prefix_tokens
+        return usage
+
+    def record(self, body: dict, usage: dict):
+        with self._lock:
+            self.requests.append((body, usage))
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def start_in_thread(**kwargs) -> StubServer:
+    """Start a stub server on a free port in a daemon thread."""
+    server = StubServer(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--base-ms", type=float, default=150, help="fixed latency per request")
+    parser.add_argument("--per-token-ms", type=float, default=0.05, help="added latency per input token")
+    parser.add_argument("--min-cache-tokens", type=int, default=MIN_CACHE_TOKENS,
+                        help="shortest prefix that is cached (model minimum)")
+    parser.add_argument("--token-delay-ms", type=float, default=TOKEN_DELAY_MS,
+                        help="generation time per output token")
+    args = parser.parse_args()
+    server = StubServer(args.port, args.base_ms, args.per_token_ms, args.min_cache_tokens, args.token_delay_ms)
+    print(f"Stub Messages API on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -11,32 +11,37 @@ import json
 import sys
 import os
 import re
-import hashlib
+import time
 from pathlib import Path
 from datetime import datetime
-# Cross-platform file locking
-import platform
-if platform.system() == "Windows":
-    import msvcrt
-    def lock_file(f, exclusive=False):
-        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK if exclusive else msvcrt.LK_LOCK, 1)
-    def unlock_file(f):
-        try:
-            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
-        except OSError:
-            pass
-else:
-    import fcntl
-    def lock_file(f, exclusive=False):
-        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
-    def unlock_file(f):
-        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+# Sibling helper modules live next to this script (hooks/router_*.py)
+_HOOKS_DIR = str(Path(__file__).resolve().parent)
+if _HOOKS_DIR not in sys.path:
+    sys.path.insert(0, _HOOKS_DIR)
+
+from router_breaker import before_call, new_breaker, record_failure, record_success
+from router_calibration import (ESCALATION, calibrate, count_agreement, count_decision, count_retry,
+                                llm_fallback_needed, load_calibration, update_calibration)
+from router_decisions import append_decision
+from router_features import LENGTH_CLASSES, Classification, features_of
+from router_histogram import record_latency
+from router_knowledge import files_signature, load_routing_weights
+from router_metrics import maybe_export
+from router_pack import open_pack, pack_path
+from router_profile import run as run_profiled
+from router_rollups import record_decision, record_latency_at, seed_from_sessions
+from router_state import append_record, atomic_write_json, drain_records, update_json, update_text
+from router_usage import apply_usage, ingest_transcript
+from router_watch import PathWatcher
 
 # Confidence threshold for LLM fallback
 CONFIDENCE_THRESHOLD = 0.7
 
-# Stats file location
+# Stats file location, and the journal of decisions whose writer could not
+# get the stats lock in time (merged by the next writer)
 STATS_FILE = Path.home() / ".claude" / "router-stats.json"
+STATS_PENDING_FILE = Path.home() / ".claude" / "router-stats.pending.jsonl"
 
 # Cost estimates per 1M tokens (input/output)
 COST_PER_1M = {
@@ -60,20 +65,41 @@ EXCEPTION_PATTERNS = [
     re.compile(r'\bclassif(y|ication)\b.*\b(prompt|query)'),
 ]
 
+# Informed routing: summed learned-keyword weight needed to adjust a route
+# (roughly two distinctive keywords; see router_knowledge.build_weight_table).
+# Overridable with "informed_routing_threshold" in knowledge/state.json.
+LEARNED_SCORE_THRESHOLD = 1.5
+
 # Classification cache settings
 CACHE_MAX_ENTRIES = 100
 CACHE_TTL_DAYS = 30
 
-# In-memory cache for extracted learning keywords (mtime-based invalidation)
-_KEYWORDS_CACHE = {"keywords": None, "mtime": 0}
+# In-process cache for filesystem-derived state (knowledge dir, learning state,
+# learned keyword weights, plugin map). Entries are dropped only when the watcher
+# reports a change to the files behind them, so steady-state lookups do no I/O.
+_FS_CACHE = {}
+_FS_WATCHER = PathWatcher()
+# Keys derived from files inside the knowledge dir (reloaded if it moves)
+_KNOWLEDGE_KEYS = ("learning_state", "learned_weights", "cache_pack")
 
 # In-memory classification cache (avoids file I/O for repeated queries in same session)
 # LRU-style: limited to 50 entries, cleared on process restart
 _MEMORY_CACHE = {}
 _MEMORY_CACHE_MAX = 50
 
-# Session state file for multi-turn context awareness
+# Session state for multi-turn context awareness: one compact shard per
+# Claude Code session (keyed by the hook's session_id), legacy global file
+# when no session_id is provided
+SESSION_STATE_DIR = Path.home() / ".claude" / "router-sessions"
 SESSION_STATE_FILE = Path.home() / ".claude" / "router-session.json"
+SESSION_CONTEXT_TTL = 1800  # 30 min: older state gives no follow-up context
+SESSION_SHARD_TTL = 24 * 3600  # Shards untouched for a day are deleted
+_SESSION_CACHE = {}
+
+# Retry calibration counters (router_calibration), loaded once per process;
+# changes are queued and applied to the file under its lock at the end of the run
+_CALIBRATION = None
+_CALIBRATION_CHANGES = []
 
 # Follow-up query patterns (pre-compiled)
 FOLLOW_UP_PATTERNS = [
@@ -87,22 +113,61 @@ FOLLOW_UP_PATTERNS = [
 # Official plugins that claude-router can integrate with (optional)
 SUPPORTED_PLUGINS = ["hookify", "ralph-loop", "code-review", "feature-dev"]
 
+# Common plugin locations
+PLUGIN_LOCATIONS = [
+    Path.home() / ".claude" / "plugins",
+    Path.home() / ".config" / "claude-code" / "plugins",
+]
+
+
+def fs_cached(key: str, load):
+    """Return a cached filesystem-derived value, reloading it only after a change.
+
+    load() returns (value, watched) where watched is a list of (path, contents)
+    pairs registered with the watcher; a change to any of them drops the entry.
+    """
+    stale = _FS_WATCHER.poll()
+    if "knowledge_dir" in stale:
+        stale.update(_KNOWLEDGE_KEYS)
+    for stale_key in stale:
+        _FS_CACHE.pop(stale_key, None)
+
+    if key not in _FS_CACHE:
+        value, watched = load()
+        _FS_WATCHER.unwatch(key)
+        for path, contents in watched:
+            _FS_WATCHER.watch(path, key, contents)
+        _FS_CACHE[key] = value
+    return _FS_CACHE[key]
+
+
+def enable_fs_watch() -> bool:
+    """Switch cache invalidation to inotify (for long-lived processes).
+
+    One-shot hook runs keep the default polling watcher, which never re-stats
+    within a run. Returns False if inotify is unavailable.
+    """
+    return _FS_WATCHER.start_inotify()
+
 
 def detect_installed_plugins() -> dict:
-    """Check which official plugins are installed."""
-    detected = {}
-    # Check common plugin locations
-    plugin_locations = [
-        Path.home() / ".claude" / "plugins",
-        Path.home() / ".config" / "claude-code" / "plugins",
-    ]
-    for plugin in SUPPORTED_PLUGINS:
-        detected[plugin] = False
-        for loc in plugin_locations:
-            if (loc / plugin).exists() or (loc / f"{plugin}.md").exists():
-                detected[plugin] = True
-                break
-    return detected
+    """Check which official plugins are installed.
+
+    Lists each plugin location once rather than probing every candidate path.
+    """
+    def load():
+        detected = {plugin: False for plugin in SUPPORTED_PLUGINS}
+        for loc in PLUGIN_LOCATIONS:
+            try:
+                names = set(os.listdir(loc))
+            except OSError:
+                continue
+            for plugin in SUPPORTED_PLUGINS:
+                if plugin in names or f"{plugin}.md" in names:
+                    detected[plugin] = True
+        return detected, [(loc, True) for loc in PLUGIN_LOCATIONS]
+
+    return fs_cached("plugins", load)
 
 
 def get_plugin_integrations() -> dict:
@@ -123,47 +188,96 @@ def is_plugin_enabled(plugin_name: str) -> bool:
     return detected and enabled
 
 
-def get_session_state() -> dict:
-    """Get the current session state for multi-turn context awareness."""
+def get_session_file(session_id: str = None) -> Path:
+    """Get the session state shard for a Claude Code session.
+
+    Falls back to the legacy global file when the hook input has no session_id.
+    """
+    if not session_id:
+        return SESSION_STATE_FILE
+    safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', session_id)[:64]
+    return SESSION_STATE_DIR / f"{safe_id}.json"
+
+
+def load_session_state(session_id: str = None) -> dict:
+    """Load a session's raw state shard (memoized for the life of the process)."""
+    if session_id in _SESSION_CACHE:
+        return _SESSION_CACHE[session_id]
     try:
-        if SESSION_STATE_FILE.exists():
-            with open(SESSION_STATE_FILE, 'r') as f:
-                state = json.load(f)
-                # Check if session is stale (older than 30 minutes)
-                last_query = state.get("last_query_time", 0)
-                if datetime.now().timestamp() - last_query > 1800:  # 30 min
-                    return {"last_route": None, "conversation_depth": 0}
-                return state
-        return {"last_route": None, "conversation_depth": 0}
+        with open(get_session_file(session_id), 'r') as f:
+            state = json.load(f)
     except Exception:
+        state = {}
+    _SESSION_CACHE[session_id] = state
+    return state
+
+
+def get_session_state(session_id: str = None) -> dict:
+    """Get the current session state for multi-turn context awareness."""
+    state = load_session_state(session_id)
+    # Check if session is stale (older than 30 minutes)
+    last_query = state.get("last_query_time", 0)
+    if datetime.now().timestamp() - last_query > SESSION_CONTEXT_TTL:
         return {"last_route": None, "conversation_depth": 0}
+    return state
 
 
-def update_session_state(route: str, metadata: dict = None):
-    """Update session state after a routing decision."""
+def cleanup_session_shards():
+    """Delete session shards that have not been written within SESSION_SHARD_TTL."""
+    cutoff = datetime.now().timestamp() - SESSION_SHARD_TTL
     try:
-        SESSION_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
-        state = get_session_state()
+        with os.scandir(SESSION_STATE_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    try:
+                        os.unlink(entry.path)
+                    except OSError:
+                        pass
+    except OSError:
+        pass
+
+
+def update_session_state(route: str, metadata: dict = None, session_id: str = None, usage_cursor: dict = None,
+                         decision: dict = None):
+    """Update session state after a routing decision.
+
+    Each session writes only its own shard, so concurrent sessions neither
+    overwrite each other's last_route nor contend on a shared file. decision
+    (fingerprint, signals, method, route) is kept so a /retry can be charged
+    to it.
+    """
+    try:
+        session_file = get_session_file(session_id)
+        is_new_shard = not load_session_state(session_id)
+        session_file.parent.mkdir(parents=True, exist_ok=True)
+        state = dict(get_session_state(session_id))
         state["last_route"] = route
         state["last_query_time"] = datetime.now().timestamp()
         state["conversation_depth"] = state.get("conversation_depth", 0) + 1
         state["last_metadata"] = metadata or {}
-        with open(SESSION_STATE_FILE, 'w') as f:
-            json.dump(state, f)
+        if usage_cursor is not None:
+            state["usage_cursor"] = usage_cursor
+        if decision is not None:
+            state["last_decision"] = decision
+        atomic_write_json(session_file, state)
+        _SESSION_CACHE[session_id] = state
+        # Sweep expired shards once per new session rather than on every prompt
+        if is_new_shard and session_id:
+            cleanup_session_shards()
     except Exception:
         pass  # Don't fail on state errors
 
 
-def is_follow_up_query(prompt: str) -> bool:
-    """Check if the query appears to be a follow-up to a previous query."""
-    prompt_lower = prompt.lower().strip()
+def is_follow_up_query(prompt) -> bool:
+    """Check if the query (str or PromptFeatures) appears to be a follow-up to a previous query."""
+    stripped = features_of(prompt).stripped
     for pattern in FOLLOW_UP_PATTERNS:
-        if pattern.match(prompt_lower):
+        if pattern.match(stripped):
             return True
     return False
 
 
-def apply_context_boost(result: dict, session_state: dict, is_follow_up: bool) -> dict:
+def apply_context_boost(result: Classification, session_state: dict, is_follow_up: bool) -> Classification:
     """Apply confidence boost based on conversation context.
 
     If this is a follow-up to a deep/complex query, boost confidence toward same route.
@@ -175,15 +289,14 @@ def apply_context_boost(result: dict, session_state: dict, is_follow_up: bool) -
     if not last_route:
         return result
 
-    result["metadata"] = result.get("metadata", {})
-    result["metadata"]["follow_up"] = True
+    result.metadata["follow_up"] = True
 
     # If last route was deep/standard, boost current toward same
     # (follow-ups to complex queries are often also complex)
-    if last_route in ("deep", "standard") and result["route"] == "fast":
-        if result["confidence"] < 0.8:
-            result["confidence"] = min(0.75, result["confidence"] + 0.15)
-            result["metadata"]["context_boost"] = f"follow_up_to_{last_route}"
+    if last_route in ("deep", "standard") and result.route == "fast":
+        if result.confidence < 0.8:
+            result.confidence = min(0.75, result.confidence + 0.15)
+            result.metadata["context_boost"] = f"follow_up_to_{last_route}"
             # Don't change route, just boost confidence to potentially trigger LLM
 
     return result
@@ -191,103 +304,156 @@ def apply_context_boost(result: dict, session_state: dict, is_follow_up: bool) -
 
 def get_knowledge_dir() -> Path:
     """Get the knowledge directory path (project-local)."""
-    # Try to find knowledge/ relative to this script's location
-    script_dir = Path(__file__).parent.parent  # Go up from hooks/ to project root
-    knowledge_dir = script_dir / "knowledge"
-    if knowledge_dir.exists():
-        return knowledge_dir
-    # Fallback: check current working directory
-    cwd_knowledge = Path.cwd() / "knowledge"
-    if cwd_knowledge.exists():
-        return cwd_knowledge
-    return None
+    def load():
+        # Try to find knowledge/ relative to this script's location,
+        # then fall back to the current working directory
+        script_dir = Path(__file__).parent.parent  # Go up from hooks/ to project root
+        candidates = [script_dir / "knowledge", Path.cwd() / "knowledge"]
+        knowledge_dir = next((c for c in candidates if c.exists()), None)
+        return knowledge_dir, [(c, False) for c in candidates]
 
-def generate_fingerprint(prompt: str) -> str:
-    """Generate a fingerprint for a prompt to enable fuzzy cache matching."""
-    # Normalize: lowercase, strip, collapse whitespace
-    normalized = re.sub(r'\s+', ' ', prompt.lower().strip())
+    return fs_cached("knowledge_dir", load)
 
-    # Extract key terms (remove common words)
-    stop_words = {'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been',
-                  'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
-                  'would', 'could', 'should', 'may', 'might', 'must', 'can',
-                  'to', 'of', 'in', 'for', 'on', 'with', 'at', 'by', 'from',
-                  'this', 'that', 'these', 'those', 'it', 'its', 'i', 'me', 'my'}
+def generate_fingerprint(prompt) -> str:
+    """Fingerprint of a prompt (str or PromptFeatures) for fuzzy cache matching.
 
-    words = re.findall(r'\b[a-z]+\b', normalized)
-    key_terms = [w for w in words if w not in stop_words and len(w) > 2]
+    md5 of its sorted distinct key terms (stop words and words under three
+    letters dropped, first ten kept); see router_features.PromptFeatures.
+    """
+    return features_of(prompt).fingerprint
 
-    # Sort for consistency and take first 10 terms
-    key_terms = sorted(set(key_terms))[:10]
-    fingerprint_str = ' '.join(key_terms)
 
-    # Generate hash
-    return hashlib.md5(fingerprint_str.encode()).hexdigest()[:12]
+def _parse_cache_entry(content: str, fingerprint: str) -> Classification:
+    """Parse the classifications.md entry for fingerprint (None if absent)."""
+    # Look for matching fingerprint section
+    pattern = rf'## \[{fingerprint}\].*?(?=\n## \[|$)'
+    match = re.search(pattern, content, re.DOTALL)
 
-def check_classification_cache(prompt: str) -> dict:
-    """Check if a similar query exists in the cache.
+    if not match:
+        return None
 
-    Checks in-memory cache first (fastest), then falls back to file cache.
-    """
-    fingerprint = generate_fingerprint(prompt)
+    entry = match.group(0)
 
-    # Check in-memory cache first (no I/O)
-    if fingerprint in _MEMORY_CACHE:
-        result = _MEMORY_CACHE[fingerprint].copy()
-        result["metadata"] = result.get("metadata", {})
-        result["metadata"]["memory_cache_hit"] = True
+    # Parse the cached entry
+    route_match = re.search(r'\*\*Route:\*\* (\w+)', entry)
+    conf_match = re.search(r'\*\*Confidence:\*\* ([\d.]+)', entry)
+
+    if route_match and conf_match:
+        result = Classification(route_match.group(1), float(conf_match.group(1)), ["cache_hit"], "cache",
+                                {"cache_hit": True, "fingerprint": fingerprint})
+        # Populate memory cache for faster subsequent lookups
+        _MEMORY_CACHE[fingerprint] = result.copy()
         return result
 
-    try:
-        knowledge_dir = get_knowledge_dir()
-        if not knowledge_dir:
-            return None
+    return None
 
-        cache_file = knowledge_dir / "cache" / "classifications.md"
-        if not cache_file.exists():
-            return None
 
-        with open(cache_file, 'r') as f:
-            content = f.read()
+def _read_cache_file() -> str:
+    knowledge_dir = get_knowledge_dir()
+    if not knowledge_dir:
+        return None
 
-        # Look for matching fingerprint section
-        pattern = rf'## \[{fingerprint}\].*?(?=\n## \[|$)'
-        match = re.search(pattern, content, re.DOTALL)
+    cache_file = knowledge_dir / "cache" / "classifications.md"
+    if not cache_file.exists():
+        return None
 
-        if not match:
-            return None
+    with open(cache_file, 'r') as f:
+        return f.read()
 
-        entry = match.group(0)
 
-        # Parse the cached entry
-        route_match = re.search(r'\*\*Route:\*\* (\w+)', entry)
-        conf_match = re.search(r'\*\*Confidence:\*\* ([\d.]+)', entry)
+def get_cache_pack():
+    """The read-only team cache pack (router_pack), or None if there is none."""
+    def load():
+        path = pack_path(get_knowledge_dir())
+        return open_pack(path), [(path, False)] if path else []
+
+    return fs_cached("cache_pack", load)
 
-        if route_match and conf_match:
-            result = {
-                "route": route_match.group(1),
-                "confidence": float(conf_match.group(1)),
-                "signals": ["cache_hit"],
-                "method": "cache",
-                "metadata": {"cache_hit": True, "fingerprint": fingerprint}
-            }
-            # Populate memory cache for faster subsequent lookups
-            _MEMORY_CACHE[fingerprint] = result.copy()
-            return result
 
+def _pack_cache_hit(fingerprint: str) -> Classification:
+    pack = get_cache_pack()
+    hit = pack.lookup(fingerprint) if pack else None
+    if not hit:
         return None
+    result = Classification(hit[0], hit[1], ["cache_hit"], "cache",
+                            {"cache_hit": True, "pack_hit": True, "fingerprint": fingerprint})
+    _MEMORY_CACHE[fingerprint] = result.copy()
+    return result
+
+
+def _memory_cache_hit(fingerprint: str) -> Classification:
+    if fingerprint not in _MEMORY_CACHE:
+        return None
+    result = _MEMORY_CACHE[fingerprint].copy()
+    result.metadata["memory_cache_hit"] = True
+    return result
+
+
+def check_classification_cache(prompt) -> Classification:
+    """Check if a similar query (str or PromptFeatures) exists in the cache.
+
+    Checks in-memory cache first (fastest), then falls back to file cache,
+    then to the team cache pack (local entries override the pack).
+    """
+    fingerprint = generate_fingerprint(prompt)
+
+    # Check in-memory cache first (no I/O)
+    cached = _memory_cache_hit(fingerprint)
+    if cached:
+        return cached
+
+    try:
+        content = _read_cache_file()
+        cached = _parse_cache_entry(content, fingerprint) if content else None
+        return cached or _pack_cache_hit(fingerprint)
     except Exception:
         # Cache errors should never break classification
         return None
 
-def write_classification_cache(prompt: str, result: dict):
-    """Write a classification result to the cache.
+
+def check_classification_cache_batch(prompts: list) -> list:
+    """check_classification_cache for several prompts, reading the cache file at most once."""
+    fingerprints = [generate_fingerprint(p) for p in prompts]
+    results = [_memory_cache_hit(fp) for fp in fingerprints]
+    if all(results):
+        return results
+    try:
+        content = _read_cache_file()
+        if content:
+            results = [r or _parse_cache_entry(content, fp) for r, fp in zip(results, fingerprints)]
+        results = [r or _pack_cache_hit(fp) for r, fp in zip(results, fingerprints)]
+    except Exception:
+        pass  # Cache errors should never break classification
+    return results
+
+
+def format_cache_entry(fingerprint: str, prompt: str, route: str, confidence: float, last_used: str,
+                       hit_count: int = 1) -> str:
+    """One classifications.md entry (the prompt is stored as a 50-char preview)."""
+    # Truncate prompt for storage (first 50 chars + pattern type)
+    prompt_preview = prompt[:50].replace('\n', ' ')
+    if len(prompt) > 50:
+        prompt_preview += "..."
+
+    return f"""
+## [{fingerprint}]
+- **Query pattern:** "{prompt_preview}"
+- **Route:** {route}
+- **Confidence:** {confidence:.2f}
+- **Last used:** {last_used}
+- **Hit count:** {hit_count}
+"""
+
+
+def write_classification_cache(prompt, result: Classification):
+    """Write a classification result for a prompt (str or PromptFeatures) to the cache.
 
     Writes to both in-memory cache (fast) and file cache (persistent).
     """
     global _MEMORY_CACHE
 
-    fingerprint = generate_fingerprint(prompt)
+    features = features_of(prompt)
+    fingerprint = features.fingerprint
 
     # Write to memory cache first (always, even if file cache fails)
     # Simple LRU: if at max, remove oldest entry
@@ -295,12 +461,7 @@ def write_classification_cache(prompt: str, result: dict):
         # Remove first (oldest) entry
         oldest_key = next(iter(_MEMORY_CACHE))
         del _MEMORY_CACHE[oldest_key]
-    _MEMORY_CACHE[fingerprint] = {
-        "route": result["route"],
-        "confidence": result["confidence"],
-        "signals": result.get("signals", []),
-        "method": "cache",
-    }
+    _MEMORY_CACHE[fingerprint] = Classification(result.route, result.confidence, list(result.signals), "cache")
 
     try:
         knowledge_dir = get_knowledge_dir()
@@ -314,152 +475,98 @@ def write_classification_cache(prompt: str, result: dict):
         # fingerprint already generated above for memory cache
         today = datetime.now().strftime("%Y-%m-%d")
 
-        # Read existing cache
-        with open(cache_file, 'r') as f:
-            content = f.read()
-
-        # Check if this fingerprint already exists
-        if f'## [{fingerprint}]' in content:
-            # Update last used date and hit count
-            pattern = rf'(## \[{fingerprint}\].*?\*\*Last used:\*\* )\d{{4}}-\d{{2}}-\d{{2}}'
-            content = re.sub(pattern, rf'\g<1>{today}', content, flags=re.DOTALL)
-
-            hit_pattern = rf'(## \[{fingerprint}\].*?\*\*Hit count:\*\* )(\d+)'
-            hit_match = re.search(hit_pattern, content, re.DOTALL)
-            if hit_match:
-                new_count = int(hit_match.group(2)) + 1
-                content = re.sub(hit_pattern, rf'\g<1>{new_count}', content, flags=re.DOTALL)
-
-            with open(cache_file, 'w') as f:
-                lock_file(f, exclusive=True)
-                f.write(content)
-                unlock_file(f)
-            return
-
-        # Create new entry
-        # Truncate prompt for storage (first 50 chars + pattern type)
-        prompt_preview = prompt[:50].replace('\n', ' ')
-        if len(prompt) > 50:
-            prompt_preview += "..."
-
-        entry = f"""
-## [{fingerprint}]
-- **Query pattern:** "{prompt_preview}"
-- **Route:** {result["route"]}
-- **Confidence:** {result["confidence"]:.2f}
-- **Last used:** {today}
-- **Hit count:** 1
-"""
-
-        # Count existing entries
-        entry_count = len(re.findall(r'^## \[', content, re.MULTILINE))
-
-        # If at max, evict oldest entry (by last used date)
-        if entry_count >= CACHE_MAX_ENTRIES:
-            # Find all entries with their dates
-            entries = re.findall(r'(## \[[^\]]+\].*?\*\*Last used:\*\* (\d{4}-\d{2}-\d{2}).*?)(?=\n## \[|$)',
-                                content, re.DOTALL)
-            if entries:
-                # Sort by date and remove oldest
-                entries_sorted = sorted(entries, key=lambda x: x[1])
-                oldest_entry = entries_sorted[0][0]
-                content = content.replace(oldest_entry, '')
-
-        # Append new entry
-        content = content.rstrip() + '\n' + entry
-
-        # Update frontmatter entry count
-        new_count = len(re.findall(r'^## \[', content, re.MULTILINE))
-        content = re.sub(r'entry_count: \d+', f'entry_count: {new_count}', content)
-        content = re.sub(r'last_updated: .*', f'last_updated: "{datetime.now().isoformat()}"', content)
-
-        with open(cache_file, 'w') as f:
-            lock_file(f, exclusive=True)
-            f.write(content)
-            unlock_file(f)
+        def update(content):
+            if content is None:
+                return None
+
+            # Check if this fingerprint already exists
+            if f'## [{fingerprint}]' in content:
+                # Update last used date and hit count
+                pattern = rf'(## \[{fingerprint}\].*?\*\*Last used:\*\* )\d{{4}}-\d{{2}}-\d{{2}}'
+                content = re.sub(pattern, rf'\g<1>{today}', content, flags=re.DOTALL)
+
+                hit_pattern = rf'(## \[{fingerprint}\].*?\*\*Hit count:\*\* )(\d+)'
+                hit_match = re.search(hit_pattern, content, re.DOTALL)
+                if hit_match:
+                    new_count = int(hit_match.group(2)) + 1
+                    content = re.sub(hit_pattern, rf'\g<1>{new_count}', content, flags=re.DOTALL)
+                return content
+
+            # Create new entry
+            entry = format_cache_entry(fingerprint, features.text, result.route, result.confidence, today)
+
+            # Count existing entries
+            entry_count = len(re.findall(r'^## \[', content, re.MULTILINE))
+
+            # If at max, evict oldest entry (by last used date)
+            if entry_count >= CACHE_MAX_ENTRIES:
+                # Find all entries with their dates
+                entries = re.findall(r'(## \[[^\]]+\].*?\*\*Last used:\*\* (\d{4}-\d{2}-\d{2}).*?)(?=\n## \[|$)',
+                                    content, re.DOTALL)
+                if entries:
+                    # Sort by date and remove oldest
+                    entries_sorted = sorted(entries, key=lambda x: x[1])
+                    oldest_entry = entries_sorted[0][0]
+                    content = content.replace(oldest_entry, '')
+
+            # Append new entry
+            content = content.rstrip() + '\n' + entry
+
+            # Update frontmatter entry count
+            new_count = len(re.findall(r'^## \[', content, re.MULTILINE))
+            content = re.sub(r'entry_count: \d+', f'entry_count: {new_count}', content)
+            content = re.sub(r'last_updated: .*', f'last_updated: "{datetime.now().isoformat()}"', content)
+            return content
+
+        # Read-modify-write under the cache lock; if it stays busy past the
+        # bounded wait the entry is simply not persisted (memory cache has it)
+        update_text(cache_file, update)
 
     except Exception:
         # Cache errors should never break classification
         pass
 
 def get_learning_state() -> dict:
-    """Get the current learning state."""
-    try:
+    """Get the current learning state (cached until state.json changes)."""
+    def load():
         knowledge_dir = get_knowledge_dir()
         if not knowledge_dir:
-            return {}
+            return {}, []
         state_file = knowledge_dir / "state.json"
-        if state_file.exists():
+        try:
             with open(state_file, 'r') as f:
-                return json.load(f)
-        return {}
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        return state, [(state_file, False)]
+
+    try:
+        return fs_cached("learning_state", load)
     except Exception:
         return {}
 
-def extract_learning_keywords() -> dict:
-    """Extract keywords from learnings files to inform routing.
+def get_learned_weights() -> dict:
+    """Learned keyword weights ({"deep": {term: weight}, "fast": {...}}) for routing.
 
-    Uses mtime-based caching to avoid re-parsing files on every call.
+    Backed by the precomputed weight table next to the knowledge index
+    (router_knowledge) and cached in-process until a learnings file or the
+    labeled history changes (see fs_cached).
     """
-    global _KEYWORDS_CACHE
-
-    try:
+    def load():
         knowledge_dir = get_knowledge_dir()
         if not knowledge_dir:
-            return {"deep_keywords": set(), "fast_keywords": set()}
-
-        # Check file modification times for cache invalidation
-        quirks_file = knowledge_dir / "learnings" / "quirks.md"
-        patterns_file = knowledge_dir / "learnings" / "patterns.md"
-
-        quirks_mtime = quirks_file.stat().st_mtime if quirks_file.exists() else 0
-        patterns_mtime = patterns_file.stat().st_mtime if patterns_file.exists() else 0
-        current_mtime = max(quirks_mtime, patterns_mtime)
-
-        # Return cached result if files haven't changed
-        if _KEYWORDS_CACHE["keywords"] is not None and _KEYWORDS_CACHE["mtime"] >= current_mtime:
-            return _KEYWORDS_CACHE["keywords"]
-
-        deep_keywords = set()
-        fast_keywords = set()
-
-        # Parse quirks.md for complexity indicators
-        if quirks_file.exists():
-            with open(quirks_file, 'r') as f:
-                content = f.read().lower()
-            # Extract keywords from quirk entries that suggest complexity
-            for match in re.findall(r'## quirk:.*?(?=## |$)', content, re.DOTALL):
-                if any(word in match for word in ['complex', 'tricky', 'careful', 'unusual', 'non-standard']):
-                    # Extract the topic area (location field)
-                    loc_match = re.search(r'\*\*location:\*\*\s*([^\n]+)', match)
-                    if loc_match:
-                        # Extract meaningful words from location
-                        words = re.findall(r'\b[a-z]{3,}\b', loc_match.group(1).lower())
-                        deep_keywords.update(words)
-
-        # Parse patterns.md for simple patterns
-        if patterns_file.exists():
-            with open(patterns_file, 'r') as f:
-                content = f.read().lower()
-            for match in re.findall(r'## pattern:.*?(?=## |$)', content, re.DOTALL):
-                if any(word in match for word in ['simple', 'straightforward', 'always', 'standard']):
-                    # Extract topic keywords
-                    insight_match = re.search(r'\*\*insight:\*\*\s*([^\n]+)', match)
-                    if insight_match:
-                        words = re.findall(r'\b[a-z]{3,}\b', insight_match.group(1).lower())
-                        fast_keywords.update(words)
-
-        result = {"deep_keywords": deep_keywords, "fast_keywords": fast_keywords}
-
-        # Cache the result with current mtime
-        _KEYWORDS_CACHE["keywords"] = result
-        _KEYWORDS_CACHE["mtime"] = current_mtime
+            return {"deep": {}, "fast": {}}, []
+        learnings_dir = knowledge_dir / "learnings"
+        watched = [(learnings_dir, True), (knowledge_dir / "cache" / "classifications.md", False)]
+        watched += [(learnings_dir / name, False) for name in files_signature(learnings_dir)]
+        return load_routing_weights(knowledge_dir), watched
 
-        return result
+    try:
+        return fs_cached("learned_weights", load)
     except Exception:
-        return {"deep_keywords": set(), "fast_keywords": set()}
+        return {"deep": {}, "fast": {}}
 
-def apply_learned_adjustments(prompt: str, result: dict) -> dict:
+def apply_learned_adjustments(prompt, result: Classification) -> Classification:
     """Apply learned knowledge to adjust routing confidence (conservative)."""
     try:
         state = get_learning_state()
@@ -468,38 +575,46 @@ def apply_learned_adjustments(prompt: str, result: dict) -> dict:
         if not state.get("informed_routing", False):
             return result
 
+        weights = get_learned_weights()
+        deep_weights, fast_weights = weights["deep"], weights["fast"]
+        if not deep_weights and not fast_weights:
+            return result
+
         boost = state.get("informed_routing_boost", 0.1)
-        keywords = extract_learning_keywords()
+        threshold = state.get("informed_routing_threshold", LEARNED_SCORE_THRESHOLD)
 
-        prompt_lower = prompt.lower()
-        deep_matches = sum(1 for kw in keywords["deep_keywords"] if kw in prompt_lower)
-        fast_matches = sum(1 for kw in keywords["fast_keywords"] if kw in prompt_lower)
+        # One pass over the prompt's distinct words, one lookup each
+        deep_score = fast_score = 0.0
+        for term in features_of(prompt).terms:
+            deep_score += deep_weights.get(term, 0.0)
+            fast_score += fast_weights.get(term, 0.0)
 
-        # Only adjust if we have meaningful signal (2+ keyword matches)
+        # Only adjust if the matched keywords carry enough weight; common
+        # words weigh little, so they no longer add up to a deep boost.
         # Conservative: require more evidence for expensive routes
-        if deep_matches >= 2 and result["route"] != "deep":
+        if deep_score >= threshold and result.route != "deep":
             # Boost toward deep, but cap at 0.1 increase
-            result["confidence"] = min(1.0, result["confidence"] + boost)
-            if result["confidence"] >= 0.8:
-                result["route"] = "deep"
-                result["metadata"] = result.get("metadata", {})
-                result["metadata"]["learned_boost"] = "deep"
+            result.confidence = min(1.0, result.confidence + boost)
+            if result.confidence >= 0.8:
+                result.route = "deep"
+                result.metadata["learned_boost"] = "deep"
+                result.metadata["learned_score"] = round(deep_score, 3)
 
-        elif fast_matches >= 2 and result["route"] == "deep":
+        elif fast_score >= threshold and result.route == "deep":
             # If learned patterns suggest simple, consider downgrading
             # But be conservative - don't downgrade high-confidence deep
-            if result["confidence"] < 0.8:
-                result["route"] = "standard"
-                result["metadata"] = result.get("metadata", {})
-                result["metadata"]["learned_boost"] = "downgrade"
+            if result.confidence < 0.8:
+                result.route = "standard"
+                result.metadata["learned_boost"] = "downgrade"
+                result.metadata["learned_score"] = round(fast_score, 3)
 
         return result
     except Exception:
         return result
 
-def is_exception_query(prompt: str) -> tuple[bool, str]:
-    """Check if query matches exception patterns that bypass routing."""
-    prompt_lower = prompt.lower()
+def is_exception_query(prompt) -> tuple[bool, str]:
+    """Check if query (str or PromptFeatures) matches exception patterns that bypass routing."""
+    prompt_lower = features_of(prompt).lower
     for pattern in EXCEPTION_PATTERNS:
         if pattern.search(prompt_lower):  # Pre-compiled patterns use .search()
             return True, "router_meta"
@@ -572,6 +687,12 @@ PATTERNS = {
     ],
 }
 
+# Identity of each rule pattern ("category:regex"): signals are the matched
+# prompt text, so calibration counters are keyed by the rules instead
+RULE_IDS = {category: [f"{category}:{p.pattern}" for p in patterns] for category, patterns in PATTERNS.items()}
+# When nothing matches, the default rule is told apart by prompt length
+NO_RULE = {name: f"fast:default:{name}" for name in [name for name, _ in LENGTH_CLASSES] + ["long"]}
+
 
 def get_api_key():
     """Get API key from environment or common locations."""
@@ -613,116 +734,241 @@ def calculate_cost(route: str, input_tokens: int = AVG_INPUT_TOKENS, output_toke
     return input_cost + output_cost
 
 
-def log_routing_decision(route: str, confidence: float, method: str, signals: list, metadata: dict = None):
-    """Log routing decision to stats file with optional metadata tracking."""
-    try:
-        # Ensure directory exists
-        STATS_FILE.parent.mkdir(parents=True, exist_ok=True)
-
-        # Load existing stats or create new (v1.2 schema with exception tracking)
-        stats = {
-            "version": "1.2",
-            "total_queries": 0,
-            "routes": {"fast": 0, "standard": 0, "deep": 0, "orchestrated": 0},
-            "exceptions": {"router_meta": 0, "slash_commands": 0},
-            "tool_intensive_queries": 0,
-            "orchestrated_queries": 0,
-            "estimated_savings": 0.0,
-            "delegation_savings": 0.0,
-            "sessions": [],
-            "last_updated": None
-        }
+def get_route_label(route: str, metadata: dict) -> str:
+    """Route name as tracked in stats (orchestrated deep queries are counted separately)."""
+    if metadata.get("orchestration") and route == "deep":
+        return "orchestrated"
+    return route
+
+
+def new_stats() -> dict:
+    """Empty stats (v1.3 schema with latency histograms)."""
+    return {
+        "version": "1.3",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "total_queries": 0,
+        "routes": {"fast": 0, "standard": 0, "deep": 0, "orchestrated": 0},
+        "exceptions": {"router_meta": 0, "slash_commands": 0},
+        "tool_intensive_queries": 0,
+        "orchestrated_queries": 0,
+        "estimated_savings": 0.0,
+        "delegation_savings": 0.0,
+        "latency": {"routes": {}, "methods": {}},
+        "sessions": [],
+        "last_updated": None
+    }
 
-        if STATS_FILE.exists():
-            try:
-                with open(STATS_FILE, "r") as f:
-                    lock_file(f, exclusive=False)
-                    stats = json.load(f)
-                    unlock_file(f)
-            except (json.JSONDecodeError, IOError):
-                pass
-
-        # Ensure v1.2 schema fields exist (migration from v1.0/v1.1)
-        stats.setdefault("version", "1.2")
-        stats.setdefault("routes", {}).setdefault("orchestrated", 0)
-        stats.setdefault("exceptions", {"router_meta": 0, "slash_commands": 0})
-        stats.setdefault("tool_intensive_queries", 0)
-        stats.setdefault("orchestrated_queries", 0)
-        stats.setdefault("delegation_savings", 0.0)
-
-        # Update stats
-        stats["total_queries"] += 1
-        metadata = metadata or {}
-
-        # Track exceptions (queries that bypass routing due to CLAUDE.md rules)
-        exception_type = metadata.get("exception_type")
-        if exception_type:
-            stats["exceptions"][exception_type] = stats["exceptions"].get(exception_type, 0) + 1
-
-        # Track orchestrated vs regular routes
-        if metadata.get("orchestration") and route == "deep":
-            stats["routes"]["orchestrated"] += 1
-            stats["orchestrated_queries"] += 1
-        else:
-            stats["routes"][route] += 1
 
-        # Track tool-intensive queries
-        if metadata.get("tool_intensive"):
-            stats["tool_intensive_queries"] += 1
+def log_routing_decision(route: str, confidence: float, method: str, signals: list, metadata: dict = None,
+                         latency_ms: float = None, usage: dict = None, project: str = None):
+    """Log routing decision to stats file with optional metadata, latency and usage tracking.
 
-        # Calculate savings (compared to always using Opus)
-        actual_cost = calculate_cost(route)
-        opus_cost = calculate_cost("deep")
-        savings = opus_cost - actual_cost
-        stats["estimated_savings"] += savings
+    usage is real token usage read from the session transcript, attributed to
+    the previous decision (see router_usage.ingest_transcript). project is the
+    session's working directory, used for per-project breakdowns.
 
-        # Calculate delegation savings for orchestrated queries
-        # Assumes 60% delegation (70% Haiku, 30% Sonnet) saves ~40% vs pure Opus
-        if metadata.get("orchestration"):
-            delegation_saving = opus_cost * 0.4  # ~40% savings through delegation
-            stats["delegation_savings"] += delegation_saving
+    The stats file is updated under its lock with an atomic replace
+    (router_state). If the lock stays busy past the bounded wait, the
+    decision is journaled instead and merged by the next process to write.
+    """
+    decision = {"route": route, "confidence": confidence, "method": method, "signals": signals,
+                "metadata": metadata or {}, "latency_ms": latency_ms, "usage": usage, "project": project}
+    try:
+        drained = []
+
+        def update(stats):
+            records, done = drain_records(STATS_PENDING_FILE)
+            drained.append(done)
+            for pending in records:
+                try:
+                    if "hook_latency" in pending:
+                        apply_hook_latency(stats, **pending["hook_latency"])
+                    else:
+                        apply_routing_decision(stats, **pending)
+                except Exception:
+                    pass  # A malformed journal entry must not block the others
+            stats = apply_routing_decision(stats, **decision)
+            # Still under the stats lock, so exported counters never go backwards
+            maybe_export(stats)
+            return stats
+
+        if not update_json(STATS_FILE, update, new_stats, indent=2):
+            decision["metadata"] = dict(decision["metadata"], stats_journaled=True)
+            append_record(STATS_PENDING_FILE, decision)
+        for done in drained:
+            done()  # The merged stats are written: the drained journal can go
+    except Exception:
+        # Don't fail the hook if stats logging fails
+        pass
 
-        # Get or create today's session
-        today = datetime.now().strftime("%Y-%m-%d")
-        session = None
-        for s in stats.get("sessions", []):
-            if s["date"] == today:
-                session = s
-                break
 
-        if not session:
-            session = {
+def record_hook_latency(route_label: str, method: str, latency_ms: float):
+    """Journal this run's end-to-end hook latency for the next stats writer to merge.
+
+    The latency is measured after the run's own stats, calibration, session
+    and decision log writes, where lock waits and fsyncs happen, so it
+    cannot be part of the run's stats update; it reaches the histograms
+    with the next prompt.
+    """
+    try:
+        append_record(STATS_PENDING_FILE, {"hook_latency": {
+            "route": route_label, "method": method, "latency_ms": round(latency_ms, 3),
+            "ts": datetime.now().isoformat(timespec="seconds")}})
+    except Exception:
+        pass  # A lost latency sample must never break the hook
+
+
+def apply_hook_latency(stats: dict, route: str, method: str, latency_ms: float, ts: str) -> dict:
+    """Count one journaled hook latency into stats (in place): all-time, its day and its rollup bucket."""
+    when = datetime.fromisoformat(ts)
+    record_latency(stats, route, method, latency_ms)
+    day = when.strftime("%Y-%m-%d")
+    session = next((s for s in stats.get("sessions", ()) if s["date"] == day), None)
+    if session is not None:
+        record_latency(session, route, method, latency_ms)
+    if "rollups" in stats:
+        record_latency_at(stats["rollups"], latency_ms, when)
+    return stats
+
+
+def apply_routing_decision(stats: dict, route: str, confidence: float, method: str, signals: list,
+                           metadata: dict = None, latency_ms: float = None, usage: dict = None,
+                           project: str = None) -> dict:
+    """Count one routing decision into stats (in place); see log_routing_decision."""
+    # Ensure v1.3 schema fields exist (migration from v1.0-v1.2)
+    stats["version"] = "1.3"
+    stats.setdefault("routes", {}).setdefault("orchestrated", 0)
+    stats.setdefault("exceptions", {"router_meta": 0, "slash_commands": 0})
+    stats.setdefault("tool_intensive_queries", 0)
+    stats.setdefault("orchestrated_queries", 0)
+    stats.setdefault("delegation_savings", 0.0)
+    stats.setdefault("latency", {"routes": {}, "methods": {}})
+
+    # Update stats
+    stats["total_queries"] += 1
+    metadata = metadata or {}
+
+    # Track exceptions (queries that bypass routing due to CLAUDE.md rules)
+    exception_type = metadata.get("exception_type")
+    if exception_type:
+        stats["exceptions"][exception_type] = stats["exceptions"].get(exception_type, 0) + 1
+
+    # Track orchestrated vs regular routes
+    if metadata.get("orchestration") and route == "deep":
+        stats["routes"]["orchestrated"] += 1
+        stats["orchestrated_queries"] += 1
+    else:
+        stats["routes"][route] += 1
+
+    # Track tool-intensive queries
+    if metadata.get("tool_intensive"):
+        stats["tool_intensive_queries"] += 1
+
+    # Prometheus-style counters (router_metrics): decisions by route and
+    # method, cache hits by tier, errors that degraded a decision by kind
+    route_label = get_route_label(route, metadata)
+    decisions = stats.setdefault("decisions", {})
+    decisions[f"{route_label}|{method}"] = decisions.get(f"{route_label}|{method}", 0) + 1
+    if metadata.get("memory_cache_hit") or metadata.get("cache_hit"):
+        tier = "memory" if metadata.get("memory_cache_hit") else "pack" if metadata.get("pack_hit") else "file"
+        hits = stats.setdefault("cache_hits", {})
+        hits[tier] = hits.get(tier, 0) + 1
+    for flag, kind in (("llm_failed", "llm"), ("stats_journaled", "stats_lock"), ("usage_error", "usage")):
+        if metadata.get(flag):
+            errors = stats.setdefault("errors", {})
+            errors[kind] = errors.get(kind, 0) + 1
+
+    # Track LLM fallback calls, failures, and skips (proven agreement / open breaker)
+    skipped = metadata.get("llm_skipped")
+    if method == "haiku-llm" or skipped or metadata.get("llm_failed"):
+        fallback = stats.setdefault("llm_fallback", {"calls": 0, "skipped": 0})
+        if skipped == "circuit open":
+            key = "circuit_skipped"
+        elif skipped:
+            key = "skipped"
+        else:
+            key = "calls"
+        fallback[key] = fallback.get(key, 0) + 1
+        if metadata.get("llm_failed"):
+            fallback["failures"] = fallback.get("failures", 0) + 1
+        if metadata.get("llm_early_stop"):
+            fallback["early_stops"] = fallback.get("early_stops", 0) + 1
+        # Classifier tokens, including prompt cache reads/writes of the instructions
+        llm_usage = metadata.get("llm_usage")
+        if llm_usage:
+            tokens = fallback.setdefault("tokens", {})
+            for field, count in llm_usage.items():
+                tokens[field] = tokens.get(field, 0) + count
+
+    # Calculate savings (compared to always using Opus)
+    actual_cost = calculate_cost(route)
+    opus_cost = calculate_cost("deep")
+    savings = opus_cost - actual_cost
+    stats["estimated_savings"] += savings
+
+    # Calculate delegation savings for orchestrated queries
+    # Assumes 60% delegation (70% Haiku, 30% Sonnet) saves ~40% vs pure Opus
+    if metadata.get("orchestration"):
+        delegation_saving = opus_cost * 0.4  # ~40% savings through delegation
+        stats["delegation_savings"] += delegation_saving
+
+    # Tiered rollups keep long-range history (seeded once from pre-rollup sessions)
+    if "rollups" not in stats:
+        stats["rollups"] = seed_from_sessions(stats.get("sessions", []))
+
+    # Get or create today's session. Sessions are kept newest-first, so
+    # today is at index 0 and only the first write of a day re-sorts.
+    today = datetime.now().strftime("%Y-%m-%d")
+    sessions = stats.setdefault("sessions", [])
+    if not sessions or sessions[0]["date"] != today:
+        if not any(s["date"] == today for s in sessions):
+            sessions.append({
                 "date": today,
                 "queries": 0,
                 "routes": {"fast": 0, "standard": 0, "deep": 0},
                 "savings": 0.0
-            }
-            stats.setdefault("sessions", []).append(session)
-
-        session["queries"] += 1
-        session["routes"][route] += 1
-        session["savings"] += savings
-
-        # Keep only last 30 days of sessions
-        stats["sessions"] = sorted(stats["sessions"], key=lambda x: x["date"], reverse=True)[:30]
-
-        stats["last_updated"] = datetime.now().isoformat()
-
-        # Write stats atomically
-        with open(STATS_FILE, "w") as f:
-            lock_file(f, exclusive=True)
-            json.dump(stats, f, indent=2)
-            unlock_file(f)
-
-    except Exception:
-        # Don't fail the hook if stats logging fails
-        pass
-
-
-def classify_by_rules(prompt: str) -> dict:
+            })
+        # Keep only last 30 days of sessions (older days live on in rollups)
+        sessions.sort(key=lambda x: x["date"], reverse=True)
+        del sessions[30:]
+    session = sessions[0]
+
+    # Days, projects and rollups count the route label (orchestrated apart
+    # from deep), as the global route totals do
+    session["queries"] += 1
+    session["routes"][route_label] = session["routes"].get(route_label, 0) + 1
+    session["savings"] += savings
+
+    # Per-project aggregates (all-time and per day) for /router-stats breakdowns
+    if project:
+        for container in (stats, session):
+            entry = container.setdefault("projects", {}).setdefault(
+                project, {"queries": 0, "routes": {}, "savings": 0.0})
+            entry["queries"] += 1
+            entry["routes"][route_label] = entry["routes"].get(route_label, 0) + 1
+            entry["savings"] = round(entry["savings"] + savings, 6)
+
+    # Track end-to-end hook latency (all-time and per day, mergeable histograms)
+    if latency_ms is not None:
+        record_latency(stats, route_label, method, latency_ms)
+        record_latency(session, route_label, method, latency_ms)
+
+    # Measured cost and savings from real transcript usage
+    apply_usage(stats, session, usage, COST_PER_1M)
+
+    # Long-range history: one hourly bucket per write, compacted into
+    # daily/weekly/monthly tiers as it ages
+    record_decision(stats["rollups"], route_label, savings, latency_ms)
+
+    stats["last_updated"] = datetime.now().isoformat()
+    return stats
+
+
+def classify_by_rules(prompt) -> Classification:
     """
-    Classify prompt using pre-compiled regex patterns.
-    Returns route, confidence, signals, and optional metadata.
+    Classify prompt (str or PromptFeatures) using pre-compiled regex patterns.
+    Returns route, confidence, signals, and optional metadata; result.rules
+    holds the matched patterns' RULE_IDS, parallel to the signals.
 
     Priority order:
     1. deep patterns (architecture, security, complex analysis)
@@ -732,35 +978,39 @@ def classify_by_rules(prompt: str) -> dict:
 
     Optimized with early exit when sufficient signals are found.
     """
-    prompt_lower = prompt.lower()
-    deep_signals = []
-    tool_signals = []
-    orch_signals = []
+    features = features_of(prompt)
+    prompt_lower = features.lower
+    deep_signals, deep_rules = [], []
+    tool_signals, tool_rules = [], []
+    orch_signals, orch_rules = [], []
 
     # Check for deep patterns first (highest priority)
     # Pre-compiled patterns use .search() method directly
-    for pattern in PATTERNS["deep"]:
+    for pattern, rule in zip(PATTERNS["deep"], RULE_IDS["deep"]):
         match = pattern.search(prompt_lower)
         if match:
             deep_signals.append(match.group(0))
+            deep_rules.append(rule)
             # Early exit: if we have 3+ deep signals, no need to check more
             if len(deep_signals) >= 3:
                 break
 
     # Check for tool-intensive patterns
-    for pattern in PATTERNS.get("tool_intensive", []):
+    for pattern, rule in zip(PATTERNS.get("tool_intensive", []), RULE_IDS.get("tool_intensive", [])):
         match = pattern.search(prompt_lower)
         if match:
             tool_signals.append(match.group(0))
+            tool_rules.append(rule)
             # Early exit: if we have deep + tool signals, we have enough
             if deep_signals and len(tool_signals) >= 2:
                 break
 
     # Check for orchestration patterns
-    for pattern in PATTERNS.get("orchestration", []):
+    for pattern, rule in zip(PATTERNS.get("orchestration", []), RULE_IDS.get("orchestration", [])):
         match = pattern.search(prompt_lower)
         if match:
             orch_signals.append(match.group(0))
+            orch_rules.append(rule)
             # Early exit: if we have deep + orchestration, we have enough
             if deep_signals:
                 break
@@ -769,145 +1019,273 @@ def classify_by_rules(prompt: str) -> dict:
     if deep_signals and (tool_signals or orch_signals):
         # Complex task needing orchestration - route to deep with orchestration flag
         combined = deep_signals + tool_signals + orch_signals
-        return {
-            "route": "deep",
-            "confidence": 0.95,
-            "signals": combined[:4],
-            "method": "rules",
-            "metadata": {"orchestration": True, "tool_intensive": bool(tool_signals)}
-        }
+        return Classification("deep", 0.95, combined[:4], "rules",
+                              {"orchestration": True, "tool_intensive": bool(tool_signals)},
+                              (deep_rules + tool_rules + orch_rules)[:4])
 
     if len(deep_signals) >= 2:
-        return {"route": "deep", "confidence": 0.9, "signals": deep_signals[:3], "method": "rules"}
+        return Classification("deep", 0.9, deep_signals[:3], rules=deep_rules[:3])
 
     if deep_signals:  # One deep signal
-        return {"route": "deep", "confidence": 0.7, "signals": deep_signals, "method": "rules"}
+        return Classification("deep", 0.7, deep_signals, rules=deep_rules)
 
     # Tool-intensive but not architecturally complex - route to standard
     if tool_signals:
         if len(tool_signals) >= 2:
-            return {
-                "route": "standard",
-                "confidence": 0.85,
-                "signals": tool_signals[:3],
-                "method": "rules",
-                "metadata": {"tool_intensive": True}
-            }
-        return {
-            "route": "standard",
-            "confidence": 0.7,
-            "signals": tool_signals,
-            "method": "rules",
-            "metadata": {"tool_intensive": True}
-        }
+            return Classification("standard", 0.85, tool_signals[:3], "rules", {"tool_intensive": True},
+                                  tool_rules[:3])
+        return Classification("standard", 0.7, tool_signals, "rules", {"tool_intensive": True}, tool_rules)
 
     # Orchestration alone (multi-step workflow) - route to standard
     if orch_signals:
-        return {
-            "route": "standard",
-            "confidence": 0.75,
-            "signals": orch_signals[:3],
-            "method": "rules",
-            "metadata": {"orchestration": True}
-        }
+        return Classification("standard", 0.75, orch_signals[:3], "rules", {"orchestration": True},
+                              orch_rules[:3])
 
     # Check for fast patterns
-    fast_signals = []
-    for pattern in PATTERNS["fast"]:
+    fast_signals, fast_rules = [], []
+    for pattern, rule in zip(PATTERNS["fast"], RULE_IDS["fast"]):
         match = pattern.search(prompt_lower)
         if match:
             fast_signals.append(match.group(0))
+            fast_rules.append(rule)
             if len(fast_signals) >= 2:
-                return {"route": "fast", "confidence": 0.9, "signals": fast_signals[:3], "method": "rules"}
+                return Classification("fast", 0.9, fast_signals[:3], rules=fast_rules[:3])
 
     if fast_signals:  # One fast signal
-        return {"route": "fast", "confidence": 0.7, "signals": fast_signals, "method": "rules"}
+        return Classification("fast", 0.7, fast_signals, rules=fast_rules)
 
     # Default to fast with low confidence - cheaper when uncertain
-    return {"route": "fast", "confidence": 0.5, "signals": ["no strong patterns"], "method": "rules"}
+    return Classification("fast", 0.5, ["no strong patterns"], rules=[NO_RULE[features.length_class]])
+
+
+def llm_breaker(api_key: str):
+    """Shared circuit breaker check; returns the breaker state if a call may go ahead, else None."""
+    try:
+        allowed, breaker = before_call(api_key)
+    except Exception:
+        return new_breaker()  # Breaker bookkeeping must never block classification
+    return breaker if allowed else None
+
+
+def record_llm_outcome(breaker: dict, error: BaseException = None, api_key: str = None):
+    try:
+        if error is None:
+            record_success(breaker)
+        else:
+            record_failure(breaker, error, api_key)
+    except Exception:
+        pass
 
 
-def classify_by_llm(prompt: str, api_key: str) -> dict:
+def classify_by_llm(prompt: str, api_key: str, breaker: dict = None, signals: list = None) -> Classification:
     """
     Classify prompt using Haiku LLM.
     Used as fallback for low-confidence rule-based results.
+
+    The request is compact (see router_llm.build_request): long prompts are
+    cut to their head and tail, and the rule signals that fired are passed
+    along. The answer is streamed and the stream closed as soon as route
+    and confidence are known (router_llm.stream_classification), unless
+    streaming is turned off. Goes through the shared circuit breaker
+    (router_breaker): while it is open this returns None at once instead of
+    waiting for a call to fail. breaker is the state from an earlier
+    llm_breaker() check, if any.
     """
+    if breaker is None:
+        breaker = llm_breaker(api_key)
+        if breaker is None:
+            return None
+
+    from router_llm import (AnswerError, build_request, parse_response, stream_classification, streaming_enabled,
+                            usage_tokens)
+
+    request = build_request(prompt, signals)
+    if streaming_enabled():
+        try:
+            result, usage = stream_classification(api_key, request)
+        except AnswerError as e:
+            # The API answered, but not with a usable classification
+            record_llm_outcome(breaker)
+            print(f"LLM classification error: {e}", file=sys.stderr)
+            return None
+        except Exception as e:
+            record_llm_outcome(breaker, e, api_key)
+            print(f"LLM classification error: {e}", file=sys.stderr)
+            return None
+        record_llm_outcome(breaker)
+        return Classification.from_dict(result, "haiku-llm",
+                                        {"llm_usage": usage, "llm_early_stop": result.get("early_stop", False)})
+
     try:
         from anthropic import Anthropic
-    except ImportError:
+    except ImportError as e:
+        record_llm_outcome(breaker, e, api_key)
         return None
 
     client = Anthropic(api_key=api_key)
 
-    classification_prompt = f"""Classify this coding query into exactly one route. Return ONLY valid JSON, no other text.
+    try:
+        message = client.messages.create(**request)
+    except Exception as e:
+        record_llm_outcome(breaker, e, api_key)
+        print(f"LLM classification error: {e}", file=sys.stderr)
+        return None
+    record_llm_outcome(breaker)
+
+    try:
+        return Classification.from_dict(parse_response(message.content[0].text), "haiku-llm",
+                                        {"llm_usage": usage_tokens(getattr(message, "usage", None))})
 
-Query: "{prompt}"
+    except Exception as e:
+        # Log error but don't fail
+        print(f"LLM classification error: {e}", file=sys.stderr)
+        return None
 
-Routes:
-- "fast": Simple factual questions, syntax lookups, formatting, git status, JSON/YAML manipulation
-- "standard": Bug fixes, feature implementation, code review, refactoring, test writing, OR tool-intensive tasks (codebase search, running tests, multi-file edits)
-- "deep": Architecture decisions, system design, security audits, multi-file refactors, trade-off analysis, complex debugging, OR orchestration tasks (multi-step workflows)
 
-Tool-intensity indicators (favor "standard" or "deep" over "fast"):
-- Searching/scanning entire codebase
-- Modifying multiple files
-- Running tests or builds
-- Dependency analysis
-- Large-scale refactoring
+def get_calibration() -> dict:
+    """Retry calibration counters (loaded once per process)."""
+    global _CALIBRATION
+    if _CALIBRATION is None:
+        _CALIBRATION = load_calibration()
+    return _CALIBRATION
 
-Return JSON only:
-{{"route": "fast|standard|deep", "confidence": 0.0-1.0, "signals": ["signal1", "signal2"], "tool_intensive": true|false}}"""
 
+def apply_retry_calibration(prompt, result: Classification) -> Classification:
+    """Adjust a result from /retry history (see router_calibration.calibrate)."""
     try:
-        message = client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=100,
-            messages=[{"role": "user", "content": classification_prompt}]
-        )
+        return calibrate(get_calibration(), result, generate_fingerprint(prompt))
+    except Exception:
+        return result  # Calibration should never break routing
 
-        response_text = message.content[0].text.strip()
 
-        # Handle potential markdown code blocks
-        if "```" in response_text:
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:].strip()
+def check_llm_fallback(result: Classification, api_key: str):
+    """Whether a low-confidence result should go to the LLM.
 
-        result = json.loads(response_text)
-        result["method"] = "haiku-llm"
-        return result
+    Skips signals with proven rules agreement (see llm_fallback_needed) and
+    anything while the circuit breaker is open. Returns the breaker state
+    to pass to classify_by_llm, or None (marked in metadata["llm_skipped"]).
+    """
+    try:
+        needed, reason = llm_fallback_needed(get_calibration(), result)
+    except Exception:
+        needed = True
+    breaker = llm_breaker(api_key) if needed else None
+    if needed and breaker is None:
+        reason = "circuit open"
+    if breaker is None:
+        result.metadata["llm_skipped"] = reason
+    return breaker
+
+
+def save_calibration_changes(*changes) -> bool:
+    """Apply queued calibration changes plus changes to the file (under its lock)."""
+    global _CALIBRATION
+    _CALIBRATION_CHANGES.extend(changes)
+    updated = update_calibration(_CALIBRATION_CHANGES)
+    if updated is None:
+        return False
+    _CALIBRATION = updated
+    _CALIBRATION_CHANGES.clear()
+    return True
+
+
+def record_llm_agreement(result: Classification, llm_result: Classification):
+    """Record whether the LLM agreed with the rules result, per rule.
+
+    Only results that went through the agreement check count: calibrated
+    results always call the LLM (see llm_fallback_needed), so their rules'
+    agreement would never be consulted. Saved with the decision counters
+    at the end of the run.
+    """
+    try:
+        if "calibration" in result.metadata:
+            return
+        rules, rules_route, llm_route = result.rules, result.route, llm_result.route
+        count_agreement(get_calibration(), rules, rules_route, llm_route)
+        _CALIBRATION_CHANGES.append(lambda c: count_agreement(c, rules, rules_route, llm_route))
+    except Exception:
+        pass
+
+
+def record_decision_feedback(prompt, route: str, rules: list, method: str) -> dict:
+    """Count a routing decision for retry calibration; returns it for the session shard.
+
+    rules are the decision's rule identities (Classification.rules).
+    """
+    decision = {"fingerprint": generate_fingerprint(prompt), "rules": rules,
+                "method": method, "route": route}
+    try:
+        save_calibration_changes(lambda c: count_decision(c, decision["fingerprint"], rules))
+    except Exception:
+        pass
+    return decision
 
-    except Exception as e:
-        # Log error but don't fail
-        print(f"LLM classification error: {e}", file=sys.stderr)
-        return None
 
+def record_retry_feedback(prompt: str, session_id: str = None):
+    """Charge a /retry (explicit or next-tier) to the session's last decision.
 
-def classify_hybrid(prompt: str) -> dict:
+    Each decision is charged at most once, however many times it is retried.
+    """
+    try:
+        state = load_session_state(session_id)
+        decision = state.get("last_decision")
+        if not decision or decision.get("retried"):
+            return
+        retry_args = prompt.strip()[6:].strip().lower()
+        target = {"opus": "deep", "deep": "deep", "sonnet": "standard", "standard": "standard"}.get(
+            retry_args, ESCALATION.get(decision.get("route"), "deep"))
+        save_calibration_changes(lambda c: count_retry(c, decision, target))
+
+        state = dict(state)
+        state["last_decision"] = dict(decision, retried=target)
+        atomic_write_json(get_session_file(session_id), state)
+        _SESSION_CACHE[session_id] = state
+    except Exception:
+        pass  # Feedback should never break the retry itself
+
+
+def classify_hybrid(prompt, session_id: str = None) -> Classification:
     """
     Hybrid classification: cache first, then rules, then LLM fallback,
-    then learned adjustments, then context boost.
+    then learned adjustments, then context boost. Results are calibrated
+    against /retry history before the LLM fallback decision.
+
+    prompt may be a str or PromptFeatures; it is normalized once and the
+    features are shared by every stage.
     """
+    prompt = features_of(prompt)
+
     # Step 0: Check cache for similar query (instant)
     cached = check_classification_cache(prompt)
     if cached:
-        return cached
+        return apply_retry_calibration(prompt, cached)
 
     # Step 1: Rule-based classification (instant, free)
     result = classify_by_rules(prompt)
 
     # Step 2: Check for multi-turn context (follow-up queries)
-    session_state = get_session_state()
+    session_state = get_session_state(session_id)
     follow_up = is_follow_up_query(prompt)
     if follow_up:
         result = apply_context_boost(result, session_state, follow_up)
 
-    # Step 3: If low confidence and API key available, use LLM
-    if result["confidence"] < CONFIDENCE_THRESHOLD:
+    # Step 2b: Learn from retries (may lower confidence into LLM range, or escalate)
+    result = apply_retry_calibration(prompt, result)
+
+    # Step 3: If low confidence and API key available, use LLM - unless the
+    # LLM has reliably agreed with the rules for these signals
+    if result.confidence < CONFIDENCE_THRESHOLD:
         api_key = get_api_key()
-        if api_key:
-            llm_result = classify_by_llm(prompt, api_key)
+        breaker = check_llm_fallback(result, api_key) if api_key else None
+        if breaker is not None:
+            llm_result = classify_by_llm(prompt.text, api_key, breaker, result.signals)
+            if not llm_result:
+                result.metadata["llm_failed"] = True
             if llm_result:
+                record_llm_agreement(result, llm_result)
+                # Retries of the LLM's answer are charged to the rules that fired
+                llm_result.rules = result.rules
+                llm_result = apply_retry_calibration(prompt, llm_result)
                 # Apply learned adjustments (opt-in, conservative)
                 llm_result = apply_learned_adjustments(prompt, llm_result)
                 # Cache LLM result (more expensive to compute)
@@ -923,20 +1301,50 @@ def classify_hybrid(prompt: str) -> dict:
     return result
 
 
+def classify_subtasks(texts: list) -> list:
+    """Classify orchestration subtasks in one batch through the cache and rules tiers.
+
+    No LLM fallback, context boost or cache writes: subtasks are planning
+    hints for the orchestrator, not routing decisions.
+    """
+    features = [features_of(text) for text in texts]
+    cached = check_classification_cache_batch(features)
+    return [hit or classify_by_rules(f) for hit, f in zip(cached, features)]
+
+
+def plan_orchestration(prompt: str) -> dict:
+    """Subtask fan-out plan for an orchestrated prompt (None if it does not split)."""
+    try:
+        from router_plan import build_plan
+        return build_plan(prompt, classify_subtasks)
+    except Exception:
+        return None  # Planning should never break routing
+
+
 def main():
     """Main hook handler."""
+    started = time.perf_counter()
     try:
         input_data = json.load(sys.stdin)
     except json.JSONDecodeError:
         sys.exit(0)
 
     prompt = input_data.get("prompt", "")
+    session_id = input_data.get("session_id")
+
+    # Every /retry is feedback on the previous decision (bare "/retry" is
+    # short enough to be skipped below, so record it first)
+    if prompt.strip().lower().startswith("/retry"):
+        record_retry_feedback(prompt, session_id)
 
     if not prompt or len(prompt) < 10:
         sys.exit(0)
 
+    # One normalization pass, shared by every classification stage
+    features = features_of(prompt)
+
     # Handle slash commands
-    stripped = prompt.strip().lower()
+    stripped = features.stripped
     if stripped.startswith("/"):
         # Special handling for /route with explicit model
         if stripped.startswith("/route "):
@@ -997,7 +1405,7 @@ Route: {route} | Model: {model} | Source: User specified "/retry {retry_args}"
 
 USER EXPLICITLY REQUESTED {model.upper()} FOR RETRY. This is NOT a suggestion - it is a COMMAND.
 
-CRITICAL: Read the last query from session state (~/.claude/router-session.json) and spawn "claude-router:{subagent}".
+CRITICAL: Read the last query from session state ({get_session_file(session_id)}) and spawn "claude-router:{subagent}".
 DO NOT auto-escalate. DO NOT choose a different model. Use {model.upper()}.
 
 Example:
@@ -1016,28 +1424,58 @@ Task(subagent_type="claude-router:{subagent}", prompt="<last query from session>
         sys.exit(0)
 
     # Check for exception queries (router meta-questions)
-    is_exception, exception_type = is_exception_query(prompt)
+    is_exception, exception_type = is_exception_query(features)
 
     # Classify using hybrid approach
-    result = classify_hybrid(prompt)
+    result = classify_hybrid(features, session_id)
 
-    route = result["route"]
-    confidence = result["confidence"]
-    signals = result["signals"]
-    method = result.get("method", "rules")
+    route = result.route
+    confidence = result.confidence
+    signals = result.signals
+    method = result.method
 
     # Get metadata for orchestration/tool-intensive routing
-    metadata = result.get("metadata", {})
+    metadata = result.metadata
 
     # Track exception if detected
     if is_exception:
         metadata["exception_type"] = exception_type
 
+    # Orchestrated prompts get a parallel subtask plan for the orchestrator
+    plan = None
+    if route == "deep" and metadata.get("orchestration"):
+        plan = plan_orchestration(prompt)
+        if plan:
+            metadata["plan"] = {"subtasks": len(plan["subtasks"]), "waves": plan["waves"],
+                                "parallel": plan["parallel"]}
+
+    # Attribute real token usage since the previous prompt to the decision that caused it
+    try:
+        usage, usage_cursor = ingest_transcript(
+            input_data.get("transcript_path"),
+            load_session_state(session_id).get("usage_cursor"),
+            get_route_label(route, metadata),
+            method,
+        )
+    except Exception:
+        usage, usage_cursor = None, None  # Usage accounting should never break routing
+        metadata["usage_error"] = True
+
     # Log routing decision to stats
-    log_routing_decision(route, confidence, method, signals, metadata)
+    log_routing_decision(route, confidence, method, signals, metadata, usage=usage, project=input_data.get("cwd"))
+
+    # Update session state for multi-turn context awareness (and retry feedback)
+    decision = record_decision_feedback(features, route, result.rules, method)
+    update_session_state(route, metadata, session_id, usage_cursor, decision)
 
-    # Update session state for multi-turn context awareness
-    update_session_state(route, metadata)
+    # Hook latency includes the state writes above (lock waits, fsyncs)
+    latency_ms = (time.perf_counter() - started) * 1000
+    route_label = get_route_label(route, metadata)
+    # ...to the append-only decision log (router_decisions, columnar export)
+    append_decision(route_label, method, confidence, result.rules, metadata, latency_ms,
+                    session_id, input_data.get("cwd"), features.fingerprint)
+    # ...and to the stats histograms, through the journal the next stats writer drains
+    record_hook_latency(route_label, method, latency_ms)
 
     # Map route to subagent and model
     # Use opus-orchestrator for complex tasks with orchestration flag
@@ -1064,16 +1502,27 @@ Task(subagent_type="claude-router:{subagent}", prompt="<last query from session>
         metadata_str += f" | Context: {metadata['context_boost']}"
     if metadata.get("exception_type"):
         metadata_str += f" | Exception: {metadata['exception_type']}"
+    if metadata.get("calibration"):
+        metadata_str += f" | Calibrated: {metadata['calibration']}"
+    if plan:
+        metadata_str += f" | Plan: {len(plan['subtasks'])} subtasks, {plan['waves']} waves"
+
+    # Pass the plan on to the orchestrator with the query
+    plan_str = ""
+    if plan:
+        from router_plan import format_plan
+        plan_str = f"\n\n{format_plan(plan)}"
+    task_prompt = "<user's query, followed by the subtask plan above>" if plan else "<user's query>"
 
     context = f"""[Claude Router] MANDATORY ROUTING DIRECTIVE
 Route: {route} | Model: {model} | Confidence: {confidence:.0%} | Method: {method}{metadata_str}
-Signals: {signals_str}
+Signals: {signals_str}{plan_str}
 
 CRITICAL: You MUST use the Task tool NOW to spawn the "claude-router:{subagent}" subagent.
 Do NOT respond to the user directly. Do NOT skip this step. Delegate immediately.
 
 Example:
-Task(subagent_type="claude-router:{subagent}", prompt="<user's query>", description="Route to {model}")"""
+Task(subagent_type="claude-router:{subagent}", prompt="{task_prompt}", description="Route to {model}")"""
 
     # Output as JSON with hookSpecificOutput for proper injection
     output = {
@@ -1087,4 +1536,4 @@ Task(subagent_type="claude-router:{subagent}", prompt="<user's query>", descript
 
 
 if __name__ == "__main__":
-    main()
+    run_profiled(main)
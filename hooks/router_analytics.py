@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Analytics Dashboard Generator
+Renders the /router-analytics HTML dashboard directly from router stats.
+
+Past days never change once they are over, so their chart points and table
+rows are kept in a render cache next to the stats file. Each run only
+re-renders days at or after the last day seen by the previous run, which
+also keeps history that has aged out of the stats' session window. The
+cache belongs to one stats file (its path and "created" marker), so
+rendering another file or a reset stats file starts it over.
+
+Usage:
+    python3 router_analytics.py [--output router-analytics.html] [--stats path]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import argparse
+import html
+import json
+import sys
+import time
+from pathlib import Path
+from string import Template
+
+from router_histogram import merge, summarize
+from router_state import atomic_write, atomic_write_json
+
+STATS_FILE = Path.home() / ".claude" / "router-stats.json"
+RENDER_CACHE_FILE = Path.home() / ".claude" / "router-analytics-cache.json"
+RENDER_CACHE_VERSION = 2
+
+# Rows shown in the recent sessions table (charts use the full history)
+TABLE_MAX_ROWS = 60
+
+ROUTES = ("fast", "standard", "deep", "orchestrated")
+ROUTE_LABELS = {"fast": "Fast (Haiku)", "standard": "Standard (Sonnet)",
+                "deep": "Deep (Opus)", "orchestrated": "Orchestrated"}
+
+DASHBOARD_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Claude Router Analytics</title>
+<script src="https://cdn.jsdelivr.net/npm/chart.js@4"></script>
+<style>
+  body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif; margin: 2rem; background: #f6f7f9; color: #1f2328; }
+  h1 { margin-bottom: 0.25rem; }
+  .muted { color: #6e7781; font-size: 0.9rem; }
+  .cards { display: grid; grid-template-columns: repeat(auto-fit, minmax(180px, 1fr)); gap: 1rem; margin: 1.5rem 0; }
+  .card { background: #fff; border-radius: 8px; padding: 1rem; box-shadow: 0 1px 3px rgba(0,0,0,.08); }
+  .card .value { font-size: 1.6rem; font-weight: 600; }
+  .charts { display: grid; grid-template-columns: repeat(auto-fit, minmax(420px, 1fr)); gap: 1rem; }
+  .panel { background: #fff; border-radius: 8px; padding: 1rem; box-shadow: 0 1px 3px rgba(0,0,0,.08); margin-bottom: 1rem; }
+  table { width: 100%; border-collapse: collapse; }
+  th, td { text-align: right; padding: 0.35rem 0.6rem; border-bottom: 1px solid #eaecef; }
+  th:first-child, td:first-child { text-align: left; }
+</style>
+</head>
+<body>
+<h1>Claude Router Analytics</h1>
+<div class="muted">Generated $generated &middot; stats last updated $last_updated</div>
+
+<div class="cards">
+  <div class="card"><div class="muted">Total queries</div><div class="value">$total_queries</div></div>
+  <div class="card"><div class="muted">Estimated savings (vs Opus)</div><div class="value">$$$estimated_savings</div></div>
+  <div class="card"><div class="muted">Measured savings</div><div class="value">$measured_savings</div></div>
+  <div class="card"><div class="muted">Delegation savings</div><div class="value">$$$delegation_savings</div></div>
+  <div class="card"><div class="muted">Tool-intensive queries</div><div class="value">$tool_intensive</div></div>
+  <div class="card"><div class="muted">Hook latency p50 / p99</div><div class="value">$latency_p50 / $latency_p99</div></div>
+</div>
+
+<div class="charts">
+  <div class="panel"><h3>Route distribution</h3><canvas id="routeChart"></canvas></div>
+  <div class="panel"><h3>Daily queries</h3><canvas id="trendChart"></canvas></div>
+  <div class="panel"><h3>Savings per day</h3><canvas id="savingsChart"></canvas></div>
+  <div class="panel"><h3>Exceptions</h3>
+    <table><tr><th>Type</th><th>Count</th></tr>$exception_rows</table>
+  </div>
+</div>
+
+<div class="panel">
+  <h3>Recent sessions</h3>
+  <table>
+    <tr><th>Date</th><th>Queries</th><th>Fast</th><th>Standard</th><th>Deep</th><th>Savings</th><th>p50</th><th>p99</th></tr>
+    $session_rows
+  </table>
+</div>
+
+<script>
+const routes = $route_data;
+const days = $daily_data;
+new Chart(document.getElementById("routeChart"), {
+  type: "pie",
+  data: { labels: routes.labels, datasets: [{ data: routes.values,
+    backgroundColor: ["#4caf50", "#2196f3", "#9c27b0", "#ff9800"] }] }
+});
+new Chart(document.getElementById("trendChart"), {
+  type: "line",
+  data: { labels: days.dates, datasets: [
+    { label: "Fast", data: days.fast, borderColor: "#4caf50", fill: false },
+    { label: "Standard", data: days.standard, borderColor: "#2196f3", fill: false },
+    { label: "Deep", data: days.deep, borderColor: "#9c27b0", fill: false },
+    { label: "Total", data: days.queries, borderColor: "#616161", borderDash: [4, 4], fill: false }
+  ] }
+});
+new Chart(document.getElementById("savingsChart"), {
+  type: "bar",
+  data: { labels: days.dates, datasets: [{ label: "Savings ($$)", data: days.savings, backgroundColor: "#ff9800" }] }
+});
+</script>
+</body>
+</html>
+""")
+
+
+def load_json(path: Path, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def day_point(session: dict) -> dict:
+    """Chart point and pre-rendered table row for one day."""
+    routes = session.get("routes", {})
+    latency = summarize(merge(*session.get("latency", {}).get("methods", {}).values()))
+    point = {
+        "queries": session.get("queries", 0),
+        "fast": routes.get("fast", 0),
+        "standard": routes.get("standard", 0),
+        "deep": routes.get("deep", 0) + routes.get("orchestrated", 0),
+        "savings": round(session.get("savings", 0.0), 4),
+    }
+    point["row"] = (
+        f"<tr><td>{html.escape(session['date'])}</td><td>{point['queries']}</td>"
+        f"<td>{point['fast']}</td><td>{point['standard']}</td><td>{point['deep']}</td>"
+        f"<td>${point['savings']:.2f}</td>"
+        f"<td>{latency['p50']:.1f}ms</td><td>{latency['p99']:.1f}ms</td></tr>"
+    )
+    return point
+
+
+def update_render_cache(stats: dict, cache: dict, source: str = None) -> tuple[dict, int]:
+    """Bring the per-day render cache up to date with the stats.
+
+    Only days on or after the cache's last day are (re-)rendered; that day
+    may have been partial when it was last seen. A cache built from another
+    stats file (source path or creation marker) is discarded. Returns
+    (cache, days_rendered).
+    """
+    identity = {"source": source, "created": stats.get("created")}
+    if cache.get("version") != RENDER_CACHE_VERSION or any(cache.get(k) != v for k, v in identity.items()):
+        cache = {"version": RENDER_CACHE_VERSION, **identity, "last_date": "", "days": {}}
+    last_date = cache["last_date"]
+    rendered = 0
+    for session in stats.get("sessions", []):
+        date = session.get("date")
+        if not date or date < last_date:
+            continue
+        cache["days"][date] = day_point(session)
+        cache["last_date"] = max(cache["last_date"], date)
+        rendered += 1
+    return cache, rendered
+
+
+def render_dashboard(stats: dict, cache: dict) -> str:
+    """Render the dashboard HTML from the stats totals and the per-day cache."""
+    routes = stats.get("routes", {})
+    dates = sorted(cache["days"])
+    days = cache["days"]
+    daily = {
+        "dates": dates,
+        **{key: [days[d][key] for d in dates] for key in ("queries", "fast", "standard", "deep", "savings")},
+    }
+    route_data = {
+        "labels": [ROUTE_LABELS[r] for r in ROUTES],
+        "values": [routes.get(r, 0) for r in ROUTES],
+    }
+    exceptions = stats.get("exceptions", {})
+    exception_rows = "".join(
+        f"<tr><td>{html.escape(name)}</td><td>{count}</td></tr>"
+        for name, count in sorted(exceptions.items())
+    ) or "<tr><td>None</td><td>0</td></tr>"
+    latency = summarize(merge(*stats.get("latency", {}).get("methods", {}).values()))
+    measured = stats.get("measured_savings")
+
+    return DASHBOARD_TEMPLATE.substitute(
+        generated=time.strftime("%Y-%m-%d %H:%M"),
+        last_updated=html.escape(str(stats.get("last_updated") or "never")),
+        total_queries=stats.get("total_queries", 0),
+        estimated_savings=f"{stats.get('estimated_savings', 0.0):.2f}",
+        measured_savings=f"${measured:.2f}" if measured is not None else "n/a",
+        delegation_savings=f"{stats.get('delegation_savings', 0.0):.2f}",
+        tool_intensive=stats.get("tool_intensive_queries", 0),
+        latency_p50=f"{latency['p50']:.1f}ms",
+        latency_p99=f"{latency['p99']:.1f}ms",
+        exception_rows=exception_rows,
+        session_rows="\n    ".join(days[d]["row"] for d in reversed(dates[-TABLE_MAX_ROWS:])),
+        route_data=json.dumps(route_data),
+        daily_data=json.dumps(daily),
+    )
+
+
+def generate(output: Path, stats_file: Path = STATS_FILE, cache_file: Path = RENDER_CACHE_FILE) -> dict:
+    """Render the dashboard to output. Returns a short summary of the run."""
+    stats = load_json(stats_file, None)
+    if not stats:
+        return None
+    cache, rendered = update_render_cache(stats, load_json(cache_file, {}), str(stats_file.resolve()))
+    atomic_write(output, render_dashboard(stats, cache))
+    try:
+        atomic_write_json(cache_file, cache)
+    except OSError:
+        pass  # The cache only saves work next time
+    return {"output": str(output), "days": len(cache["days"]), "days_rendered": rendered,
+            "total_queries": stats.get("total_queries", 0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the Claude Router analytics dashboard")
+    parser.add_argument("--output", default="router-analytics.html", help="HTML file to write")
+    parser.add_argument("--stats", default=str(STATS_FILE), help="router stats file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    summary = generate(Path(args.output).expanduser(), Path(args.stats).expanduser())
+    if summary is None:
+        print("No router stats found yet - run some queries through the router first.")
+        sys.exit(1)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"Dashboard written to {summary['output']} "
+          f"({summary['total_queries']} queries, {summary['days']} days, "
+          f"{summary['days_rendered']} re-rendered, {elapsed_ms:.0f}ms)")
+
+
+if __name__ == "__main__":
+    main()
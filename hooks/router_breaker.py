@@ -0,0 +1,227 @@
+"""
+Claude Router - LLM Fallback Circuit Breaker
+Stops low-confidence prompts from waiting on an LLM call that is bound to
+fail (anthropic package missing, invalid key, API down).
+
+The breaker state is one small JSON file shared by every hook process:
+
+- closed     calls go through; consecutive failures are counted
+- open       FAILURE_THRESHOLD consecutive failures (or one failure that
+             will not fix itself: missing package, rejected key) open the
+             breaker; calls are skipped until retry_at, with the backoff
+             doubling on every consecutive trip up to MAX_BACKOFF
+- half_open  after retry_at, exactly one process takes a probe lease (an
+             O_EXCL lock file) and makes a real call; success closes the
+             breaker, failure re-opens it with a longer backoff
+
+"trips" counts consecutive trips (it sets the backoff and a success
+resets it); "trips_total" only ever grows, for the exported counter.
+
+Failures caused by the environment are negatively cached against what
+caused them: a rejected key is only remembered for that key, and a missing
+package is forgotten as soon as it becomes importable. The file is only
+written on state changes, so a healthy breaker costs one small read. Every
+change is a read-modify-write under the file's lock (router_state), so
+failures counted by concurrent processes during an outage add up.
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import hashlib
+import os
+import time
+from pathlib import Path
+
+from router_state import read_json, update_json
+
+BREAKER_FILE = Path.home() / ".claude" / "router-llm-breaker.json"
+
+# Every value of the file's "state" field, as stored
+STATES = ("closed", "open", "half_open")
+
+FAILURE_THRESHOLD = 3
+BASE_BACKOFF = 30              # seconds, transient failures (network, 5xx, rate limits)
+PERMANENT_BACKOFF = 15 * 60    # seconds, failures that need the user to act
+MAX_BACKOFF = 60 * 60
+PROBE_LEASE = 30               # seconds a half-open probe may take before another is allowed
+
+PERMANENT_KINDS = ("missing_package", "auth")
+
+AUTH_ERRORS = ("AuthenticationError", "PermissionDeniedError")
+UNAVAILABLE_ERRORS = ("APIConnectionError", "APITimeoutError", "InternalServerError",
+                      "RateLimitError", "ServiceUnavailableError", "OverloadedError")
+
+
+def new_breaker() -> dict:
+    return {"state": "closed", "failures": 0, "trips": 0}
+
+
+def _closed(current: dict) -> dict:
+    """current closed and reset, keeping its lifetime trip count (trips_total, a metrics counter)."""
+    closed = new_breaker()
+    if current.get("trips_total"):
+        closed["trips_total"] = current["trips_total"]
+    return closed
+
+
+def key_id(api_key: str) -> str:
+    """Short, non-reversible identifier for an API key."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12] if api_key else None
+
+
+def failure_kind(error: BaseException) -> str:
+    """Classify an LLM call failure (SDK or plain HTTP) without importing the anthropic package."""
+    if isinstance(error, ImportError):
+        return "missing_package"
+    name = type(error).__name__
+    # SDK errors carry status_code, urllib's HTTPError carries code
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    status = status if isinstance(status, int) else 0
+    if name in AUTH_ERRORS or status in (401, 403):
+        return "auth"
+    if (name in UNAVAILABLE_ERRORS or status == 429 or status >= 500
+            or isinstance(error, (OSError, TimeoutError))):
+        return "unavailable"
+    return "error"
+
+
+def load_breaker(path: Path = BREAKER_FILE) -> dict:
+    breaker = read_json(path)
+    return breaker if isinstance(breaker, dict) else new_breaker()
+
+
+def _probe_lock(path: Path) -> Path:
+    return path.with_name(path.name + ".probe")
+
+
+def _take_probe_lease(path: Path, now: float) -> bool:
+    """Claim the half-open probe for this process (stale leases are broken)."""
+    lock = _probe_lock(path)
+    for _ in range(2):
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if now - lock.stat().st_mtime < PROBE_LEASE:
+                    return False
+                lock.unlink()
+            except OSError:
+                pass
+        except OSError:
+            return False
+    return False
+
+
+def _release_probe_lease(path: Path):
+    try:
+        _probe_lock(path).unlink()
+    except OSError:
+        pass
+
+
+def _cause_resolved(breaker: dict, api_key: str) -> bool:
+    """Whether the cause of a negatively cached failure has gone away."""
+    kind = breaker.get("kind")
+    if kind == "auth":
+        return breaker.get("key_id") != key_id(api_key)
+    if kind == "missing_package":
+        import importlib.util
+        return importlib.util.find_spec("anthropic") is not None
+    return False
+
+
+def before_call(api_key: str = None, path: Path = BREAKER_FILE, now: float = None) -> tuple[bool, dict]:
+    """Decide whether this process may call the LLM.
+
+    Returns (allowed, breaker). When the breaker is open and its backoff has
+    expired, only the process that wins the probe lease is allowed.
+    """
+    now = now or time.time()
+    breaker = load_breaker(path)
+    if breaker.get("state", "closed") == "closed":
+        return True, breaker
+    if breaker.get("kind") in PERMANENT_KINDS and _cause_resolved(breaker, api_key):
+        def reset(current):
+            # Another process may have tripped it again meanwhile
+            if current.get("kind") in PERMANENT_KINDS and _cause_resolved(current, api_key):
+                return _closed(current)
+            return None
+
+        update_json(path, reset, new_breaker)
+        _release_probe_lease(path)
+        return True, new_breaker()
+    if now < breaker.get("retry_at", 0):
+        return False, breaker
+    if not _take_probe_lease(path, now):
+        return False, breaker
+    if breaker["state"] != "half_open":
+        def half_open(current):
+            if current.get("state") != "open":
+                return None
+            current["state"] = "half_open"
+            return current
+
+        update_json(path, half_open, new_breaker)
+        breaker["state"] = "half_open"
+    return True, breaker
+
+
+def record_success(breaker: dict, path: Path = BREAKER_FILE):
+    """Close the breaker after a successful call (no write when already healthy)."""
+    if breaker.get("state") == "closed" and not breaker.get("failures"):
+        return
+    update_json(path, lambda current: _closed(current) if current != _closed(current) else None, new_breaker)
+    _release_probe_lease(path)
+
+
+def record_failure(breaker: dict, error: BaseException, api_key: str = None,
+                   path: Path = BREAKER_FILE, now: float = None) -> dict:
+    """Count a failed call; open (or re-open) the breaker when warranted.
+
+    breaker is the state before_call returned: a failed half-open probe
+    re-opens the breaker. The count itself is applied to the current file
+    under its lock, so concurrent failures are all counted and a breaker
+    another process already opened is not tripped twice.
+    """
+    now = now or time.time()
+    kind = failure_kind(error)
+    probe = breaker.get("state") == "half_open"
+    updated = []
+
+    def count(current):
+        current["failures"] = current.get("failures", 0) + 1
+        current["kind"] = kind
+        current["last_error"] = f"{type(error).__name__}: {error}"[:200]
+        current["last_failure"] = int(now)
+        if kind == "auth":
+            current["key_id"] = key_id(api_key)
+
+        already_open = current.get("state") == "open" and now < current.get("retry_at", 0)
+        if not already_open and (probe or current.get("state") == "half_open" or kind in PERMANENT_KINDS
+                                 or current["failures"] >= FAILURE_THRESHOLD):
+            base = PERMANENT_BACKOFF if kind in PERMANENT_KINDS else BASE_BACKOFF
+            backoff = min(MAX_BACKOFF, base * 2 ** current.get("trips", 0))
+            current["state"] = "open"
+            current["trips"] = current.get("trips", 0) + 1
+            current["trips_total"] = current.get("trips_total", 0) + 1
+            current["opened_at"] = int(now)
+            current["retry_at"] = int(now + backoff)
+        updated.append(current)
+        return current
+
+    if not update_json(path, count, new_breaker):
+        count(dict(breaker))  # Lock busy: this failure goes uncounted on disk
+    _release_probe_lease(path)
+    return updated[0]
+
+
+def describe(breaker: dict, now: float = None) -> dict:
+    """Breaker summary for /router-stats."""
+    now = now or time.time()
+    summary = {"state": breaker.get("state", "closed"), "failures": breaker.get("failures", 0)}
+    if summary["state"] != "closed":
+        summary["kind"] = breaker.get("kind")
+        summary["last_error"] = breaker.get("last_error")
+        summary["retry_in"] = max(0, int(breaker.get("retry_at", 0) - now))
+        summary["trips"] = breaker.get("trips", 0)
+    return summary
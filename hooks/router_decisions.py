@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Decision Log and Columnar Export
+The hook appends every routing decision as one JSON line to
+~/.claude/router-decisions.jsonl (a single O_APPEND write, no lock): time,
+session, project, cache fingerprint, route, method, confidence, the
+identities of the rule patterns behind the route ("category:regex", as in
+router_calibration), hook latency, cache tier and LLM fallback outcome.
+No prompt text is logged: not even the matched signals, which are
+excerpts of it. When the log passes SEGMENT_BYTES it is renamed to a
+router-decisions.<time_ns>.jsonl segment and a new one starts; only the
+newest MAX_SEGMENTS segments are kept. CLAUDE_ROUTER_DECISION_LOG moves
+the log, or turns it off with "0".
+
+The exporter streams the log into a columnar dataset for analysis with
+DuckDB, pandas or Spark, without loading it as JSON:
+
+- parquet (default with pyarrow) / arrow: one file per export run
+  (decisions-<time_ns>.parquet or .arrow), written in row groups / record
+  batches of --chunk-rows rows, so memory is bounded by one chunk. route,
+  method, session, project, cache, llm and the rule identities are
+  dictionary-encoded; the dictionaries grow across the chunks of a run
+  (emitted as deltas in Arrow IPC).
+- csv (fallback without pyarrow): one decisions.csv, appended to, rules
+  joined with ";".
+
+Exports are incremental. The byte offset reached in each log segment is
+kept in <output>/.export-state.json, keyed by inode so it survives
+rotation, and the next run exports only newer decisions. The state is
+saved before a new file is moved into place (and the CSV is cut back to
+its recorded size), so an interrupted run neither loses nor duplicates
+rows.
+
+Usage:
+    python3 router_decisions.py [--output DIR] [--format parquet|arrow|csv] [--chunk-rows 65536]
+                                [--input LOG ...] [--json]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from router_state import append_record, atomic_write_json, read_json
+
+DECISIONS_FILE = Path.home() / ".claude" / "router-decisions.jsonl"
+EXPORT_DIR = Path.home() / ".claude" / "router-decisions-export"
+STATE_FILE = ".export-state.json"
+SEGMENT_BYTES = 16 * 1024 * 1024  # ~80k decisions
+MAX_SEGMENTS = 8
+CHUNK_ROWS = 65536
+
+COLUMNS = ("ts", "session", "project", "fingerprint", "route", "method", "confidence", "rules",
+           "latency_ms", "cache", "llm")
+DICTIONARY_COLUMNS = ("session", "project", "route", "method", "cache", "llm")
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+
+def decision_log() -> Path:
+    """The decision log (CLAUDE_ROUTER_DECISION_LOG), or None if it is turned off."""
+    configured = os.environ.get("CLAUDE_ROUTER_DECISION_LOG", "").strip()
+    if configured.lower() in ("0", "false", "off", "no"):
+        return None
+    return Path(configured).expanduser() if configured else DECISIONS_FILE
+
+
+def segments(path: Path) -> list:
+    """Rotated segments of the log at path, oldest first, then the log itself (if present)."""
+    prefix, suffix = path.stem + ".", path.suffix
+    rotated = []
+    for candidate in path.parent.glob(f"{prefix}*{suffix}"):
+        stamp = candidate.name[len(prefix):-len(suffix)]
+        if stamp.isdigit():
+            rotated.append((int(stamp), candidate))
+    return [p for _, p in sorted(rotated)] + ([path] if path.exists() else [])
+
+
+def rotate(path: Path, keep: int = MAX_SEGMENTS):
+    """Start a new log: rename path to a time-stamped segment and drop the oldest segments."""
+    try:
+        os.replace(path, path.with_name(f"{path.stem}.{time.time_ns()}{path.suffix}"))
+    except FileNotFoundError:
+        return  # another process rotated it first
+    rotated = [p for p in segments(path) if p != path]
+    for old in rotated[:max(0, len(rotated) - keep)]:
+        try:
+            os.unlink(old)
+        except OSError:
+            pass
+
+
+def decision_record(route: str, method: str, confidence: float, rules: list, metadata: dict,
+                    latency_ms: float = None, session_id: str = None, project: str = None,
+                    fingerprint: str = None) -> dict:
+    """One decision log line (route is the route label, e.g. "orchestrated")."""
+    cache = None
+    if metadata.get("memory_cache_hit") or metadata.get("cache_hit"):
+        cache = "memory" if metadata.get("memory_cache_hit") else "pack" if metadata.get("pack_hit") else "file"
+    llm = None
+    if metadata.get("llm_failed"):
+        llm = "failed"
+    elif method == "haiku-llm":
+        llm = "called"
+    elif metadata.get("llm_skipped"):
+        llm = "skipped"
+    return {"ts": round(time.time(), 3), "session": session_id, "project": project, "fingerprint": fingerprint,
+            "route": route, "method": method, "confidence": round(confidence, 3), "rules": list(rules),
+            "latency_ms": round(latency_ms, 2) if latency_ms is not None else None, "cache": cache, "llm": llm}
+
+
+def append_decision(*args, **kwargs):
+    """Append a decision_record to the log (rotating it when full); never raises."""
+    try:
+        path = decision_log()
+        if path and append_record(path, decision_record(*args, **kwargs)) > SEGMENT_BYTES:
+            rotate(path)
+    except Exception:
+        pass  # The decision log must never break the hook
+
+
+def _inode_key(stat) -> str:
+    return f"{stat.st_dev}:{stat.st_ino}"
+
+
+def read_new(paths: list, cursor: dict):
+    """Yield decisions appended to paths since cursor ({inode: offset}, advanced as lines are read)."""
+    for path in paths:
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            continue  # rotated away or pruned since it was listed
+        with f:
+            key = _inode_key(os.fstat(f.fileno()))
+            offset = cursor.get(key, 0)
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a write in progress; the next export picks it up
+                offset += len(line)
+                cursor[key] = offset
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and "ts" in record:
+                    yield record
+
+
+def chunks(records, size: int):
+    """Lists of at most size records."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _arrow_schema(pa):
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    types = {"ts": pa.timestamp("ms", tz="UTC"), "fingerprint": pa.string(), "confidence": pa.float32(),
+             "rules": pa.list_(dictionary), "latency_ms": pa.float32()}
+    return pa.schema([(name, types.get(name, dictionary)) for name in COLUMNS])
+
+
+def _dictionary_array(pa, values: list, vocabulary: dict):
+    """values as a DictionaryArray over vocabulary, which grows with new values (dictionary deltas)."""
+    indices = [None if v is None else vocabulary.setdefault(v, len(vocabulary)) for v in values]
+    return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(list(vocabulary), pa.string()))
+
+
+def _record_batch(pa, schema, chunk: list, vocabularies: dict):
+    arrays = []
+    for field in schema:
+        name = field.name
+        if name == "rules":
+            offsets, flat = [0], []
+            for record in chunk:
+                flat.extend(str(r) for r in record.get("rules") or ())
+                offsets.append(len(flat))
+            arrays.append(pa.ListArray.from_arrays(pa.array(offsets, pa.int32()),
+                                                   _dictionary_array(pa, flat, vocabularies[name])))
+        elif name in DICTIONARY_COLUMNS:
+            arrays.append(_dictionary_array(pa, [r.get(name) for r in chunk], vocabularies[name]))
+        elif name == "ts":
+            arrays.append(pa.array([int(r["ts"] * 1000) for r in chunk], field.type))
+        else:
+            arrays.append(pa.array([r.get(name) for r in chunk], field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_columnar(records, path: Path, fmt: str, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Write records to a new Parquet or Arrow IPC file, one chunk at a time; returns rows written."""
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa)
+    vocabularies = {name: {} for name in DICTIONARY_COLUMNS + ("rules",)}
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(str(path), schema, compression="zstd")
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_file(str(path), schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        write = writer.write_batch
+    rows = 0
+    try:
+        for chunk in chunks(records, chunk_rows):
+            write(_record_batch(pa, schema, chunk, vocabularies))
+            rows += len(chunk)
+    finally:
+        writer.close()
+    return rows
+
+
+def _csv_row(record: dict) -> list:
+    row = []
+    for name in COLUMNS:
+        value = record.get(name)
+        if name == "ts":
+            value = datetime.fromtimestamp(value, timezone.utc).isoformat(timespec="milliseconds")
+        elif name == "rules":
+            value = ";".join(str(r) for r in value or ())
+        row.append("" if value is None else value)
+    return row
+
+
+def write_csv(records, path: Path, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Append records to a CSV file (header if new), flushing every chunk; returns rows written."""
+    import csv
+
+    rows = 0
+    new = not path.exists() or path.stat().st_size == 0
+    with open(path, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new:
+            writer.writerow(COLUMNS)
+        for chunk in chunks(records, chunk_rows):
+            writer.writerows(_csv_row(record) for record in chunk)
+            f.flush()
+            rows += len(chunk)
+    return rows
+
+
+def default_format() -> str:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return "parquet"
+    except ImportError:
+        return "csv"
+
+
+def export(inputs: list, output: Path, fmt: str, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """Export the decisions in inputs not yet in output; returns a report."""
+    started = time.perf_counter()
+    output.mkdir(parents=True, exist_ok=True)
+    state_path = output / STATE_FILE
+    state = read_json(state_path) or {}
+    cursor = state.setdefault("cursor", {})
+
+    # Finish or discard what an interrupted run left behind
+    pending = state.pop("pending", None)
+    for tmp in output.glob("*.tmp"):
+        if pending and tmp.name == pending + ".tmp":
+            os.replace(tmp, output / pending)
+        else:
+            tmp.unlink()
+    csv_path = output / "decisions.csv"
+    if csv_path.exists() and csv_path.stat().st_size > state.get("csv_bytes", 0):
+        with open(csv_path, "r+b") as f:
+            f.truncate(state.get("csv_bytes", 0))
+
+    records = read_new(inputs, cursor)
+    if fmt == "csv":
+        rows = write_csv(records, csv_path, chunk_rows)
+        written = csv_path if rows else None
+        state["csv_bytes"] = csv_path.stat().st_size if csv_path.exists() else 0
+    else:
+        name = f"decisions-{time.time_ns()}{FORMATS[fmt]}"
+        tmp = output / (name + ".tmp")
+        rows = write_columnar(records, tmp, fmt, chunk_rows)
+        written = output / name if rows else None
+        if rows:
+            state["pending"] = name
+        else:
+            tmp.unlink()
+
+    # Forget segments that have been pruned
+    live = set()
+    for path in inputs:
+        try:
+            live.add(_inode_key(path.stat()))
+        except OSError:
+            pass
+    state["cursor"] = {key: offset for key, offset in cursor.items() if key in live}
+    state["exported_rows"] = state.get("exported_rows", 0) + rows
+    state["last_export"] = datetime.now().isoformat()
+    atomic_write_json(state_path, state, indent=2)
+    if state.get("pending"):
+        os.replace(output / (state["pending"] + ".tmp"), output / state["pending"])
+
+    seconds = time.perf_counter() - started
+    return {"rows": rows, "total_rows": state["exported_rows"], "format": fmt,
+            "file": str(written) if written else None, "seconds": round(seconds, 2),
+            "rows_per_second": round(rows / seconds) if seconds and rows else 0}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export routing decisions to Parquet, Arrow IPC or CSV")
+    parser.add_argument("--output", default=str(EXPORT_DIR), help=f"dataset directory (default: {EXPORT_DIR})")
+    parser.add_argument("--format", choices=tuple(FORMATS), help="default: parquet if pyarrow is installed, else csv")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows per row group / record batch")
+    parser.add_argument("--input", nargs="+", help="decision logs (default: the log and its segments)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    fmt = args.format or default_format()
+    if fmt != "csv" and default_format() == "csv":
+        print(f"--format {fmt} needs pyarrow (pip install pyarrow); use --format csv without it.", file=sys.stderr)
+        sys.exit(1)
+    if args.input:
+        inputs = [Path(p).expanduser() for p in args.input]
+    else:
+        log = decision_log()
+        inputs = segments(log) if log else []
+    if not inputs:
+        print("No routing decisions logged yet - run some queries through the router first.", file=sys.stderr)
+        sys.exit(1)
+
+    report = export(inputs, Path(args.output).expanduser(), fmt, args.chunk_rows)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    elif report["rows"]:
+        print(f"Exported {report['rows']} decisions to {report['file']} in {report['seconds']}s "
+              f"({report['total_rows']} exported in total)")
+    else:
+        print(f"No new decisions since the last export ({report['total_rows']} exported in total)")
+
+
+if __name__ == "__main__":
+    main()
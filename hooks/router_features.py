@@ -0,0 +1,153 @@
+"""
+Claude Router - Prompt Features and Classification Results
+The prompt is normalized and tokenized once per hook run into an
+immutable PromptFeatures object, which every stage (cache fingerprint,
+exception and follow-up checks, rules, learned adjustments) reads instead
+of lowercasing and re-tokenizing the prompt itself. Results travel as a
+slotted Classification instead of loose dicts.
+
+Both types use __slots__, so they carry no per-instance __dict__; the
+feature object also refuses attribute writes, so stages can share it
+safely. Public hook functions accept either a prompt string or a
+PromptFeatures (see features_of).
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import hashlib
+import re
+
+WORD = re.compile(r"\b[a-z]+\b")
+CODE_FENCE = "```"
+
+# Words left out of the cache fingerprint
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been',
+    'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
+    'would', 'could', 'should', 'may', 'might', 'must', 'can',
+    'to', 'of', 'in', 'for', 'on', 'with', 'at', 'by', 'from',
+    'this', 'that', 'these', 'those', 'it', 'its', 'i', 'me', 'my',
+})
+FINGERPRINT_TERMS = 10
+MIN_TERM_CHARS = 3  # also the learned-weights term length (router_knowledge.ROUTING_TERM)
+
+# Upper bounds (in words) of the length classes; longer is "long"
+LENGTH_CLASSES = (("short", 12), ("medium", 80))
+
+
+class PromptFeatures:
+    """Everything the classifier stages read from a prompt, computed once.
+
+    text        the prompt as submitted
+    lower       text.lower() (rules and exception patterns run on this)
+    stripped    lower.strip() (anchored follow-up patterns)
+    tokens      lowercase words in order (a-z runs; the same with or without
+                whitespace normalization, so none is done)
+    terms       distinct tokens of MIN_TERM_CHARS or more (learned weights)
+    key_terms   sorted terms minus stop words, first FINGERPRINT_TERMS
+    fingerprint cache key: md5 of key_terms (first 12 hex chars)
+    length_class "short", "medium" or "long" by word count
+    code_spans  (start, end) offsets of ``` fenced blocks in text
+    """
+
+    __slots__ = ("text", "lower", "stripped", "tokens", "terms", "key_terms", "fingerprint",
+                 "length_class", "code_spans")
+
+    def __init__(self, text: str):
+        lower = text.lower()
+        tokens = tuple(WORD.findall(lower))
+        terms = frozenset(t for t in tokens if len(t) >= MIN_TERM_CHARS)
+        key_terms = tuple(sorted(terms - STOP_WORDS)[:FINGERPRINT_TERMS])
+        words = len(tokens)
+        length_class = next((name for name, limit in LENGTH_CLASSES if words <= limit), "long")
+
+        init = object.__setattr__
+        init(self, "text", text)
+        init(self, "lower", lower)
+        init(self, "stripped", lower.strip())
+        init(self, "tokens", tokens)
+        init(self, "terms", terms)
+        init(self, "key_terms", key_terms)
+        init(self, "fingerprint", _fingerprint(key_terms))
+        init(self, "length_class", length_class)
+        init(self, "code_spans", _code_spans(text) if CODE_FENCE in text else ())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PromptFeatures is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("PromptFeatures is immutable")
+
+    def __repr__(self):
+        return f"PromptFeatures({self.text[:40]!r}, fingerprint={self.fingerprint!r})"
+
+
+def _fingerprint(key_terms: tuple) -> str:
+    return hashlib.md5(" ".join(key_terms).encode()).hexdigest()[:12]
+
+
+def _code_spans(text: str) -> tuple:
+    spans = []
+    start = text.find(CODE_FENCE)
+    while start != -1:
+        end = text.find(CODE_FENCE, start + len(CODE_FENCE))
+        if end == -1:
+            spans.append((start, len(text)))  # unclosed fence runs to the end
+            break
+        spans.append((start, end + len(CODE_FENCE)))
+        start = text.find(CODE_FENCE, end + len(CODE_FENCE))
+    return tuple(spans)
+
+
+def features_of(prompt) -> PromptFeatures:
+    """PromptFeatures for a prompt string (passed through if it already is one)."""
+    return prompt if isinstance(prompt, PromptFeatures) else PromptFeatures(prompt)
+
+
+class Classification:
+    """A routing result: route, confidence, signals, method and metadata.
+
+    Stages adjust a result in place; copy() gives an independent one
+    (metadata included) for results that are shared, like memory cache
+    entries. rules holds the identities of the rule patterns behind a rules
+    result ("category:regex"; signals are the matched text), which key the
+    calibration counters; it is internal and not part of as_dict().
+    """
+
+    __slots__ = ("route", "confidence", "signals", "method", "metadata", "rules")
+
+    def __init__(self, route: str, confidence: float, signals: list = None, method: str = "rules",
+                 metadata: dict = None, rules: list = None):
+        self.route = route
+        self.confidence = confidence
+        self.signals = signals if signals is not None else []
+        self.method = method
+        self.metadata = metadata if metadata is not None else {}
+        self.rules = rules if rules is not None else []
+
+    @classmethod
+    def from_dict(cls, data: dict, method: str = None, metadata: dict = None) -> "Classification":
+        """From a parsed classifier answer ({"route", "confidence", "signals", ...})."""
+        return cls(data["route"], data["confidence"], list(data.get("signals") or []),
+                   method or data.get("method", "rules"),
+                   metadata if metadata is not None else dict(data.get("metadata") or {}))
+
+    def copy(self) -> "Classification":
+        return Classification(self.route, self.confidence, list(self.signals), self.method, dict(self.metadata),
+                              list(self.rules))
+
+    def as_dict(self) -> dict:
+        data = {"route": self.route, "confidence": self.confidence, "signals": self.signals, "method": self.method}
+        if self.metadata:
+            data["metadata"] = self.metadata
+        return data
+
+    def __eq__(self, other):
+        if not isinstance(other, Classification):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"Classification({self.route!r}, {self.confidence!r}, signals={self.signals!r}, "
+                f"method={self.method!r}, metadata={self.metadata!r})")
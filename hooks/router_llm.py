@@ -0,0 +1,223 @@
+"""
+Claude Router - LLM Classification Request
+Builds the compact Haiku fallback request and parses its answer.
+
+The request cost and latency used to grow with whatever the user pasted:
+the whole prompt went in verbatim behind a long instruction block. Now the
+query is capped at a token budget (CLAUDE_ROUTER_LLM_QUERY_TOKENS, default
+QUERY_TOKEN_BUDGET) by keeping its head and tail - where the ask and the
+most recent context usually are - and the rule signals that already fired
+are passed along, so a truncated middle loses little. Instructions are a
+few terse lines.
+
+The request is not marked for prompt caching. The instructions are the
+same on every call, but the API only caches prefixes of at least the
+model's minimum length (MIN_CACHEABLE_TOKENS), some thirty times their
+size, so a marker would be ignored; padding them to that length would
+make each call cost more than the uncached request does.
+
+By default the answer is streamed (stream_classification): the SSE stream
+is parsed as it arrives and closed as soon as "route" and "confidence" are
+complete, instead of waiting for the whole JSON object. The answer format
+puts tool_intensive between them so it is not lost; signals, which come
+last, are kept only if they arrived before the cut. Streaming talks to the
+Messages API over plain HTTP (honouring ANTHROPIC_BASE_URL) and can be
+turned off with CLAUDE_ROUTER_LLM_STREAM=0.
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import json
+import os
+import re
+
+MODEL = "claude-haiku-4-5-20251001"
+MAX_OUTPUT_TOKENS = 100
+
+API_URL = "https://api.anthropic.com"
+API_VERSION = "2023-06-01"
+STREAM_TIMEOUT = 10  # seconds
+
+# Query tokens sent to the classifier (head + tail beyond this)
+QUERY_TOKEN_BUDGET = 300
+MIN_QUERY_TOKEN_BUDGET = 32
+# Share of the budget kept from the start of the query (the rest is the tail)
+HEAD_SHARE = 0.67
+# Rough chars-per-token for English text and code
+CHARS_PER_TOKEN = 4
+
+# Smallest prefix the API will cache for MODEL (Haiku 4.5); the request stays far below it
+MIN_CACHEABLE_TOKENS = 4096
+
+# Rule signals that say nothing about the prompt
+GENERIC_SIGNALS = {"no strong patterns", "cache_hit"}
+
+INSTRUCTIONS = """Route this coding request to one model tier.
+fast: factual/syntax lookups, formatting, simple git, JSON/YAML edits.
+standard: bug fixes, features, review, refactors, tests; or tool-heavy work (codebase search, multi-file edits, running tests/builds).
+deep: architecture, system design, security audits, trade-offs, complex debugging, large refactors, multi-step orchestration.
+Reply with JSON only, keys in this order: {"route":"fast|standard|deep","tool_intensive":true|false,"confidence":0-1,"signals":["..."]}"""
+
+# Fields of a partial answer, each matched only once its value is complete
+ROUTE_FIELD = re.compile(r'"route"\s*:\s*"(fast|standard|deep)"')
+TOOL_FIELD = re.compile(r'"tool_intensive"\s*:\s*(true|false)')
+CONFIDENCE_FIELD = re.compile(r'"confidence"\s*:\s*([0-9.]+)\s*[,}]')
+SIGNALS_FIELD = re.compile(r'"signals"\s*:\s*(\[[^\]]*\])')
+
+
+def query_token_budget() -> int:
+    try:
+        budget = int(os.environ.get("CLAUDE_ROUTER_LLM_QUERY_TOKENS", QUERY_TOKEN_BUDGET))
+    except ValueError:
+        budget = QUERY_TOKEN_BUDGET
+    return max(MIN_QUERY_TOKEN_BUDGET, budget)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_query(prompt: str, budget_tokens: int) -> tuple[str, int]:
+    """Cap prompt at budget_tokens, keeping its head and tail.
+
+    Returns (text, omitted_chars). Cuts land on whitespace where possible.
+    """
+    prompt = prompt.strip()
+    budget_chars = budget_tokens * CHARS_PER_TOKEN
+    if len(prompt) <= budget_chars:
+        return prompt, 0
+    head_chars = int(budget_chars * HEAD_SHARE)
+    tail_chars = budget_chars - head_chars
+    head = prompt[:head_chars]
+    cut = head.rfind(" ", head_chars // 2)
+    if cut > 0:
+        head = head[:cut]
+    tail = prompt[-tail_chars:]
+    cut = tail.find(" ", 0, tail_chars // 2)
+    if cut >= 0:
+        tail = tail[cut + 1:]
+    omitted = len(prompt) - len(head) - len(tail)
+    return f"{head} [...{omitted} chars omitted...] {tail}", omitted
+
+
+def build_request(prompt: str, signals: list = None, budget_tokens: int = None) -> dict:
+    """Keyword arguments for client.messages.create() classifying prompt."""
+    query, omitted = truncate_query(prompt, budget_tokens or query_token_budget())
+    fired = [s.strip() for s in signals or () if s not in GENERIC_SIGNALS and s.strip()]
+    lines = []
+    if fired:
+        lines.append("Rule signals: " + ", ".join(fired[:5]))
+    lines.append(f"Request{' (middle omitted)' if omitted else ''}:\n<<<\n{query}\n>>>")
+    return {
+        "model": MODEL,
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "system": INSTRUCTIONS,
+        "messages": [{"role": "user", "content": "\n".join(lines)}],
+    }
+
+
+def usage_tokens(usage) -> dict:
+    """Token counts from a Messages API usage object or dict (cache fields may be absent)."""
+    def field(name):
+        value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        return value or 0
+    return {"input": field("input_tokens"), "output": field("output_tokens"),
+            "cache_read": field("cache_read_input_tokens"),
+            "cache_write": field("cache_creation_input_tokens")}
+
+
+def parse_response(text: str) -> dict:
+    """Parse the classifier's JSON answer (tolerates markdown fences)."""
+    text = text.strip()
+    if "```" in text:
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:].strip()
+    result = json.loads(text)
+    if result.get("route") not in ("fast", "standard", "deep"):
+        raise ValueError(f"unexpected route: {result.get('route')!r}")
+    return result
+
+
+def streaming_enabled() -> bool:
+    return os.environ.get("CLAUDE_ROUTER_LLM_STREAM", "1") != "0"
+
+
+def scan_partial(text: str) -> dict:
+    """The answer so far, once route and confidence are both complete (else None)."""
+    route = ROUTE_FIELD.search(text)
+    confidence = CONFIDENCE_FIELD.search(text)
+    if not route or not confidence:
+        return None
+    try:
+        result = {"route": route.group(1), "confidence": float(confidence.group(1))}
+    except ValueError:
+        return None
+    tool = TOOL_FIELD.search(text)
+    if tool:
+        result["tool_intensive"] = tool.group(1) == "true"
+    signals = SIGNALS_FIELD.search(text)
+    try:
+        result["signals"] = json.loads(signals.group(1)) if signals else ["haiku-llm"]
+    except ValueError:
+        result["signals"] = ["haiku-llm"]
+    return result
+
+
+class StreamError(Exception):
+    """An error event, or an unparsable event, in the middle of a stream."""
+
+
+class AnswerError(ValueError):
+    """The API answered, but not with a usable classification."""
+
+
+def stream_classification(api_key: str, request: dict, base_url: str = None,
+                          timeout: float = STREAM_TIMEOUT) -> tuple[dict, dict]:
+    """Stream a classification and stop reading once route and confidence are known.
+
+    Returns (result, usage) where usage is usage_tokens() of what the API
+    reported before the stream was closed (output tokens are estimated from
+    the text received when it was cut short). result["early_stop"] tells
+    whether the stream was cut. Raises AnswerError if the complete answer is
+    not a classification, StreamError if the stream itself is broken.
+    """
+    # Imported here: urllib.request pulls in http.client, email and ssl,
+    # which rules-only prompts should not pay for
+    import urllib.request
+
+    base_url = (base_url or os.environ.get("ANTHROPIC_BASE_URL") or API_URL).rstrip("/")
+    req = urllib.request.Request(
+        f"{base_url}/v1/messages", data=json.dumps(dict(request, stream=True)).encode(), method="POST",
+        headers={"content-type": "application/json", "accept": "text/event-stream",
+                 "x-api-key": api_key, "anthropic-version": API_VERSION})
+    usage = {}
+    text = ""
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        for raw in response:
+            if not raw.startswith(b"data:"):
+                continue
+            try:
+                event = json.loads(raw[5:])
+            except ValueError:
+                raise StreamError(f"malformed stream event: {raw[:80]!r}") from None
+            kind = event.get("type")
+            if kind == "content_block_delta":
+                text += event.get("delta", {}).get("text", "")
+                result = scan_partial(text)
+                if result:
+                    # Leaving the with block closes the connection mid-stream
+                    usage["output_tokens"] = max(usage.get("output_tokens", 0), estimate_tokens(text))
+                    result["early_stop"] = True
+                    return result, usage_tokens(usage)
+            elif kind == "message_start":
+                usage.update(event.get("message", {}).get("usage", {}))
+            elif kind == "message_delta":
+                usage.update(event.get("usage", {}))
+            elif kind == "error":
+                raise StreamError(event.get("error", {}).get("message", "stream error"))
+    try:
+        result = parse_response(text)
+    except ValueError as e:
+        raise AnswerError(str(e)) from None
+    result["early_stop"] = False
+    return result, usage_tokens(usage)
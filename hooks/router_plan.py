@@ -0,0 +1,201 @@
+"""
+Claude Router - Orchestration Fan-out Planner
+Splits a multi-part prompt routed to the Opus orchestrator into subtasks,
+classifies them in one batch and orders them into waves, so independent
+work is launched in parallel on the cheaper executors instead of being
+discovered and run one step at a time.
+
+Subtasks come from, in order of preference:
+
+- numbered or bulleted steps ("1. ...", "2) ...", "- ...")
+- "and then" / "after that" chains
+- the whole prompt, if neither is present
+
+A step containing "for each file/module/..." fans out: a fast discovery
+subtask lists the items, and the step itself becomes a per-item template
+that runs once per item in parallel after it.
+
+Dependencies are inferred conservatively: chain links depend on the link
+before them; list steps are independent unless they start with a
+sequencing word ("then", "next", "using the results...") or the step
+before ends with one ("1. update the parser and then 2. ..."), or they
+verify the work (running the tests after changes depends on every step
+before it). A step that names earlier steps ("using the output of step
+2") depends on exactly those, by their number in the prompt. Each
+subtask's wave is one past its latest dependency; subtasks in the same
+wave can run together.
+
+No listed step is dropped, however short ("lint", "deploy"). Steps past
+MAX_SUBTASKS are not planned, and the plan names them so the
+orchestrator does them itself.
+
+classify_batch is supplied by the caller (the hook passes its cache and
+rules tiers; the LLM fallback is never used for planning), so this module
+has no routing logic of its own. The rules default to a low-confidence
+"fast" when nothing matches, which for a subtask usually means plain
+implementation work, so uncertain fast results are planned on Sonnet.
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import re
+
+MAX_SUBTASKS = 12
+MAX_TEXT_CHARS = 160
+# Fast results below this confidence are planned on standard-executor
+MIN_FAST_CONFIDENCE = 0.7
+
+EXECUTORS = {"fast": "fast-executor", "standard": "standard-executor", "deep": "self"}
+
+NUMBERED_STEP = re.compile(r"(?:^|\s)(\d{1,2})[.)]\s+")
+BULLET_STEP = re.compile(r"^\s*[-*•]\s+(.+)$", re.MULTILINE)
+CHAIN_SPLIT = re.compile(r"(?:[,;.]\s*|\s+)(?:and then|after that|afterwards|and finally)\s+|[,;.]\s+then\s+",
+                         re.IGNORECASE)
+FAN_OUT = re.compile(r"\bfor (?:each|every) (file|module|component|service|package|endpoint|directory|"
+                     r"folder|class|function|route|page|test)s?\b(?:\s+(?:in|under|of|from)\s+(?:the\s+)?([\w./-]+))?",
+                     re.IGNORECASE)
+SEQUENTIAL_START = re.compile(r"^(?:then|next|after(?:wards| that)?|finally|once|lastly|"
+                              r"using (?:the|those|these)|based on|with (?:the|those|these) (?:results?|findings|output))\b",
+                              re.IGNORECASE)
+STEP_REFERENCE = re.compile(r"\bsteps? (\d{1,2})\b", re.IGNORECASE)
+VERIFY_STEP = re.compile(r"^(?:re-?run|run|verify|validate|check|make sure)\b.{0,30}\b(?:tests?|builds?|suite|lint|"
+                         r"everything|all|changes|works?)\b", re.IGNORECASE)
+SEQUENCING_PREFIX = re.compile(r"^(?:and |then |next,? |finally,? |first,? |lastly,? )+", re.IGNORECASE)
+# A connector left at the end of a list step; group 1 is set when it sequences the next step
+TRAILING_CONNECTOR = re.compile(r"[\s,;]*\b(?:(and then|then|after that|afterwards|and finally|finally|next)|and)$",
+                                re.IGNORECASE)
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip(" \t\n,;.")
+
+
+def numbered_steps(prompt: str) -> list:
+    """Steps of a "1. ... 2. ..." list (inline or one per line), if numbered from 1 in order."""
+    markers = []
+    expected = 1
+    for match in NUMBERED_STEP.finditer(prompt):
+        if int(match.group(1)) == expected:
+            markers.append(match)
+            expected += 1
+    if len(markers) < 2:
+        return []
+    steps = []
+    for marker, following in zip(markers, markers[1:] + [None]):
+        steps.append(_clean(prompt[marker.end():following.start() if following else len(prompt)]))
+    return steps
+
+
+def split_steps(prompt: str) -> tuple[list, bool]:
+    """Split prompt into steps; returns (steps, chained) where chained means strictly sequential.
+
+    Steps are (number, text, follows) tuples: number is the step's position
+    in the prompt (1-based, counted before empty steps are left out, so
+    "step N" references keep pointing at the right step) and follows is set
+    when the step before ended with a sequencing connector, which is
+    stripped from its text. Every non-empty step is kept, however short
+    ("lint", "deploy"): a plan must not quietly leave out work the user
+    asked for.
+    """
+    steps = numbered_steps(prompt)
+    if not steps:
+        bullets = [_clean(b) for b in BULLET_STEP.findall(prompt)]
+        steps = bullets if len(bullets) >= 2 else []
+    if steps:
+        listed = []
+        follows = False
+        for number, step in enumerate(steps, 1):
+            connector = TRAILING_CONNECTOR.search(step)
+            text = _clean(step[:connector.start()]) if connector else step
+            listed.append((number, text, follows))
+            follows = bool(connector and connector.group(1))
+        return [step for step in listed if step[1]], False
+    links = [_clean(link) for link in CHAIN_SPLIT.split(prompt)]
+    links = [link for link in links if link]
+    if len(links) >= 2:
+        return [(number, link, number > 1) for number, link in enumerate(links, 1)], True
+    return [(1, _clean(prompt), False)], False
+
+
+def _short(text: str) -> str:
+    return text if len(text) <= MAX_TEXT_CHARS else text[:MAX_TEXT_CHARS - 3].rstrip() + "..."
+
+
+def build_plan(prompt: str, classify_batch) -> dict:
+    """Dependency-aware subtask plan for prompt, or None if it does not split.
+
+    classify_batch(texts) returns one Classification (router_features) per text. The
+    plan is {"subtasks": [...], "waves": n, "parallel": k, "omitted": [...]}
+    where each subtask is {"id", "text", "route", "executor", "depends_on",
+    "wave"} plus "fan_out" (the item kind) for per-item templates;
+    "parallel" counts subtasks that share their wave with another and
+    "omitted" lists the numbers of the steps past MAX_SUBTASKS, which the
+    plan does not cover.
+    """
+    steps, chained = split_steps(prompt)
+
+    subtasks = []
+    step_ends = {}  # step number -> id of the step's last subtask
+    planned = 0
+    for number, step, follows in steps:
+        text = SEQUENCING_PREFIX.sub("", step) or step
+        depends = [step_ends[int(ref)] for ref in STEP_REFERENCE.findall(step) if int(ref) in step_ends]
+        if step_ends and not depends:
+            if VERIFY_STEP.match(text):
+                depends = list(step_ends.values())
+            elif follows or chained or SEQUENTIAL_START.match(step):
+                depends = [subtasks[-1]["id"]]
+
+        fan_out = FAN_OUT.search(text)
+        if len(subtasks) + (2 if fan_out else 1) > MAX_SUBTASKS:
+            break
+        if fan_out:
+            kind, scope = fan_out.group(1).lower(), fan_out.group(2)
+            # Listing is fast work whatever the step itself is
+            discovery = {"id": len(subtasks) + 1, "depends_on": sorted(set(depends)), "route": "fast",
+                         "text": f"List every {kind} {f'in {scope}' if scope else 'this step covers'}"}
+            subtasks.append(discovery)
+            subtasks.append({"id": len(subtasks) + 1, "depends_on": [discovery["id"]],
+                             "text": text, "fan_out": kind})
+        else:
+            subtasks.append({"id": len(subtasks) + 1, "depends_on": sorted(set(depends)), "text": text})
+        step_ends[number] = len(subtasks)
+        planned += 1
+
+    if len(subtasks) < 2:
+        return None
+
+    unrouted = [s for s in subtasks if "route" not in s]
+    for subtask, result in zip(unrouted, classify_batch([s["text"] for s in unrouted])):
+        route = result.route
+        if route == "fast" and result.confidence < MIN_FAST_CONFIDENCE:
+            route = "standard"
+        subtask["route"] = route
+
+    waves = {}
+    for subtask in subtasks:
+        subtask["text"] = _short(subtask["text"])
+        subtask["executor"] = EXECUTORS.get(subtask["route"], "self")
+        subtask["wave"] = 1 + max((subtasks[d - 1]["wave"] for d in subtask["depends_on"]), default=0)
+        waves.setdefault(subtask["wave"], []).append(subtask["id"])
+    parallel = sum(len(ids) for ids in waves.values() if len(ids) > 1)
+    parallel += sum(1 for s in subtasks if s.get("fan_out") and len(waves[s["wave"]]) == 1)
+    return {"subtasks": subtasks, "waves": len(waves), "parallel": parallel,
+            "omitted": [number for number, _, _ in steps[planned:]]}
+
+
+def format_plan(plan: dict) -> str:
+    """The plan as directive text for the orchestrator."""
+    lines = [f"Subtask plan ({len(plan['subtasks'])} subtasks in {plan['waves']} waves). "
+             "Launch every subtask of a wave together (one message, several Task calls); "
+             "\"self\" subtasks are yours:"]
+    for wave in range(1, plan["waves"] + 1):
+        members = [s for s in plan["subtasks"] if s["wave"] == wave]
+        lines.append(f"Wave {wave}{' (parallel)' if len(members) > 1 else ''}:")
+        for s in members:
+            after = f" after {', '.join(map(str, s['depends_on']))}" if s["depends_on"] else ""
+            fan_out = f" [once per {s['fan_out']}, in parallel]" if s.get("fan_out") else ""
+            lines.append(f"  {s['id']}. {s['executor']}{after}{fan_out}: {s['text']}")
+    if plan.get("omitted"):
+        lines.append(f"Not planned (over {MAX_SUBTASKS} subtasks): step{'s' if len(plan['omitted']) > 1 else ''} "
+                     f"{', '.join(map(str, plan['omitted']))} of the prompt; do them after the last wave.")
+    return "\n".join(lines)
@@ -0,0 +1,272 @@
+"""
+Claude Router - State File Persistence
+Crash-safe writes and bounded locking for every file the router keeps
+state in: stats, session shards, calibration, the LLM breaker, knowledge
+caches and the classification cache.
+
+Files are never rewritten in place. New content goes to a temp file in the
+same directory that is renamed over the old one, so readers (which take no
+lock) see the old or the new file, never a truncated one, and a crash
+mid-write leaves the old file intact.
+
+Read-modify-write updates (update_json / update_text) hold an exclusive
+lock on a separate "<name>.lock" file - the data file is replaced on every
+write, so it cannot carry the lock itself. The lock is polled without
+blocking for at most LOCK_TIMEOUT; a process that cannot get it in time
+stops waiting and the update returns False, so the caller chooses the
+fallback: the stats writer journals its decision (append_record) for the
+next lock holder to merge (drain_records), best-effort caches skip the
+write.
+
+fsync is batched: a write is fsynced only if nothing in the same directory
+was fsynced in the last FSYNC_INTERVAL seconds (the mtime of a marker file
+records when), so a burst of hook processes pays for one fsync per
+interval and the rest is left to kernel writeback. A power loss can lose
+the latest updates, never tear a file. CLAUDE_ROUTER_FSYNC_INTERVAL
+overrides the interval; 0 fsyncs every write.
+
+lock_stats records this process's lock waits and timeouts (used by
+benchmarks/contention_benchmark.py).
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_TIMEOUT = 0.25    # seconds
+LOCK_POLL = 0.002      # first retry delay, doubled up to LOCK_POLL_MAX
+LOCK_POLL_MAX = 0.02
+FSYNC_INTERVAL = 5.0   # seconds
+FSYNC_MARKER = ".router-fsync"
+
+lock_stats = {"waits_ms": [], "timeouts": 0}
+
+
+def fsync_interval() -> float:
+    try:
+        return max(0.0, float(os.environ.get("CLAUDE_ROUTER_FSYNC_INTERVAL", FSYNC_INTERVAL)))
+    except ValueError:
+        return FSYNC_INTERVAL
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd: int):
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    except OSError:
+        pass
+
+
+@contextmanager
+def file_lock(path: Path, timeout: float = LOCK_TIMEOUT):
+    """Hold the exclusive lock for path; yields whether it was acquired within timeout."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path.with_name(path.name + ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    acquired = False
+    try:
+        started = time.perf_counter()
+        delay = LOCK_POLL
+        while True:
+            acquired = _try_lock(fd)
+            waited = time.perf_counter() - started
+            if acquired or waited >= timeout:
+                break
+            time.sleep(min(delay, timeout - waited))
+            delay = min(delay * 2, LOCK_POLL_MAX)
+        lock_stats["waits_ms"].append(waited * 1000)
+        if not acquired:
+            lock_stats["timeouts"] += 1
+        yield acquired
+    finally:
+        if acquired:
+            _unlock(fd)
+        os.close(fd)
+
+
+def _fsync_due(directory: Path) -> bool:
+    interval = fsync_interval()
+    if not interval:
+        return True
+    try:
+        return time.time() - (directory / FSYNC_MARKER).stat().st_mtime >= interval
+    except OSError:
+        return True
+
+
+def _fsynced(directory: Path):
+    """Flush the directory entry of the rename and note when this directory was synced."""
+    if fcntl:
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+    try:
+        (directory / FSYNC_MARKER).touch()
+    except OSError:
+        pass
+
+
+def atomic_write(path: Path, data):
+    """Replace path with data (str or bytes) via a temp file and rename."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    synced = False
+    try:
+        with open(tmp, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+            if _fsync_due(path.parent):
+                f.flush()
+                os.fsync(f.fileno())
+                synced = True
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    if synced:
+        _fsynced(path.parent)
+
+
+def atomic_write_json(path: Path, data, indent: int = None):
+    text = json.dumps(data, indent=indent) if indent else json.dumps(data, separators=(",", ":"))
+    atomic_write(path, text)
+
+
+def read_json(path: Path, default=None):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _read_for_update(path: Path, default):
+    """Current contents for an update: default if missing; an unparsable file is set aside."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default()
+    except ValueError:
+        # Keep the evidence instead of silently starting over on top of it
+        os.replace(path, path.with_name(f"{path.name}.corrupt"))
+        return default()
+
+
+def update_json(path: Path, mutate, default=dict, indent: int = None, timeout: float = LOCK_TIMEOUT) -> bool:
+    """Read-modify-write path under its lock.
+
+    mutate(data) returns the data to write, or None to leave the file as is.
+    Returns False (nothing written) if the lock was not acquired in time;
+    other errors propagate.
+    """
+    with file_lock(path, timeout) as acquired:
+        if not acquired:
+            return False
+        data = mutate(_read_for_update(path, default))
+        if data is not None:
+            atomic_write_json(path, data, indent)
+        return True
+
+
+def update_text(path: Path, mutate, timeout: float = LOCK_TIMEOUT) -> bool:
+    """update_json for a text file; mutate(text or None if missing) returns new text or None."""
+    with file_lock(path, timeout) as acquired:
+        if not acquired:
+            return False
+        try:
+            with open(path, "r") as f:
+                content = f.read()
+        except FileNotFoundError:
+            content = None
+        content = mutate(content)
+        if content is not None:
+            atomic_write(path, content)
+        return True
+
+
+def append_record(path: Path, record: dict) -> int:
+    """Append one JSON line to a journal (a single O_APPEND write, no lock needed).
+
+    Returns the journal's size after the write.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (json.dumps(record, separators=(",", ":")) + "\n").encode())
+        return os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+
+
+def drain_records(path: Path) -> tuple:
+    """Take every record appended to a journal so far.
+
+    Call it while holding the lock of the file the records belong to.
+    Returns (records, done); call done() only once the records have been
+    written where they belong. The journal is renamed away first, so
+    appends that race with the drain land in a fresh journal. done()
+    moves any record that still reached the renamed journal after it was
+    read (an appender that opened it before the rename) back to the live
+    journal, then deletes it. If done() is never called (the merged write
+    failed), the renamed journal is kept and the next drain takes it
+    before the live journal, so nothing is lost; a crash between the write
+    and done() can merge a record twice, never drop it.
+    """
+    draining = path.with_name(f"{path.name}.draining")
+    if not draining.exists():
+        try:
+            os.replace(path, draining)
+        except FileNotFoundError:
+            return [], lambda: None
+    records = []
+    with open(draining, "rb") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass
+        consumed = f.tell()
+
+    def done():
+        with open(draining, "rb") as f:
+            f.seek(consumed)
+            late = f.read()
+        if late:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, late if late.endswith(b"\n") else late + b"\n")
+            finally:
+                os.close(fd)
+        os.unlink(draining)
+
+    return records, done
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Claude Router - Stats Query Command
+Computes /router-stats output (totals, route distribution, savings, latency,
+retry rate, date-range and per-project breakdowns) directly from the stats
+store.
+
+All-time figures come from the aggregates the hook maintains on every write,
+and ranges merge the pre-aggregated rollup buckets (hourly, daily, weekly,
+monthly), so a query never touches per-decision data and returns in
+milliseconds for any history length.
+
+Usage:
+    python3 router_stats.py [--since YYYY-MM-DD] [--until YYYY-MM-DD]
+                            [--project NAME] [--json]
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from router_breaker import BREAKER_FILE, describe, load_breaker
+from router_calibration import CALIBRATION_FILE, load_calibration, retry_summary
+from router_histogram import merge, summarize
+from router_rollups import merge_bucket, new_bucket, query_range
+
+STATS_FILE = Path.home() / ".claude" / "router-stats.json"
+
+ROUTES = ("fast", "standard", "deep", "orchestrated")
+ROUTE_LABELS = {"fast": "Fast (Haiku)", "standard": "Standard (Sonnet)",
+                "deep": "Deep (Opus)", "orchestrated": "Orchestrated"}
+BAR_WIDTH = 20
+
+
+def load_stats(path: Path = STATS_FILE) -> dict:
+    """Load the stats store, or None if there is none yet."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def match_project(projects: dict, name: str) -> list:
+    """Project keys (working directories) matching a name or path fragment."""
+    return [key for key in projects
+            if key == name or os.path.basename(key.rstrip("/")) == name or name in key]
+
+
+def _add_bucket(total: dict, bucket: dict):
+    total["queries"] += bucket.get("queries", 0)
+    total["savings"] += bucket.get("savings", 0.0)
+    for route, count in bucket.get("routes", {}).items():
+        total["routes"][route] = total["routes"].get(route, 0) + count
+
+
+def summarize_stats(stats: dict, since: str = None, until: str = None, project: str = None,
+                    calibration: dict = None, breaker: dict = None) -> dict:
+    """Summarize the stats store, optionally restricted to a date range and/or project.
+
+    Dates are inclusive ISO dates (YYYY-MM-DD). Ranges are answered from the
+    rollups (weekly/monthly buckets count toward the range containing their
+    first day); per-project ranges use the 30-day daily history. calibration
+    (router_calibration counters) adds the retries-per-100-prompts trend and
+    breaker (router_breaker state) the LLM fallback circuit state.
+    """
+    ranged = bool(since or until)
+    summary = {
+        "scope": {"since": since, "until": until, "project": project},
+        "queries": 0,
+        "routes": {},
+        "savings": 0.0,
+    }
+
+    days = [s for s in stats.get("sessions", [])
+            if (not since or s["date"] >= since) and (not until or s["date"] <= until)]
+
+    if project:
+        keys = match_project(stats.get("projects", {}), project)
+        summary["scope"]["matched_projects"] = keys
+        buckets = ([s.get("projects", {}).get(k) for s in days for k in keys] if ranged
+                   else [stats["projects"][k] for k in keys])
+        for bucket in buckets:
+            if bucket:
+                _add_bucket(summary, bucket)
+    elif ranged and "rollups" in stats:
+        total, series = query_range(stats["rollups"], since, until)
+        _add_bucket(summary, total)
+        summary["latency"] = summarize(total["latency"])
+        summary["trend"] = trend_series(series)
+    elif ranged:
+        for day in days:
+            _add_bucket(summary, day)
+        summary["latency"] = summarize(merge(*(
+            h for d in days for h in d.get("latency", {}).get("methods", {}).values())))
+    else:
+        summary["queries"] = stats.get("total_queries", 0)
+        summary["routes"] = dict(stats.get("routes", {}))
+        summary["savings"] = stats.get("estimated_savings", 0.0)
+        summary["delegation_savings"] = stats.get("delegation_savings", 0.0)
+        summary["tool_intensive_queries"] = stats.get("tool_intensive_queries", 0)
+        summary["orchestrated_queries"] = stats.get("orchestrated_queries", 0)
+        summary["exceptions"] = stats.get("exceptions", {})
+        if "llm_fallback" in stats:
+            summary["llm_fallback"] = dict(stats["llm_fallback"])
+        if "measured_cost" in stats:
+            summary["measured_cost"] = stats["measured_cost"]
+            summary["measured_savings"] = stats.get("measured_savings", 0.0)
+        latency = stats.get("latency", {})
+        summary["latency"] = summarize(merge(*latency.get("methods", {}).values()))
+        summary["latency_by_route"] = {r: summarize(h) for r, h in latency.get("routes", {}).items()}
+        summary["latency_by_method"] = {m: summarize(h) for m, h in latency.get("methods", {}).items()}
+
+    if not project:
+        # Daily breakdown (newest first) for the requested range or the last week
+        shown = [] if "trend" in summary else days if ranged else days[:7]
+        summary["days"] = [{"date": d["date"], "queries": d.get("queries", 0),
+                            "routes": d.get("routes", {}), "savings": d.get("savings", 0.0)}
+                           for d in sorted(shown, key=lambda d: d["date"], reverse=True)]
+        projects = stats.get("projects", {})
+        summary["top_projects"] = sorted(
+            ({"project": k, "queries": v.get("queries", 0), "savings": v.get("savings", 0.0)}
+             for k, v in projects.items()),
+            key=lambda p: p["queries"], reverse=True)[:5]
+
+    if calibration and not ranged and not project:
+        summary["retries"] = retry_summary(calibration)
+    if breaker is not None:
+        summary["llm_circuit"] = describe(breaker)
+
+    total = summary["queries"]
+    cheap = summary["routes"].get("fast", 0) + summary["routes"].get("standard", 0)
+    summary["optimization_rate"] = cheap / total if total else 0.0
+    summary["last_updated"] = stats.get("last_updated")
+    return summary
+
+
+def trend_series(series: list) -> list:
+    """Collapse rollup buckets into display periods (hours are merged into their day)."""
+    periods = {}
+    for tier, key, bucket in series:
+        label, granularity = (key[:10], "daily") if tier == "hourly" else (key, tier)
+        entry = periods.setdefault(label, {"granularity": granularity, "bucket": new_bucket()})
+        merge_bucket(entry["bucket"], bucket)
+    return [{"period": label, "granularity": entry["granularity"],
+             "queries": entry["bucket"]["queries"], "routes": entry["bucket"]["routes"],
+             "savings": entry["bucket"]["savings"]}
+            for label, entry in periods.items()]
+
+
+def _bar(fraction: float) -> str:
+    filled = round(fraction * BAR_WIDTH)
+    return "█" * filled + "░" * (BAR_WIDTH - filled)
+
+
+def _route_counts(routes: dict) -> str:
+    """Route counts for one row: fast, standard and deep, plus any other label present (orchestrated)."""
+    shown = [r for r in ROUTES if r != "orchestrated" or routes.get(r)] + sorted(set(routes) - set(ROUTES))
+    return " | ".join(f"{r.capitalize()} {routes.get(r, 0)}" for r in shown)
+
+
+def format_stats(summary: dict) -> str:
+    """Format a summary as the /router-stats text report."""
+    scope = summary["scope"]
+    title = "Claude Router Statistics"
+    qualifiers = []
+    if scope.get("project"):
+        qualifiers.append(f"project: {scope['project']}")
+    if scope.get("since") or scope.get("until"):
+        qualifiers.append(f"{scope.get('since') or 'start'} to {scope.get('until') or 'today'}")
+    heading = f"{title} ({', '.join(qualifiers)})" if qualifiers else f"{title} (Global)"
+
+    total = summary["queries"]
+    lines = [heading, "=" * len(heading), ""]
+    if scope.get("project") and not scope.get("matched_projects"):
+        lines.append(f"No queries recorded for a project matching '{scope['project']}'.")
+        return "\n".join(lines)
+
+    lines += [f"Total Queries Routed: {total}",
+              f"Optimization Rate: {summary['optimization_rate']:.0%} (queries routed to cheaper models)",
+              "", "Route Distribution:"]
+    for route in ROUTES:
+        count = summary["routes"].get(route, 0)
+        if route == "orchestrated" and not count:
+            continue
+        share = count / total if total else 0.0
+        lines.append(f"  {ROUTE_LABELS[route] + ':':<20}{count:>6} ({share:>4.0%})  {_bar(share)}")
+
+    if "tool_intensive_queries" in summary:
+        lines += ["", "Tool-Aware Routing:",
+                  f"  Tool-Intensive Queries: {summary['tool_intensive_queries']}",
+                  f"  Orchestrated Queries:   {summary['orchestrated_queries']}"]
+
+    fallback = summary.get("llm_fallback")
+    circuit = summary.get("llm_circuit")
+    if fallback or (circuit and circuit["state"] != "closed"):
+        fallback = fallback or {}
+        lines += ["", "LLM Fallback (Haiku classifier):",
+                  f"  Calls: {fallback.get('calls', 0)} ({fallback.get('failures', 0)} failed, "
+                  f"{fallback.get('early_stops', 0)} streams stopped at the route)",
+                  f"  Skipped (proven rules agreement): {fallback.get('skipped', 0)}",
+                  f"  Skipped (circuit open): {fallback.get('circuit_skipped', 0)}"]
+        tokens = fallback.get("tokens")
+        if tokens:
+            cached = (f", {tokens['cache_read']} cache read, {tokens['cache_write']} cache write"
+                      if tokens.get("cache_read") or tokens.get("cache_write") else "")
+            lines.append(f"  Tokens: {tokens.get('input', 0)} input, {tokens.get('output', 0)} output{cached} "
+                         "(no prompt caching: the request is below the model's minimum cacheable size)")
+        if circuit:
+            state = f"  Circuit: {circuit['state']}"
+            if circuit["state"] != "closed":
+                state += (f" after {circuit['failures']} consecutive failure(s) ({circuit['kind']}), "
+                          f"next probe in {circuit['retry_in'] // 60}m{circuit['retry_in'] % 60:02d}s")
+            lines.append(state)
+            if circuit.get("last_error"):
+                lines.append(f"  Last error: {circuit['last_error']}")
+
+    exceptions = {k: v for k, v in summary.get("exceptions", {}).items() if v}
+    if exceptions:
+        lines += ["", "Exceptions (handled by Opus despite classification):"]
+        lines += [f"  {name}: {count}" for name, count in sorted(exceptions.items())]
+
+    lines += ["", "Value Metrics:",
+              f"  Estimated Savings: ${summary['savings']:.2f} (vs always using Opus)"]
+    if "delegation_savings" in summary:
+        lines.append(f"  Delegation Savings: ${summary['delegation_savings']:.2f}")
+    if "measured_cost" in summary:
+        lines.append(f"  Measured Cost: ${summary['measured_cost']:.2f} "
+                     f"(Measured Savings: ${summary['measured_savings']:.2f}, from session transcripts)")
+    if total:
+        lines.append(f"  Avg Savings per Query: ${summary['savings'] / total:.4f}")
+
+    retries = summary.get("retries")
+    if retries and retries["all_time"]["prompts"]:
+        current, previous = retries["current"], retries["previous"]
+        lines += ["", "Retries (/retry escalations):"]
+        for label, window in ((f"Last {retries['days']} days", current),
+                              (f"Previous {retries['days']} days", previous),
+                              ("All recorded", retries["all_time"])):
+            if window["per_100"] is not None:
+                lines.append(f"  {label + ':':<20}{window['per_100']:>6.1f} per 100 prompts "
+                             f"({window['retries']}/{window['prompts']})")
+
+    latency = summary.get("latency")
+    if latency and latency["count"]:
+        lines += ["", "Hook Latency:",
+                  f"  p50 {latency['p50']:.1f}ms | p90 {latency['p90']:.1f}ms | p99 {latency['p99']:.1f}ms"
+                  f" (n={latency['count']})"]
+        for label, groups in (("route", summary.get("latency_by_route", {})),
+                              ("method", summary.get("latency_by_method", {}))):
+            for name in sorted(groups):
+                s = groups[name]
+                lines.append(f"  {label + ' ' + name:<20} p50 {s['p50']:>7.1f}ms  p90 {s['p90']:>7.1f}ms  "
+                             f"p99 {s['p99']:>7.1f}ms  (n={s['count']})")
+
+    if summary.get("days"):
+        lines += ["", "Daily Breakdown:"]
+        for day in summary["days"]:
+            lines.append(f"  {day['date']}  {day['queries']:>5} queries  ${day['savings']:.2f}  "
+                         f"{_route_counts(day['routes'])}")
+
+    if summary.get("trend"):
+        lines += ["", "Trend:"]
+        for period in summary["trend"]:
+            lines.append(f"  {period['period']:<10} {period['granularity']:<8} {period['queries']:>6} queries  "
+                         f"${period['savings']:.2f}  {_route_counts(period['routes'])}")
+
+    if summary.get("top_projects"):
+        lines += ["", "Top Projects:"]
+        for entry in summary["top_projects"]:
+            lines.append(f"  {entry['queries']:>6}  {entry['project']}")
+
+    if summary.get("last_updated"):
+        lines += ["", f"Last updated: {summary['last_updated']}"]
+    return "\n".join(lines)
+
+
+def _iso_date(value: str) -> str:
+    datetime.strptime(value, "%Y-%m-%d")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show Claude Router statistics")
+    parser.add_argument("--since", type=_iso_date, help="first day to include (YYYY-MM-DD)")
+    parser.add_argument("--until", type=_iso_date, help="last day to include (YYYY-MM-DD)")
+    parser.add_argument("--project", help="restrict to a project (directory name or path fragment)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument("--stats", default=str(STATS_FILE), help="router stats file")
+    parser.add_argument("--calibration", default=str(CALIBRATION_FILE), help="retry calibration file")
+    parser.add_argument("--breaker", default=str(BREAKER_FILE), help="LLM fallback circuit breaker file")
+    args = parser.parse_args()
+
+    stats = load_stats(Path(args.stats).expanduser())
+    if not stats:
+        print("No router stats available yet - run some queries through the router first.")
+        return
+    calibration = load_calibration(Path(args.calibration).expanduser())
+    breaker = load_breaker(Path(args.breaker).expanduser())
+    summary = summarize_stats(stats, args.since, args.until, args.project, calibration, breaker)
+    print(json.dumps(summary, indent=2) if args.json else format_stats(summary))
+
+
+if __name__ == "__main__":
+    main()
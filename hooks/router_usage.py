@@ -0,0 +1,187 @@
+"""
+Claude Router - Transcript Usage Ingestion
+Incrementally tails Claude Code session transcripts (JSONL) to account for
+the real tokens and cost behind each routing decision.
+
+Each session keeps a cursor in its session state shard: the byte offset of
+the last complete transcript line consumed, plus the routing decision that
+owns whatever is appended next. Every hook run reads only the bytes added
+since the previous run, so ingestion cost is proportional to new output,
+even for sessions that run for days.
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import json
+import os
+from pathlib import Path
+
+# Upper bound on bytes consumed per hook run (the rest is picked up next time)
+MAX_INGEST_BYTES = 4 * 1024 * 1024
+
+# Prompt caching price multipliers (relative to base input price)
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.1
+
+TOKEN_FIELDS = {
+    "input_tokens": "input",
+    "output_tokens": "output",
+    "cache_creation_input_tokens": "cache_write",
+    "cache_read_input_tokens": "cache_read",
+}
+
+
+def model_tier(model: str) -> str:
+    """Map a model ID (e.g. claude-sonnet-4-5-20250929) to its route tier."""
+    model = (model or "").lower()
+    if "haiku" in model:
+        return "fast"
+    if "sonnet" in model:
+        return "standard"
+    if "opus" in model:
+        return "deep"
+    return None
+
+
+def usage_cost(tokens: dict, tier: str, cost_per_1m: dict) -> float:
+    """Cost of a token bundle at a tier's prices."""
+    prices = cost_per_1m[tier]
+    return (
+        tokens.get("input", 0) * prices["input"]
+        + tokens.get("cache_write", 0) * prices["input"] * CACHE_WRITE_MULTIPLIER
+        + tokens.get("cache_read", 0) * prices["input"] * CACHE_READ_MULTIPLIER
+        + tokens.get("output", 0) * prices["output"]
+    ) / 1_000_000
+
+
+def tail_lines(path: Path, offset: int, max_bytes: int = MAX_INGEST_BYTES) -> tuple[list, int]:
+    """Read complete lines appended to path after offset.
+
+    Returns (lines, new_offset). A trailing partial line is left for the next
+    call. If the file shrank (rotated or rewritten), reading restarts at 0.
+    A line longer than max_bytes (an inline image, a huge tool result) is
+    skipped rather than re-read on every call: its rest arrives as the first
+    line of a later read and fails to parse like any fragment.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < offset:
+            offset = 0
+        if size == offset:
+            return [], offset
+        f.seek(offset)
+        chunk = f.read(min(size - offset, max_bytes))
+
+    end = chunk.rfind(b"\n")
+    if end < 0:
+        if len(chunk) < max_bytes:
+            return [], offset  # a line still being written
+        return [], offset + len(chunk)
+    return chunk[:end].split(b"\n"), offset + end + 1
+
+
+def extract_usage(lines: list, last_message_id: str = None) -> tuple[dict, str]:
+    """Sum per-model usage from raw transcript lines.
+
+    Claude Code writes one line per content block, each repeating the
+    message's usage, so consecutive lines with the same message ID are
+    counted once. Returns ({model: token_totals}, last_message_id).
+    """
+    models = {}
+    for raw in lines:
+        # Cheap pre-filter: only assistant messages carry usage
+        if b'"usage"' not in raw:
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            continue
+        message = record.get("message")
+        if not isinstance(message, dict) or not isinstance(message.get("usage"), dict):
+            continue
+        message_id = message.get("id") or record.get("requestId")
+        if message_id and message_id == last_message_id:
+            continue
+        last_message_id = message_id
+
+        model = message.get("model")
+        if not model_tier(model):
+            continue  # e.g. "<synthetic>" messages
+        totals = models.setdefault(model, {field: 0 for field in TOKEN_FIELDS.values()})
+        for source, field in TOKEN_FIELDS.items():
+            value = message["usage"].get(source)
+            if isinstance(value, int):
+                totals[field] += value
+    return models, last_message_id
+
+
+def ingest_transcript(transcript_path: str, cursor: dict, route: str, method: str) -> tuple[dict, dict]:
+    """Consume new transcript bytes and hand ownership to the current decision.
+
+    cursor is the transcript's persisted state from the previous hook run
+    (None on a session's first prompt). Usage appended since then was
+    produced by the previous routing decision, so it is returned attributed
+    to that decision. The current decision (route, method) becomes the owner
+    of whatever the transcript gains before the next prompt.
+
+    Returns (delta, new_cursor). delta is {"route", "method", "models"} or
+    None if there is nothing to attribute; new_cursor is None if there is no
+    transcript to track.
+    """
+    if not transcript_path:
+        return None, None
+    path = Path(transcript_path).expanduser()
+    if not path.exists():
+        return None, None
+
+    delta = None
+    if not cursor or cursor.get("path") != str(path):
+        # First sighting: earlier usage predates any decision we made
+        offset = path.stat().st_size
+        last_message_id = None
+    else:
+        lines, offset = tail_lines(path, cursor.get("offset", 0))
+        models, last_message_id = extract_usage(lines, cursor.get("last_message_id"))
+        if models and cursor.get("route"):
+            delta = {"route": cursor["route"], "method": cursor.get("method"), "models": models}
+
+    new_cursor = {
+        "path": str(path),
+        "offset": offset,
+        "last_message_id": last_message_id,
+        "route": route,
+        "method": method,
+    }
+    return delta, new_cursor
+
+
+def apply_usage(stats: dict, session: dict, delta: dict, cost_per_1m: dict):
+    """Fold an attributed usage delta into the stats and today's session.
+
+    Adds real per-model and per-route token totals, the measured cost, and
+    measured savings relative to the same tokens on Opus.
+    """
+    if not delta:
+        return
+    usage = stats.setdefault("usage", {"models": {}, "routes": {}})
+    route_usage = usage.setdefault("routes", {}).setdefault(
+        delta["route"], {"turns": 0, "cost": 0.0, **{f: 0 for f in TOKEN_FIELDS.values()}})
+    route_usage["turns"] += 1
+
+    cost = 0.0
+    opus_cost = 0.0
+    for model, tokens in delta["models"].items():
+        model_cost = usage_cost(tokens, model_tier(model), cost_per_1m)
+        cost += model_cost
+        opus_cost += usage_cost(tokens, "deep", cost_per_1m)
+
+        model_usage = usage.setdefault("models", {}).setdefault(
+            model, {"cost": 0.0, **{f: 0 for f in TOKEN_FIELDS.values()}})
+        for field in TOKEN_FIELDS.values():
+            model_usage[field] += tokens.get(field, 0)
+            route_usage[field] += tokens.get(field, 0)
+        model_usage["cost"] = round(model_usage["cost"] + model_cost, 6)
+
+    route_usage["cost"] = round(route_usage["cost"] + cost, 6)
+    for container in (stats, session):
+        container["measured_cost"] = round(container.get("measured_cost", 0.0) + cost, 6)
+        container["measured_savings"] = round(container.get("measured_savings", 0.0) + opus_cost - cost, 6)
@@ -0,0 +1,192 @@
+"""
+Claude Router - Filesystem Change Watcher
+Invalidates the router's in-process caches (knowledge dir, learning state,
+learned keywords, plugin map) only when the files behind them change.
+
+Two backends share one interface:
+- inotify (Linux, via ctypes): one non-blocking read per poll(), no stat
+  calls at all in steady state. Opt-in with start_inotify() for long-lived
+  processes, since setting it up costs more than a one-shot hook run saves.
+- mtime polling (default, everywhere): watched paths are re-stat'ed at most
+  once per poll_interval, so a short-lived hook process never re-stats.
+
+Part of claude-router: https://github.com/0xrdan/claude-router
+"""
+import os
+import struct
+import time
+from pathlib import Path
+
+# Seconds between stat sweeps in polling mode
+POLL_INTERVAL = 2.0
+
+# inotify constants (from <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _fingerprint(path: str):
+    """Cheap change marker for a path (None if it does not exist)."""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class PathWatcher:
+    """Maps watched paths to cache keys and reports which keys went stale."""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._targets = {}      # path -> {"keys": set, "contents": bool, "mark": fingerprint}
+        self._last_poll = time.monotonic()
+        self._inotify_fd = None
+        self._libc = None
+        self._wds = {}          # watch descriptor -> watched directory
+        self._dir_wds = {}      # watched directory -> watch descriptor
+
+    # -- registration -----------------------------------------------------
+
+    def watch(self, path, key: str, contents: bool = False):
+        """Invalidate key when path is created, deleted or modified.
+
+        With contents=True, path is a directory and entries being added to or
+        removed from it also count as a change.
+        """
+        path = str(path)
+        target = self._targets.get(path)
+        if target is None:
+            target = {"keys": set(), "contents": contents, "mark": _fingerprint(path)}
+            self._targets[path] = target
+            if self._inotify_fd is not None:
+                self._add_inotify_watches(path, contents)
+        target["keys"].add(key)
+        target["contents"] = target["contents"] or contents
+
+    def unwatch(self, key: str):
+        """Stop reporting key (paths no longer tied to any key are dropped)."""
+        for path in list(self._targets):
+            target = self._targets[path]
+            target["keys"].discard(key)
+            if not target["keys"]:
+                del self._targets[path]
+
+    # -- backends ---------------------------------------------------------
+
+    def start_inotify(self) -> bool:
+        """Switch to inotify. Returns False (and keeps polling) if unavailable."""
+        if self._inotify_fd is not None:
+            return True
+        try:
+            import ctypes
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return False
+        if fd < 0:
+            return False
+        self._libc = libc
+        self._inotify_fd = fd
+        for path, target in self._targets.items():
+            self._add_inotify_watches(path, target["contents"])
+        return True
+
+    def _add_dir_watch(self, directory: str) -> bool:
+        if directory in self._dir_wds:
+            return True
+        wd = self._libc.inotify_add_watch(self._inotify_fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            return False
+        self._wds[wd] = directory
+        self._dir_wds[directory] = wd
+        return True
+
+    def _add_inotify_watches(self, path: str, contents: bool):
+        # Watch the parent so creation, deletion and atomic renames of the
+        # target are seen; watch the directory itself for content changes.
+        # Anything that cannot be watched (missing parent) stays on polling.
+        watched = self._add_dir_watch(str(Path(path).parent))
+        if contents and os.path.isdir(path):
+            watched = self._add_dir_watch(path) and watched
+        self._targets[path]["inotify"] = watched
+
+    def close(self):
+        """Release the inotify descriptor (if any)."""
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+            self._wds.clear()
+            self._dir_wds.clear()
+
+    # -- change detection -------------------------------------------------
+
+    def poll(self) -> set:
+        """Return the cache keys invalidated since the last call (non-blocking)."""
+        stale = set()
+        if self._inotify_fd is not None:
+            stale |= self._read_inotify()
+        now = time.monotonic()
+        if now - self._last_poll >= self.poll_interval:
+            self._last_poll = now
+            for path, target in self._targets.items():
+                if self._inotify_fd is not None and target.get("inotify"):
+                    continue
+                mark = _fingerprint(path)
+                if mark != target["mark"]:
+                    target["mark"] = mark
+                    stale |= target["keys"]
+        return stale
+
+    def _read_inotify(self) -> set:
+        stale = set()
+        while True:
+            try:
+                data = os.read(self._inotify_fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError:
+                break
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, name_len = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + name_len].split(b"\0", 1)[0]
+                offset += name_len
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped: everything may have changed
+                    for target in self._targets.values():
+                        stale |= target["keys"]
+                    continue
+                directory = self._wds.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # Watched directory went away: fall back to polling its targets
+                    del self._wds[wd]
+                    self._dir_wds.pop(directory, None)
+                    for path, target in self._targets.items():
+                        if path == directory or str(Path(path).parent) == directory:
+                            target["inotify"] = False
+                            stale |= target["keys"]
+                    continue
+                changed = os.path.join(directory, os.fsdecode(name)) if name else directory
+                for path, target in self._targets.items():
+                    if path == changed or (target["contents"] and path == directory):
+                        stale |= target["keys"]
+        return stale
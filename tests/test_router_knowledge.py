@@ -0,0 +1,79 @@
+"""
+Tests for the learned routing weights (hooks/router_knowledge.py).
+
+Run with: python3 -m unittest discover tests (or pytest)
+"""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "hooks"))
+
+from router_knowledge import HISTORY_REBUILD_ENTRIES, load_routing_weights  # noqa: E402
+
+LEARNINGS = """---
+type: quirks
+entry_count: 1
+---
+
+## Quirk: Billing ledger reconciliation is complex
+- **Discovered:** 2026-01-05
+- **Location:** billing ledger reconciliation invoice settlement
+- **Insight:** The billing ledger reconciliation is complex and tricky; invoice settlement needs careful review
+- **Confidence:** high
+"""
+
+CACHE_MAX_ENTRIES = 100  # the hook's cap on classifications.md
+
+
+def cache_entry(number: int, query: str, route: str) -> str:
+    return (f"\n## [{number:012x}]\n- **Query pattern:** \"{query}\"\n- **Route:** {route}\n"
+            f"- **Confidence:** 0.90\n- **Last used:** 2026-10-01\n- **Hit count:** 1\n")
+
+
+class HistoryRebuildTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.knowledge = Path(self.tmp.name)
+        (self.knowledge / "learnings").mkdir()
+        (self.knowledge / "learnings" / "quirks.md").write_text(LEARNINGS)
+        (self.knowledge / "cache").mkdir()
+        self.history = self.knowledge / "cache" / "classifications.md"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_history(self, entries: list):
+        """A full cache; every entry has the same length, so the file size never changes."""
+        self.history.write_text("# Classification Cache\n" + "".join(entries))
+        stat = self.history.stat()
+        os.utime(self.history, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def full_cache(self, replaced: int) -> list:
+        # Deep-sounding prompts the user kept routing to deep, evicted for ones routed fast
+        entries = [cache_entry(n, f"billing ledger audit {n:03d}", "deep") for n in range(CACHE_MAX_ENTRIES)]
+        for n in range(replaced):
+            entries[n] = cache_entry(CACHE_MAX_ENTRIES + n, f"billing ledger quick {n:03d}", "fast")
+        return entries
+
+    def test_replaced_entries_in_full_cache_change_weights(self):
+        self.write_history(self.full_cache(0))
+        before = load_routing_weights(self.knowledge)["deep"]["billing"]
+        size = self.history.stat().st_size
+
+        self.write_history(self.full_cache(HISTORY_REBUILD_ENTRIES + 5))
+        self.assertEqual(self.history.stat().st_size, size)
+        after = load_routing_weights(self.knowledge)["deep"]["billing"]
+        self.assertLess(after, before)
+
+    def test_few_replaced_entries_reuse_weights(self):
+        self.write_history(self.full_cache(0))
+        before = load_routing_weights(self.knowledge)
+        self.write_history(self.full_cache(HISTORY_REBUILD_ENTRIES - 1))
+        self.assertEqual(load_routing_weights(self.knowledge), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Tests for the orchestration fan-out planner (hooks/router_plan.py).
+
+Run with: python3 -m unittest discover tests (or pytest)
+"""
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "hooks"))
+
+from router_features import Classification  # noqa: E402
+from router_plan import MAX_SUBTASKS, build_plan, format_plan  # noqa: E402
+
+
+def classify_batch(texts):
+    return [Classification("standard", 0.9) for _ in texts]
+
+
+def texts(plan):
+    return [subtask["text"] for subtask in plan["subtasks"]]
+
+
+class ShortStepsTest(unittest.TestCase):
+    """Steps shorter than a sentence are still steps the user asked for."""
+
+    def test_short_last_link_of_and_then_chain(self):
+        plan = build_plan("Audit the security of the auth module and then fix issues and then deploy", classify_batch)
+        self.assertEqual(texts(plan), ["Audit the security of the auth module", "fix issues", "deploy"])
+        self.assertEqual([s["depends_on"] for s in plan["subtasks"]], [[], [1], [2]])
+
+    def test_short_links_of_sentence_chain(self):
+        plan = build_plan("Review security across multiple files. Then run tests. Then commit.", classify_batch)
+        self.assertEqual(texts(plan), ["Review security across multiple files", "run tests", "commit"])
+        self.assertEqual(plan["waves"], 3)
+
+    def test_short_numbered_steps(self):
+        plan = build_plan("1. lint 2. test 3. deploy the security architecture changes across all files",
+                          classify_batch)
+        self.assertEqual(texts(plan), ["lint", "test", "deploy the security architecture changes across all files"])
+
+    def test_short_steps_keep_step_numbers(self):
+        plan = build_plan("1. lint 2. test 3. deploy using the output of step 1", classify_batch)
+        self.assertEqual(plan["subtasks"][2]["depends_on"], [1])
+
+
+class SubtaskLimitTest(unittest.TestCase):
+    def test_steps_past_the_limit_are_named(self):
+        prompt = " ".join(f"{n}. fix bug number {n} in the parser" for n in range(1, MAX_SUBTASKS + 3))
+        plan = build_plan(prompt, classify_batch)
+        self.assertEqual(len(plan["subtasks"]), MAX_SUBTASKS)
+        self.assertEqual(plan["omitted"], [MAX_SUBTASKS + 1, MAX_SUBTASKS + 2])
+        self.assertIn(f"steps {MAX_SUBTASKS + 1}, {MAX_SUBTASKS + 2} of the prompt", format_plan(plan))
+
+    def test_fan_out_is_not_cut_in_half(self):
+        steps = [f"fix bug number {n} in the parser" for n in range(1, MAX_SUBTASKS)]
+        steps.append("for each module in src add a docstring")
+        prompt = " ".join(f"{n}. {step}" for n, step in enumerate(steps, 1))
+        plan = build_plan(prompt, classify_batch)
+        self.assertEqual(len(plan["subtasks"]), MAX_SUBTASKS - 1)
+        self.assertEqual(plan["omitted"], [MAX_SUBTASKS])
+
+    def test_nothing_omitted(self):
+        plan = build_plan("1. update the parser 2. update the lexer", classify_batch)
+        self.assertEqual(plan["omitted"], [])
+        self.assertNotIn("Not planned", format_plan(plan))
+
+
+if __name__ == "__main__":
+    unittest.main()